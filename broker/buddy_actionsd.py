@@ -19,12 +19,53 @@ GET  /capabilities           (available features)
 POST /execute                (run actions)
 
 Supports actions:
-- mkdir, write_file, list_dir, open_url, launch_app, shell, screen_capture, mouse_control, keyboard_control, window_management, docker_control, network_admin
+- mkdir, write_file, list_dir, open_url, launch_app, shell, screen_capture, mouse_control, keyboard_control, window_management, input_macro, docker_control, network_admin
+
+screen_capture params:
+- region   [x1, y1, x2, y2] (default: whole screen)
+- format   raw | jpeg | webp | png | thumbnail (default: png)
+- quality  jpeg/webp/thumbnail quality (default: 80)
+- max_size thumbnail bounding box in px (default: 512)
+- inline   return data_base64 instead of screenshot_path (not for raw)
+- damage   only return tiles changed since the last damage capture (format default: jpeg)
+- damage_key / tile / full_ratio / reset   damage tracking key (default: region), tile px
+           (default 64), changed fraction above which the full frame is sent (default 0.5),
+           drop the last frame and start over
+raw returns the BGRX framebuffer in a file to mmap (width/height/stride in the result).
+Output files are a fixed pool of BUDDY_CAPTURE_POOL (default 8) slots per format in
+BUDDY_CAPTURE_DIR (default /dev/shm/buddy-capture-<uid>), removed on exit.
+
+mouse_control / keyboard_control / window_management go through one persistent
+X connection (XTest input, pipelined window property reads) when python-xlib and
+an X server with XTEST are available; BUDDY_X_BACKEND=legacy keeps pyautogui + xdotool.
+A failed X connection is not retried for BUDDY_X_RETRY_S (default 30); calls use the legacy
+path meanwhile, and an input_macro keeps the backend it started with for all its steps.
+window_management actions: find (title, class), list, active, focus, activate (window_id)
+find/list/active are answered from an event-driven window index (BUDDY_WINDOW_CACHE, default on):
+find also takes match (substring | exact | regex | fuzzy), threshold (fuzzy, default 0.6),
+pid, at ([x, y] inside the window), mapped_only and limit; cache_stats reports the index.
+
+input_macro params: steps [{op, ..., delay_ms}], default_delay_ms (0), timeout_s (60), stop_on_error (true)
+- move {x, y} | click {button, clicks, x?, y?} | drag {x, y, button}
+- type {text} | press {key, "ctrl+s" style chords} | hotkey {keys}
+- sleep {ms} | focus / activate {window_id | title, match}
+- wait_window {title, match, active (true)} | wait_title_change {from?} |
+  wait_stable {region, stable_ms (250), interval_ms (50)}; waits take timeout_ms (5000)
+There is no implicit pause after input calls (BUDDY_INPUT_PAUSE sets pyautogui.PAUSE, default 0).
 """
 
+import atexit
+import base64
+import difflib
+import importlib.util
+import io
 import json
 import os
+import re
+import select
+import shutil
 import sys
+import threading
 import time
 import logging
 import subprocess
@@ -46,6 +87,38 @@ except Exception as e:
     PYAUTOGUI_AVAILABLE = False
     print(f"Warning: GUI automation libraries not available ({e}). Screen‑control actions will be disabled.")
 
+def load_sibling(name: str):
+    """
+    Load <name>.py from this file's directory by path, so it is found also
+    when this file is itself loaded by path (scripts/dev benches, BuddyActions).
+    """
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), name + ".py")
+    spec = importlib.util.spec_from_file_location(name, path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+# Fast capture path (raw framebuffer) and XTest input via Xlib, encoding via Pillow
+try:
+    import Xlib.display
+    import Xlib.error
+    import Xlib.ext.xtest
+    import Xlib.protocol.event
+    import Xlib.protocol.request
+    import Xlib.X
+    import Xlib.Xatom
+    import Xlib.XK
+    xkeymap = load_sibling("xkeymap")
+    XLIB_AVAILABLE = bool(os.environ.get("DISPLAY"))
+except Exception:
+    XLIB_AVAILABLE = False
+
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except Exception:
+    PIL_AVAILABLE = False
+
 # -----------------------------
 # Time / JSON helpers
 # -----------------------------
@@ -111,6 +184,837 @@ logging.basicConfig(
 )
 logger = logging.getLogger("buddy_actionsd")
 
+# -----------------------------
+# Screen capture engine
+# -----------------------------
+
+CAPTURE_FORMATS = ("raw", "jpeg", "webp", "png", "thumbnail")
+
+
+def diff_tiles(prev, cur, width: int, height: int, tile: int = 64) -> list:
+    """
+    Changed areas between two BGRX frames of the same size, as (x, y, w, h)
+    rects on a `tile`-pixel grid; adjacent changed tiles in a band are merged
+    into one run. Identical frames and bands are skipped with a single
+    compare, and inside a changed band each tile stops being compared once it
+    differs. Takes bytes: slicing them is a memcmp, comparing memoryviews is
+    not.
+    """
+    if prev == cur:
+        return []
+    stride = width * 4
+    span = tile * 4
+    cols = (width + tile - 1) // tile
+    a, b = prev, cur
+    rects = []
+    for y0 in range(0, height, tile):
+        y1 = min(height, y0 + tile)
+        if a[y0 * stride:y1 * stride] == b[y0 * stride:y1 * stride]:
+            continue
+        dirty = [False] * cols
+        left = cols
+        for y in range(y0, y1):
+            row = y * stride
+            if a[row:row + stride] == b[row:row + stride]:
+                continue
+            for c in range(cols):
+                if dirty[c]:
+                    continue
+                off = row + c * span
+                if a[off:off + span] != b[off:off + span]:
+                    dirty[c] = True
+                    left -= 1
+            if not left:
+                break
+        c = 0
+        while c < cols:
+            if not dirty[c]:
+                c += 1
+                continue
+            start = c
+            while c < cols and dirty[c]:
+                c += 1
+            x = start * tile
+            rects.append((x, y0, min(width, c * tile) - x, y1 - y0))
+    return rects
+
+
+class CaptureEngine:
+    """
+    Screen capture on one persistent Xlib connection: root.get_image() hands
+    back the framebuffer as BGRX bytes with no intermediate encode, and the
+    output format decides what happens next:
+
+    - raw:       BGRX written into a pooled file under the capture dir
+                 (/dev/shm when available), to be mmap'd by the caller
+    - jpeg/webp: encoded at `quality` (default 80)
+    - png:       lossless, fastest zlib level
+    - thumbnail: downscaled to fit `max_size` (default 512), then JPEG
+
+    Output files live in a fixed ring of `pool_size` slots per format and are
+    overwritten in place, so the capture dir never grows; it is removed on
+    close(). Without Xlib it falls back to pyscreenshot.
+
+    capture_damage() keeps the last frame per key in memory and returns only
+    the tiles that changed since then (or nothing at all).
+    """
+
+    def __init__(self, capture_dir: str = "", pool_size: int = 8):
+        if not capture_dir:
+            base = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+            capture_dir = os.path.join(base, f"buddy-capture-{os.getuid()}")
+        self.capture_dir = capture_dir
+        self.pool_size = max(1, int(pool_size))
+        self._slots = {}
+        self._lock = threading.Lock()
+        self._display = None
+        # damage tracking: key -> (width, height, frame), most recent last
+        self._frames = {}
+        self.max_keyframes = 4
+
+    # ---- grabbing ----
+
+    def _root(self):
+        if self._display is None:
+            self._display = Xlib.display.Display()
+        return self._display.screen().root
+
+    def grab(self, region=None) -> tuple:
+        """
+        (width, height, BGRX bytes) of the screen or region (x1, y1, x2, y2).
+        """
+        if XLIB_AVAILABLE:
+            with self._lock:
+                root = self._root()
+                if region:
+                    x1, y1, x2, y2 = (int(v) for v in region)
+                else:
+                    s = self._display.screen()
+                    x1, y1, x2, y2 = 0, 0, s.width_in_pixels, s.height_in_pixels
+                w, h = x2 - x1, y2 - y1
+                try:
+                    raw = root.get_image(x1, y1, w, h, Xlib.X.ZPixmap, 0xffffffff)
+                except Xlib.error.ConnectionClosedError:
+                    self._display = None
+                    raise
+                return w, h, raw.data
+        if not PYAUTOGUI_AVAILABLE:
+            raise RuntimeError("no capture backend (python-xlib or pyscreenshot)")
+        img = ImageGrab.grab(bbox=tuple(region) if region else None).convert("RGB")
+        return img.width, img.height, img.tobytes("raw", "BGRX")
+
+    # ---- output ----
+
+    def _slot_path(self, ext: str) -> str:
+        with self._lock:
+            n = self._slots.get(ext, -1) + 1
+            self._slots[ext] = n
+        os.makedirs(self.capture_dir, mode=0o700, exist_ok=True)
+        return os.path.join(self.capture_dir, f"frame-{n % self.pool_size}.{ext}")
+
+    def _write_slot(self, ext: str, data) -> str:
+        path = self._slot_path(ext)
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size != len(data):
+                os.ftruncate(fd, len(data))
+            os.pwrite(fd, data, 0)
+        finally:
+            os.close(fd)
+        return path
+
+    @staticmethod
+    def _image(w: int, h: int, data):
+        return Image.frombuffer("RGB", (w, h), data, "raw", "BGRX", 0, 1)
+
+    def encode(self, w: int, h: int, data, fmt: str = "jpeg", quality: int = 80, max_size: int = 512) -> tuple:
+        """
+        (bytes, ext, width, height) for one BGRX frame in the given format.
+        """
+        if fmt == "raw":
+            return data, "bgrx", w, h
+        if not PIL_AVAILABLE:
+            raise RuntimeError(f"Pillow not available for {fmt} output")
+        img = self._image(w, h, data)
+        if fmt == "thumbnail":
+            factor = max(1, max(w, h) // max(1, int(max_size)))
+            if factor > 1:
+                img = img.reduce(factor)
+            img.thumbnail((max_size, max_size), Image.BILINEAR)
+            fmt = "jpeg"
+        buf = io.BytesIO()
+        if fmt == "png":
+            img.save(buf, "PNG", compress_level=1)
+        elif fmt == "webp":
+            img.save(buf, "WEBP", quality=int(quality), method=0)
+        else:
+            img.save(buf, "JPEG", quality=int(quality))
+        return buf.getvalue(), {"jpeg": "jpg"}.get(fmt, fmt), img.width, img.height
+
+    def capture(self, region=None, fmt: str = "png", quality: int = 80, max_size: int = 512,
+                inline: bool = False) -> dict:
+        t0 = time.perf_counter()
+        w, h, data = self.grab(region)
+        t1 = time.perf_counter()
+        out, ext, ow, oh = self.encode(w, h, data, fmt, quality, max_size)
+        t2 = time.perf_counter()
+        result = {"format": fmt, "width": ow, "height": oh, "bytes": len(out),
+                  "grab_ms": round((t1 - t0) * 1000, 2), "encode_ms": round((t2 - t1) * 1000, 2)}
+        if fmt == "raw":
+            result.update(pixel_format="BGRX", stride=w * 4)
+        if inline and fmt != "raw":
+            result["data_base64"] = base64.b64encode(out).decode("ascii")
+        else:
+            result["screenshot_path"] = self._write_slot(ext, out)
+        return result
+
+    def capture_damage(self, region=None, fmt: str = "jpeg", quality: int = 80, key: str = "",
+                       tile: int = 64, full_ratio: float = 0.5, reset: bool = False) -> dict:
+        """
+        Tiles changed since the previous capture_damage() with the same key
+        (default: the region). The first call, a size change, reset=True or
+        damage above `full_ratio` of the frame returns the whole frame as a
+        normal capture() result with "full": true. Otherwise tiles come back
+        inline as {x, y, w, h, data_base64} in screen coordinates; with no
+        change nothing is encoded and "tiles" is empty.
+        """
+        key = key or (",".join(str(int(v)) for v in region) if region else "screen")
+        if fmt == "thumbnail":
+            fmt = "jpeg"
+        t0 = time.perf_counter()
+        w, h, data = self.grab(region)
+        t1 = time.perf_counter()
+        data = bytes(data)
+        with self._lock:
+            prev = self._frames.pop(key, None)
+            self._frames[key] = (w, h, data)
+            while len(self._frames) > self.max_keyframes:
+                self._frames.pop(next(iter(self._frames)))
+
+        if reset or prev is None or prev[:2] != (w, h):
+            rects = [(0, 0, w, h)]
+        else:
+            rects = diff_tiles(prev[2], data, w, h, max(8, int(tile)))
+        t2 = time.perf_counter()
+        area = sum(rw * rh for _, _, rw, rh in rects)
+        ratio = area / float(w * h) if w and h else 0.0
+        result = {"changed": bool(rects), "full": False, "changed_ratio": round(ratio, 4),
+                  "grab_ms": round((t1 - t0) * 1000, 2), "diff_ms": round((t2 - t1) * 1000, 2)}
+
+        if ratio > full_ratio:
+            out, ext, ow, oh = self.encode(w, h, data, fmt, quality)
+            result.update(full=True, format=fmt, width=ow, height=oh, bytes=len(out),
+                          screenshot_path=self._write_slot(ext, out))
+            if fmt == "raw":
+                result.update(pixel_format="BGRX", stride=w * 4)
+        else:
+            ox, oy = (int(region[0]), int(region[1])) if region else (0, 0)
+            tiles = []
+            total = 0
+            img = self._image(w, h, data) if rects and fmt != "raw" else None
+            for x, y, rw, rh in rects:
+                if img is None:
+                    stride = w * 4
+                    out = b"".join(data[r * stride + x * 4:r * stride + (x + rw) * 4]
+                                   for r in range(y, y + rh))
+                else:
+                    buf = io.BytesIO()
+                    crop = img.crop((x, y, x + rw, y + rh))
+                    if fmt == "png":
+                        crop.save(buf, "PNG", compress_level=1)
+                    else:
+                        crop.save(buf, fmt.upper(), quality=int(quality))
+                    out = buf.getvalue()
+                total += len(out)
+                tiles.append({"x": ox + x, "y": oy + y, "w": rw, "h": rh,
+                              "data_base64": base64.b64encode(out).decode("ascii")})
+            result.update(format=fmt, width=w, height=h, tiles=tiles, bytes=total)
+            if fmt == "raw":
+                result["pixel_format"] = "BGRX"
+        result["encode_ms"] = round((time.perf_counter() - t2) * 1000, 2)
+        return result
+
+    def close(self):
+        with self._lock:
+            self._frames.clear()
+            if self._display is not None:
+                try:
+                    self._display.close()
+                except Exception:
+                    pass
+                self._display = None
+        shutil.rmtree(self.capture_dir, ignore_errors=True)
+
+
+# -----------------------------
+# X11 automation backend
+# -----------------------------
+
+# pyautogui-style key names -> X keysym names; anything else goes through
+# XK.string_to_keysym as-is ("Return", "ctrl+alt+Delete", "a", ...)
+KEY_ALIASES = {
+    "enter": "Return", "return": "Return", "esc": "Escape", "escape": "Escape",
+    "tab": "Tab", "space": "space", "backspace": "BackSpace", "delete": "Delete",
+    "del": "Delete", "insert": "Insert", "home": "Home", "end": "End",
+    "pageup": "Prior", "pgup": "Prior", "pagedown": "Next", "pgdn": "Next",
+    "up": "Up", "down": "Down", "left": "Left", "right": "Right",
+    "ctrl": "Control_L", "control": "Control_L", "shift": "Shift_L",
+    "alt": "Alt_L", "altgr": "ISO_Level3_Shift", "super": "Super_L",
+    "win": "Super_L", "cmd": "Super_L", "meta": "Meta_L",
+    "capslock": "Caps_Lock", "printscreen": "Print", "menu": "Menu",
+}
+
+MOUSE_BUTTONS = {"left": 1, "middle": 2, "right": 3, "scrollup": 4, "scrolldown": 5}
+
+
+def x_client_ids(d) -> list:
+    """
+    Top-level client window ids: the window manager's _NET_CLIENT_LIST, or
+    the root's children when no EWMH window manager is running.
+    """
+    root = d.screen().root
+    prop = root.get_full_property(d.get_atom("_NET_CLIENT_LIST"), Xlib.X.AnyPropertyType)
+    if prop is not None and prop.value is not None and len(prop.value):
+        return list(prop.value)
+    return [w.id for w in root.query_tree().children]
+
+
+def _x_text(r, encoding: str) -> str:
+    if not r.property_type or r.value[0] != 8:
+        return ""
+    return bytes(r.value[1]).decode(encoding, "replace")
+
+
+def x_describe_windows(d, ids: list) -> list:
+    """
+    Title/class/pid/geometry/map state for each window id. Every request
+    goes out deferred before any reply is read, so the whole batch costs one
+    round trip; windows that disappear in between are dropped.
+    """
+    req = Xlib.protocol.request
+    root = d.screen().root.id
+    props = [
+        (d.get_atom("_NET_WM_NAME"), d.get_atom("UTF8_STRING")),
+        (Xlib.Xatom.WM_NAME, Xlib.X.AnyPropertyType),
+        (Xlib.Xatom.WM_CLASS, Xlib.Xatom.STRING),
+        (d.get_atom("_NET_WM_PID"), Xlib.Xatom.CARDINAL),
+    ]
+    pending = []
+    for wid in ids:
+        reqs = [req.GetProperty(display=d.display, defer=True, delete=False, window=wid,
+                                property=prop, type=ptype, long_offset=0, long_length=1024)
+                for prop, ptype in props]
+        reqs.append(req.GetGeometry(display=d.display, defer=True, drawable=wid))
+        reqs.append(req.TranslateCoords(display=d.display, defer=True, src_wid=wid,
+                                        dst_wid=root, src_x=0, src_y=0))
+        reqs.append(req.GetWindowAttributes(display=d.display, defer=True, window=wid))
+        pending.append((wid, reqs))
+
+    out = []
+    for wid, reqs in pending:
+        try:
+            for r in reqs:
+                r.reply()
+        except Xlib.error.XError:
+            continue
+        net_name, wm_name, wm_class, pid, geom, pos, attrs = reqs
+        parts = _x_text(wm_class, "latin-1").split("\0")
+        out.append({
+            "id": wid,
+            "title": _x_text(net_name, "utf-8") or _x_text(wm_name, "latin-1"),
+            "instance": parts[0],
+            "class": parts[1] if len(parts) > 1 else "",
+            "pid": int(pid.value[1][0]) if pid.property_type and len(pid.value[1]) else None,
+            "x": pos.x,
+            "y": pos.y,
+            "width": geom.width,
+            "height": geom.height,
+            "mapped": attrs.map_state == Xlib.X.IsViewable,
+            "override_redirect": bool(attrs.override_redirect),
+        })
+    return out
+
+
+class XAutomation:
+    """
+    GUI automation over one persistent X connection instead of a pyautogui
+    call or an xdotool fork per action:
+
+    - pointer and keys are synthesized with XTest and flushed with a single
+      sync() per call
+    - text is typed from keysyms; characters missing from the keymap are
+      bound to a spare keycode for the duration of the call (like xdotool)
+    - window listings read _NET_CLIENT_LIST and then pipeline every
+      property/geometry request for all windows before reading any reply,
+      so N windows cost one round trip rather than ~5N
+    """
+
+    def __init__(self, display_name: str = None, retry_s: float = 30.0):
+        self.display_name = display_name
+        self.retry_s = retry_s
+        self._display = None
+        self._lock = threading.RLock()
+        self._failed = None  # why the last connect failed; no reconnect until retry_s has passed
+        self._failed_at = 0.0
+        self._keys = None  # xkeymap.KeyTapper for the current connection
+
+    # ---- connection ----
+
+    def available(self) -> bool:
+        if not XLIB_AVAILABLE:
+            return False
+        if self._display is not None:
+            return True
+        if self._failed is not None and time.monotonic() - self._failed_at < self.retry_s:
+            return False
+        try:
+            with self._lock:
+                self._conn()
+            self._failed = None
+            return True
+        except Exception as e:
+            self._fail(e)
+            return False
+
+    def _fail(self, e: Exception):
+        self._failed = str(e) or e.__class__.__name__
+        self._failed_at = time.monotonic()
+
+    def _conn(self):
+        if self._display is None:
+            d = Xlib.display.Display(self.display_name)
+            if not d.has_extension("XTEST"):
+                d.close()
+                raise RuntimeError("X server has no XTEST extension")
+            self._display = d
+            self._keys = xkeymap.KeyTapper(d)
+        return self._display
+
+    def _reset(self):
+        try:
+            if self._display is not None:
+                self._display.close()
+        except Exception:
+            pass
+        self._display = None
+
+    def _call(self, fn, *args):
+        with self._lock:
+            d = self._conn()
+            try:
+                out = fn(d, *args)
+                d.sync()
+                return out
+            except Xlib.error.ConnectionClosedError as e:
+                self._reset()
+                self._fail(e)
+                raise
+
+    # ---- pointer ----
+
+    def _button(self, button) -> int:
+        if isinstance(button, int):
+            return button
+        return MOUSE_BUTTONS.get(str(button).lower(), 1)
+
+    def move(self, x: int, y: int):
+        self._call(lambda d: Xlib.ext.xtest.fake_input(d, Xlib.X.MotionNotify, x=int(x), y=int(y)))
+
+    def click(self, button="left", clicks: int = 1, x: int = None, y: int = None):
+        code = self._button(button)
+
+        def run(d):
+            if x is not None and y is not None:
+                Xlib.ext.xtest.fake_input(d, Xlib.X.MotionNotify, x=int(x), y=int(y))
+            for _ in range(max(1, int(clicks))):
+                Xlib.ext.xtest.fake_input(d, Xlib.X.ButtonPress, code)
+                Xlib.ext.xtest.fake_input(d, Xlib.X.ButtonRelease, code)
+        self._call(run)
+
+    def drag(self, x: int, y: int, button="left"):
+        code = self._button(button)
+
+        def run(d):
+            Xlib.ext.xtest.fake_input(d, Xlib.X.ButtonPress, code)
+            d.sync()
+            Xlib.ext.xtest.fake_input(d, Xlib.X.MotionNotify, x=int(x), y=int(y))
+            Xlib.ext.xtest.fake_input(d, Xlib.X.ButtonRelease, code)
+        self._call(run)
+
+    def pointer(self) -> tuple:
+        def run(d):
+            p = d.screen().root.query_pointer()
+            return p.root_x, p.root_y
+        return self._call(run)
+
+    # ---- keyboard ----
+
+    @staticmethod
+    def _char_keysym(ch: str) -> int:
+        if ch == "\n":
+            return Xlib.XK.string_to_keysym("Return")
+        if ch == "\t":
+            return Xlib.XK.string_to_keysym("Tab")
+        o = ord(ch)
+        if 0x20 <= o <= 0x7e or 0xa0 <= o <= 0xff:
+            return o
+        return 0x01000000 | o
+
+    @staticmethod
+    def _name_keysym(name: str) -> int:
+        if len(name) == 1:
+            return XAutomation._char_keysym(name)
+        low = name.lower()
+        if low in KEY_ALIASES:
+            name = KEY_ALIASES[low]
+        elif low[:1] == "f" and low[1:].isdigit():
+            name = "F" + low[1:]
+        keysym = Xlib.XK.string_to_keysym(name)
+        if not keysym:
+            raise ValueError(f"unknown key: {name}")
+        return keysym
+
+    def type_text(self, text: str):
+        self._call(lambda d: self._keys.send([[self._char_keysym(ch)] for ch in text]))
+
+    def press(self, key: str):
+        """
+        One key or an xdotool-style chord: "Return", "enter", "ctrl+shift+t".
+        """
+        names = [k for k in str(key).split("+") if k] or ["+"]
+        self._call(lambda d: self._keys.send([[self._name_keysym(n) for n in names]]))
+
+    def hotkey(self, keys: list):
+        self._call(lambda d: self._keys.send([[self._name_keysym(str(k)) for k in keys]]))
+
+    # ---- windows ----
+
+    def list_windows(self) -> list:
+        return self._call(lambda d: x_describe_windows(d, x_client_ids(d)))
+
+    def describe(self, ids: list) -> list:
+        return self._call(lambda d: x_describe_windows(d, [int(i) for i in ids]))
+
+    def find_windows(self, title: str = "", wm_class: str = "") -> list:
+        title, wm_class = title.lower(), wm_class.lower()
+        return [w for w in self.list_windows()
+                if title in w["title"].lower()
+                and (not wm_class or wm_class in (w["class"].lower(), w["instance"].lower()))]
+
+    def active_window(self) -> int:
+        def run(d):
+            root = d.screen().root
+            prop = root.get_full_property(d.get_atom("_NET_ACTIVE_WINDOW"), Xlib.X.AnyPropertyType)
+            if prop is not None and len(prop.value):
+                return int(prop.value[0])
+            return d.get_input_focus().focus.id
+        return self._call(run)
+
+    def focus(self, window_id: int):
+        def run(d):
+            w = d.create_resource_object("window", int(window_id))
+            w.set_input_focus(Xlib.X.RevertToParent, Xlib.X.CurrentTime)
+        self._call(run)
+
+    def activate(self, window_id: int):
+        """
+        Ask the window manager to raise and focus the window (EWMH
+        _NET_ACTIVE_WINDOW, as `xdotool windowactivate` does).
+        """
+        def run(d):
+            root = d.screen().root
+            ev = Xlib.protocol.event.ClientMessage(
+                window=int(window_id), client_type=d.get_atom("_NET_ACTIVE_WINDOW"),
+                data=(32, [2, Xlib.X.CurrentTime, 0, 0, 0]))
+            root.send_event(ev, event_mask=Xlib.X.SubstructureRedirectMask | Xlib.X.SubstructureNotifyMask)
+        self._call(run)
+
+    def close(self):
+        with self._lock:
+            self._reset()
+
+
+class WindowRegistry:
+    """
+    In-memory index of top-level windows kept current by X events instead of
+    a tree walk per query. A daemon thread owns its own connection, selects
+    SubstructureNotify/PropertyChange on the root and PropertyChange/
+    StructureNotify/FocusChange on every tracked window, and:
+
+    - CreateNotify / _NET_CLIENT_LIST changes start tracking new windows
+      (and also mark them dirty)
+    - DestroyNotify drops them
+    - PropertyNotify (title, class, pid), Configure/Map/Unmap mark a window
+      dirty; dirty windows are re-read in one pipelined batch per wakeup
+    - _NET_ACTIVE_WINDOW / FocusIn track the focused window
+
+    Queries (find, get, active, list) only read the index under a lock.
+    """
+
+    WATCHED_PROPS = ("_NET_WM_NAME", "WM_NAME", "WM_CLASS", "_NET_WM_PID")
+
+    def __init__(self, display_name: str = None):
+        self.display_name = display_name
+        self._lock = threading.Lock()
+        self._windows = {}
+        self._active = None
+        self._thread = None
+        self._stop = threading.Event()
+        self._ready = threading.Event()
+        self._error = None
+        self._stats = {"events": 0, "refreshes": 0, "refreshed_windows": 0, "generation": 0}
+
+    # ---- lifecycle ----
+
+    def start(self, timeout: float = 5.0) -> bool:
+        """
+        Start the event thread (once) and wait for the initial snapshot.
+        """
+        if not XLIB_AVAILABLE:
+            return False
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._ready.clear()
+            self._error = None
+            self._thread = threading.Thread(target=self._run, name="buddy-window-registry", daemon=True)
+            self._thread.start()
+        self._ready.wait(timeout)
+        return self._ready.is_set() and self._error is None
+
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive() and self._ready.is_set()
+
+    def close(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2.0)
+
+    # ---- event thread ----
+
+    def _run(self):
+        try:
+            d = Xlib.display.Display(self.display_name)
+        except Exception as e:
+            self._error = str(e)
+            self._ready.set()
+            return
+        try:
+            root = d.screen().root
+            self._root = root.id
+            self._ewmh_clients = d.get_atom("_NET_CLIENT_LIST")
+            self._ewmh_active = d.get_atom("_NET_ACTIVE_WINDOW")
+            self._watched = {d.get_atom(n) for n in self.WATCHED_PROPS}
+            # select before listing, so nothing created in between is missed
+            root.change_attributes(event_mask=Xlib.X.SubstructureNotifyMask | Xlib.X.PropertyChangeMask)
+            d.sync()
+            self._ewmh = self._has_client_list(d)
+            ids = x_client_ids(d)
+            self._select(d, ids)
+            self._refresh(d, set(ids))
+            self._read_active(d)
+            self._ready.set()
+
+            fd = d.fileno()
+            while not self._stop.is_set():
+                if not d.pending_events():
+                    select.select([fd], [], [], 0.5)
+                dirty = set()
+                while d.pending_events():
+                    self._handle(d, d.next_event(), dirty)
+                if dirty:
+                    self._refresh(d, dirty)
+        except Exception as e:
+            self._error = str(e)
+            logger.error(f"window registry stopped: {e}")
+        finally:
+            self._ready.set()
+            try:
+                d.close()
+            except Exception:
+                pass
+
+    def _has_client_list(self, d) -> bool:
+        prop = d.screen().root.get_full_property(self._ewmh_clients, Xlib.X.AnyPropertyType)
+        return prop is not None and prop.value is not None and len(prop.value) > 0
+
+    def _select(self, d, ids):
+        mask = Xlib.X.PropertyChangeMask | Xlib.X.StructureNotifyMask | Xlib.X.FocusChangeMask
+        for wid in ids:
+            d.create_resource_object("window", wid).change_attributes(
+                event_mask=mask, onerror=lambda *args: None)
+
+    def _refresh(self, d, ids: set):
+        infos = x_describe_windows(d, list(ids))
+        now_ts = time.time()
+        with self._lock:
+            seen = set()
+            for info in infos:
+                if info["override_redirect"]:
+                    continue
+                info["updated_at"] = now_ts
+                self._windows[info["id"]] = info
+                seen.add(info["id"])
+            # gone before we could read them
+            for wid in ids - seen:
+                self._windows.pop(wid, None)
+            self._stats["refreshes"] += 1
+            self._stats["refreshed_windows"] += len(ids)
+            self._stats["generation"] += 1
+
+    def _read_active(self, d):
+        prop = d.screen().root.get_full_property(self._ewmh_active, Xlib.X.AnyPropertyType)
+        if prop is not None and len(prop.value):
+            active = int(prop.value[0]) or None
+        else:
+            active = d.get_input_focus().focus
+            active = getattr(active, "id", None)
+        with self._lock:
+            self._active = active
+
+    def _handle(self, d, ev, dirty: set):
+        self._stats["events"] += 1
+        X = Xlib.X
+        if ev.type == X.CreateNotify:
+            if not self._ewmh and ev.parent.id == self._root and not ev.override:
+                self._select(d, [ev.window.id])
+                dirty.add(ev.window.id)
+        elif ev.type == X.DestroyNotify:
+            wid = ev.window.id
+            dirty.discard(wid)
+            with self._lock:
+                if self._windows.pop(wid, None) is not None:
+                    self._stats["generation"] += 1
+                if self._active == wid:
+                    self._active = None
+        elif ev.type == X.PropertyNotify:
+            wid = ev.window.id
+            if wid == self._root:
+                if ev.atom == self._ewmh_clients:
+                    self._ewmh = True
+                    ids = set(x_client_ids(d))
+                    with self._lock:
+                        known = set(self._windows)
+                        for gone in known - ids:
+                            self._windows.pop(gone, None)
+                    self._select(d, ids - known)
+                    dirty.update(ids - known)
+                elif ev.atom == self._ewmh_active:
+                    self._read_active(d)
+            elif ev.atom in self._watched and wid in self._windows:
+                dirty.add(wid)
+        elif ev.type in (X.ConfigureNotify, X.MapNotify, X.UnmapNotify):
+            if ev.window.id in self._windows or ev.window.id in dirty:
+                dirty.add(ev.window.id)
+        elif ev.type == X.FocusIn:
+            if ev.window.id in self._windows:
+                with self._lock:
+                    self._active = ev.window.id
+
+    # ---- queries ----
+
+    def list(self) -> list:
+        with self._lock:
+            return [dict(w) for w in self._windows.values()]
+
+    def get(self, window_id: int) -> dict:
+        with self._lock:
+            w = self._windows.get(int(window_id))
+            return dict(w) if w else None
+
+    def active(self) -> dict:
+        with self._lock:
+            w = self._windows.get(self._active) if self._active else None
+            return dict(w) if w else ({"id": self._active} if self._active else None)
+
+    def find(self, title: str = "", match: str = "substring", wm_class: str = "", pid: int = None,
+             at=None, mapped_only: bool = False, threshold: float = 0.6, limit: int = 0) -> list:
+        """
+        Windows matching every given filter. Title match modes: substring
+        (case-insensitive), exact, regex (re.search) or fuzzy (difflib ratio
+        >= threshold against the whole title or a run of its words about as
+        long as the query; best first). `at` = [x, y] keeps windows whose
+        geometry contains the point.
+        """
+        if match == "regex":
+            pattern = re.compile(title, re.IGNORECASE)
+        needle = title.lower()
+        wm_class = wm_class.lower()
+        with self._lock:
+            windows = [dict(w) for w in self._windows.values()]
+
+        scored = []
+        for w in windows:
+            if mapped_only and not w["mapped"]:
+                continue
+            if wm_class and wm_class not in (w["class"].lower(), w["instance"].lower()):
+                continue
+            if pid is not None and w["pid"] != int(pid):
+                continue
+            if at is not None:
+                x, y = int(at[0]), int(at[1])
+                if not (w["x"] <= x < w["x"] + w["width"] and w["y"] <= y < w["y"] + w["height"]):
+                    continue
+            score = 1.0
+            if title:
+                hay = w["title"].lower()
+                if match == "exact":
+                    ok = hay == needle
+                elif match == "regex":
+                    ok = pattern.search(w["title"]) is not None
+                elif match == "fuzzy":
+                    score = self._fuzzy(needle, hay, threshold)
+                    ok = score >= threshold
+                else:
+                    ok = needle in hay
+                if not ok:
+                    continue
+            w["score"] = round(score, 3)
+            scored.append(w)
+        if match == "fuzzy":
+            scored.sort(key=lambda w: -w["score"])
+        return scored[:limit] if limit else scored
+
+    @staticmethod
+    def _fuzzy(needle: str, hay: str, floor: float = 0.0) -> float:
+        """
+        Best difflib ratio of the needle against the whole title and against
+        each run of consecutive words about as long as the needle (so
+        "fierfox" still finds "Mozilla Firefox - Inbox"); 0.0 when nothing
+        reaches `floor`. The needle is the cached side, and the quick upper
+        bounds skip candidates that cannot beat the current best.
+        """
+        if not needle or not hay:
+            return 0.0
+        if needle in hay:
+            return 1.0
+        candidates = [hay]
+        words = hay.split()
+        if len(hay) > len(needle):
+            for i in range(len(words)):
+                chunk = ""
+                for word in words[i:]:
+                    chunk = f"{chunk} {word}".strip()
+                    if len(chunk) >= len(needle):
+                        break
+                candidates.append(chunk)
+        sm = difflib.SequenceMatcher(None, autojunk=False)
+        sm.set_seq2(needle)
+        best = 0.0
+        for c in candidates:
+            sm.set_seq1(c)
+            bound = max(best, floor)
+            if sm.real_quick_ratio() >= bound and sm.quick_ratio() >= bound:
+                best = max(best, sm.ratio())
+        return best if best >= floor else 0.0
+
+    def stats(self) -> dict:
+        with self._lock:
+            out = dict(self._stats)
+            out.update(windows=len(self._windows), active=self._active, running=self.running(),
+                       ewmh=getattr(self, "_ewmh", False), error=self._error)
+        return out
+
+
 # -----------------------------
 # BuddyActionsDaemon Class
 # -----------------------------
@@ -131,6 +1035,25 @@ class BuddyActionsDaemon:
         self.memory_file = "/var/lib/buddy/memory.json"
         self.memory = self._load_memory()
 
+        self.capture = CaptureEngine(
+            os.environ.get("BUDDY_CAPTURE_DIR", ""),
+            int(os.environ.get("BUDDY_CAPTURE_POOL", "8")),
+        )
+        atexit.register(self.capture.close)
+
+        # "xlib" drives mouse/keyboard/windows through XAutomation when an X
+        # server with XTEST is reachable; "legacy" keeps pyautogui + xdotool
+        self.x_backend = os.environ.get("BUDDY_X_BACKEND", "xlib").strip().lower()
+        self.xauto = XAutomation(retry_s=float(os.environ.get("BUDDY_X_RETRY_S", "30")))
+        self._x_pinned = threading.local()  # backend an input_macro on this thread is using
+        # event-driven window index for find/list/active (BUDDY_WINDOW_CACHE=0 re-reads the tree per query)
+        self.enable_window_cache = os.environ.get("BUDDY_WINDOW_CACHE", "1").strip() in ("1", "true", "yes", "on")
+        self.window_registry = WindowRegistry()
+        atexit.register(self.window_registry.close)
+
+        # Initialize GUI automation
+        self._init_gui_automation()
+
     # ---------------------------------------------------------------------
     # Memory persistence helpers
     # ---------------------------------------------------------------------
@@ -158,10 +1081,6 @@ class BuddyActionsDaemon:
         except Exception as e:
             logger.error(f"Failed to save Buddy memory: {e}")
 
-
-        # Initialize GUI automation
-        self._init_gui_automation()
-
     def _load_policy(self):
         try:
             return read_json(self.policy_path)
@@ -176,18 +1095,27 @@ class BuddyActionsDaemon:
         Initialize GUI automation capabilities
         """
         if not PYAUTOGUI_AVAILABLE:
-            self.enable_screen_control = False
-            return False
+            # XAutomation/CaptureEngine can still drive the screen through Xlib
+            if not XLIB_AVAILABLE:
+                self.enable_screen_control = False
+            return XLIB_AVAILABLE
         try:
-            # Set pyautogui defaults
+            # Set pyautogui defaults. No implicit sleep after every call:
+            # pacing belongs to the caller (input_macro delay_ms / wait steps)
             pyautogui.FAILSAFE = True
-            pyautogui.PAUSE = 0.5
+            pyautogui.PAUSE = float(os.environ.get("BUDDY_INPUT_PAUSE", "0"))
             return True
         except Exception as e:
             print(f"Warning: GUI automation initialization failed: {e}")
             self.enable_screen_control = False
             return False
 
+    def _use_xauto(self) -> bool:
+        pinned = getattr(self._x_pinned, "xauto", None)
+        if pinned is not None:
+            return pinned
+        return self.x_backend == "xlib" and self.xauto.available()
+
     # -----------------------------
     # Action Executors
     # -----------------------------
@@ -213,17 +1141,32 @@ class BuddyActionsDaemon:
     def _execute_screen_capture(self, params: dict) -> tuple:
         if not self.enable_screen_control:
             return False, {}, "screen control disabled"
+        fmt = str(params.get("format", "png")).lower()
+        if fmt == "jpg":
+            fmt = "jpeg"
+        if fmt not in CAPTURE_FORMATS:
+            return False, {}, f"unsupported format: {fmt} (expected one of {', '.join(CAPTURE_FORMATS)})"
         try:
-            # Capture full screen or specific region
-            region = params.get("region")
-            if region:
-                screenshot = ImageGrab.grab(bbox=region)  # (x1, y1, x2, y2)
-            else:
-                screenshot = ImageGrab.grab()
-            # Save to temporary file
-            temp_file = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
-            screenshot.save(temp_file.name, "PNG")
-            return True, {"screenshot_path": temp_file.name}, "screenshot captured"
+            if params.get("damage"):
+                output = self.capture.capture_damage(
+                    region=params.get("region"),
+                    fmt=fmt if "format" in params else "jpeg",
+                    quality=int(params.get("quality", 80)),
+                    key=str(params.get("damage_key", "")),
+                    tile=int(params.get("tile", 64)),
+                    full_ratio=float(params.get("full_ratio", 0.5)),
+                    reset=bool(params.get("reset", False)),
+                )
+                return True, output, "damage captured" if output["changed"] else "no change"
+            # Capture full screen or specific region (x1, y1, x2, y2)
+            output = self.capture.capture(
+                region=params.get("region"),
+                fmt=fmt,
+                quality=int(params.get("quality", 80)),
+                max_size=int(params.get("max_size", 512)),
+                inline=bool(params.get("inline", False)),
+            )
+            return True, output, "screenshot captured"
         except Exception as e:
             return False, {}, f"screenshot failed: {str(e)}"
 
@@ -232,19 +1175,29 @@ class BuddyActionsDaemon:
             return False, {}, "screen control disabled"
         try:
             action = params.get("action", "")
+            xauto = self._use_xauto()
             if action == "move":
                 x, y = params.get("x", 0), params.get("y", 0)
-                pyautogui.moveTo(x, y)
+                if xauto:
+                    self.xauto.move(x, y)
+                else:
+                    pyautogui.moveTo(x, y)
                 return True, {"x": x, "y": y}, "mouse moved"
             elif action == "click":
                 button = params.get("button", "left")
                 clicks = params.get("clicks", 1)
-                pyautogui.click(button=button, clicks=clicks)
+                if xauto:
+                    self.xauto.click(button, clicks)
+                else:
+                    pyautogui.click(button=button, clicks=clicks)
                 return True, {"button": button, "clicks": clicks}, "mouse clicked"
             elif action == "drag":
                 x, y = params.get("x", 0), params.get("y", 0)
                 button = params.get("button", "left")
-                pyautogui.dragTo(x, y, button=button)
+                if xauto:
+                    self.xauto.drag(x, y, button)
+                else:
+                    pyautogui.dragTo(x, y, button=button)
                 return True, {"x": x, "y": y, "button": button}, "mouse dragged"
             else:
                 return False, {}, f"unknown mouse action: {action}"
@@ -256,17 +1209,27 @@ class BuddyActionsDaemon:
             return False, {}, "screen control disabled"
         try:
             action = params.get("action", "")
+            xauto = self._use_xauto()
             if action == "type":
                 text = params.get("text", "")
-                pyautogui.write(text)
+                if xauto:
+                    self.xauto.type_text(text)
+                else:
+                    pyautogui.write(text)
                 return True, {"text_length": len(text)}, "text typed"
             elif action == "press":
                 key = params.get("key", "")
-                pyautogui.press(key)
+                if xauto:
+                    self.xauto.press(key)
+                else:
+                    pyautogui.press(key)
                 return True, {"key": key}, "key pressed"
             elif action == "hotkey":
                 keys = params.get("keys", [])
-                pyautogui.hotkey(*keys)
+                if xauto:
+                    self.xauto.hotkey(keys)
+                else:
+                    pyautogui.hotkey(*keys)
                 return True, {"keys": keys}, "hotkey pressed"
             else:
                 return False, {}, f"unknown keyboard action: {action}"
@@ -278,6 +1241,8 @@ class BuddyActionsDaemon:
             return False, {}, "screen control disabled"
         try:
             action = params.get("action", "")
+            if self._use_xauto():
+                return self._xauto_window_management(action, params)
             if action == "find":
                 title = params.get("title", "")
                 # Use xdotool to find windows
@@ -296,6 +1261,216 @@ class BuddyActionsDaemon:
         except Exception as e:
             return False, {}, f"window management failed: {str(e)}"
 
+    def _registry(self):
+        if self.enable_window_cache and self.window_registry.start():
+            return self.window_registry
+        return None
+
+    def _xauto_window_management(self, action: str, params: dict) -> tuple:
+        registry = self._registry()
+        if action == "find":
+            if registry is not None:
+                match = params.get("match", "substring")
+                if match not in ("substring", "exact", "regex", "fuzzy"):
+                    return False, {}, f"unknown match mode: {match}"
+                try:
+                    matches = registry.find(
+                        title=params.get("title", ""), match=match, wm_class=params.get("class", ""),
+                        pid=params.get("pid"), at=params.get("at"),
+                        mapped_only=bool(params.get("mapped_only", False)),
+                        threshold=float(params.get("threshold", 0.6)), limit=int(params.get("limit", 0)))
+                except re.error as e:
+                    return False, {}, f"bad title regex: {e}"
+            else:
+                matches = self.xauto.find_windows(params.get("title", ""), params.get("class", ""))
+            if not matches:
+                return False, {}, "no windows found"
+            # "windows" keeps the xdotool shape (decimal id strings)
+            return True, {"windows": [str(w["id"]) for w in matches], "matches": matches}, "windows found"
+        elif action == "list":
+            windows = registry.list() if registry is not None else self.xauto.list_windows()
+            return True, {"windows": windows}, "windows listed"
+        elif action == "active":
+            if registry is not None:
+                window = registry.active()
+                return True, {"window_id": str(window["id"]) if window else "", "window": window}, "active window"
+            return True, {"window_id": str(self.xauto.active_window())}, "active window"
+        elif action == "cache_stats":
+            return True, self.window_registry.stats(), "window cache stats"
+        elif action in ("focus", "activate"):
+            window_id = params.get("window_id", "")
+            if action == "focus":
+                self.xauto.focus(int(window_id))
+                return True, {"window_id": window_id}, "window focused"
+            self.xauto.activate(int(window_id))
+            return True, {"window_id": window_id}, "window activated"
+        return False, {}, f"unknown window action: {action}"
+
+    # -----------------------------
+    # Input macros
+    # -----------------------------
+
+    MACRO_OPS = (
+        "move", "click", "drag", "type", "press", "hotkey", "sleep", "focus", "activate",
+        "wait_window", "wait_title_change", "wait_stable",
+    )
+
+    def _execute_input_macro(self, params: dict) -> tuple:
+        """
+        Run a sequence of input steps in one request. Each step is a dict with
+        "op" plus that op's params, and an optional "delay_ms" to sleep after
+        it (default: the macro's default_delay_ms, 0). Wait steps poll for a
+        condition instead of sleeping a fixed time and fail on timeout_ms.
+        The whole macro is bounded by timeout_s; it stops at the first failed
+        step unless stop_on_error is false.
+        """
+        if not self.enable_screen_control:
+            return False, {}, "screen control disabled"
+        steps = params.get("steps", [])
+        max_steps = int(os.environ.get("BUDDY_MACRO_MAX_STEPS", "500"))
+        if not isinstance(steps, list) or not steps:
+            return False, {}, "steps must be a non-empty list"
+        if len(steps) > max_steps:
+            return False, {}, f"too many steps: {len(steps)} > {max_steps}"
+        for i, step in enumerate(steps):
+            if not isinstance(step, dict) or step.get("op") not in self.MACRO_OPS:
+                return False, {}, f"step {i}: op must be one of {', '.join(self.MACRO_OPS)}"
+
+        default_delay = float(params.get("default_delay_ms", 0)) / 1000.0
+        stop_on_error = bool(params.get("stop_on_error", True))
+        deadline = time.monotonic() + float(params.get("timeout_s", 60))
+        t0 = time.monotonic()
+        results = []
+        failed = None
+        # pick the backend once; if the X connection drops mid-macro, the
+        # remaining steps go to pyautogui instead of reconnecting per step
+        self._x_pinned.xauto = self._use_xauto()
+        try:
+            for i, step in enumerate(steps):
+                op = step["op"]
+                started = time.monotonic()
+                if started >= deadline:
+                    ok, out, msg = False, {}, "macro timeout_s exceeded"
+                else:
+                    try:
+                        ok, out, msg = self._macro_step(op, step, deadline)
+                    except Exception as e:
+                        ok, out, msg = False, {}, f"{op} failed: {str(e)}"
+                    if self._x_pinned.xauto and self.xauto._failed is not None:
+                        self._x_pinned.xauto = False
+                entry = {"index": i, "op": op, "ok": ok, "message": msg,
+                         "ms": round((time.monotonic() - started) * 1000, 2)}
+                entry.update(out)
+                results.append(entry)
+                if not ok:
+                    if failed is None:
+                        failed = entry
+                    if stop_on_error:
+                        break
+                    continue
+                delay = float(step["delay_ms"]) / 1000.0 if "delay_ms" in step else default_delay
+                if delay > 0:
+                    time.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+        finally:
+            self._x_pinned.xauto = None
+
+        output = {
+            "steps": results,
+            "completed": sum(1 for r in results if r["ok"]),
+            "total": len(steps),
+            "elapsed_ms": round((time.monotonic() - t0) * 1000, 2),
+        }
+        if failed is not None:
+            return False, output, f"macro step {failed['index']} ({failed['op']}) failed: {failed['message']}"
+        return True, output, "macro completed"
+
+    def _macro_step(self, op: str, step: dict, deadline: float) -> tuple:
+        if op in ("move", "drag"):
+            return self._execute_mouse_control(dict(step, action=op))
+        if op == "click":
+            if "x" in step and "y" in step:
+                ok, out, msg = self._execute_mouse_control({"action": "move", "x": step["x"], "y": step["y"]})
+                if not ok:
+                    return ok, out, msg
+            return self._execute_mouse_control(dict(step, action="click"))
+        if op in ("type", "press", "hotkey"):
+            return self._execute_keyboard_control(dict(step, action=op))
+        if op == "sleep":
+            time.sleep(min(float(step.get("ms", 0)) / 1000.0, max(0.0, deadline - time.monotonic())))
+            return True, {}, "slept"
+        if op in ("focus", "activate"):
+            window_id = step.get("window_id")
+            if not window_id and step.get("title"):
+                ok, out, msg = self._execute_window_management(
+                    {"action": "find", "title": step["title"], "match": step.get("match", "substring")})
+                if not ok:
+                    return ok, out, msg
+                window_id = out["windows"][0]
+            return self._execute_window_management({"action": op, "window_id": str(window_id)})
+
+        timeout = min(float(step.get("timeout_ms", 5000)) / 1000.0, max(0.0, deadline - time.monotonic()))
+        interval = float(step.get("interval_ms", 20)) / 1000.0
+        if op == "wait_window":
+            title, match = step.get("title", ""), step.get("match", "substring")
+            if step.get("active", True):
+                cond = lambda: self._title_matches(self._active_title(), title, match)
+            else:
+                cond = lambda: self._execute_window_management(
+                    {"action": "find", "title": title, "match": match})[0]
+            if self._wait_until(cond, timeout, interval):
+                return True, {"title": self._active_title()}, "window matched"
+            return False, {"title": self._active_title()}, f"timed out waiting for window {title!r}"
+        if op == "wait_title_change":
+            before = step["from"] if "from" in step else self._active_title()
+            if self._wait_until(lambda: self._active_title() != before, timeout, interval):
+                return True, {"from": before, "title": self._active_title()}, "title changed"
+            return False, {"from": before}, "timed out waiting for title change"
+        # wait_stable: region unchanged for stable_ms
+        region = step.get("region")
+        stable = float(step.get("stable_ms", 250)) / 1000.0
+        interval = float(step.get("interval_ms", 50)) / 1000.0
+        end = time.monotonic() + timeout
+        last = self.capture.grab(region)[2]
+        changed_at = time.monotonic()
+        while True:
+            if time.monotonic() - changed_at >= stable:
+                return True, {}, "region stable"
+            if time.monotonic() >= end:
+                return False, {}, "timed out waiting for region to stabilize"
+            time.sleep(interval)
+            frame = self.capture.grab(region)[2]
+            if frame != last:
+                last, changed_at = frame, time.monotonic()
+
+    @staticmethod
+    def _wait_until(cond, timeout: float, interval: float) -> bool:
+        end = time.monotonic() + timeout
+        while True:
+            if cond():
+                return True
+            if time.monotonic() >= end:
+                return False
+            time.sleep(interval)
+
+    @staticmethod
+    def _title_matches(title: str, pattern: str, match: str) -> bool:
+        if match == "regex":
+            return re.search(pattern, title, re.IGNORECASE) is not None
+        if match == "exact":
+            return title.lower() == pattern.lower()
+        return pattern.lower() in title.lower()
+
+    def _active_title(self) -> str:
+        if not self._use_xauto():
+            return ""
+        registry = self._registry()
+        if registry is not None:
+            window = registry.active()
+            return (window or {}).get("title", "")
+        wid = self.xauto.active_window()
+        infos = self.xauto.describe([wid]) if wid else []
+        return infos[0]["title"] if infos else ""
+
     def _execute_docker_control(self, params: dict) -> tuple:
         if not self.enable_docker_control:
             return False, {}, "docker control disabled"
@@ -374,7 +1549,7 @@ class BuddyActionsDaemon:
         logger.info(f"Executing action: {action} with params: {params}")
         
         # Check policy for action
-        if action in ["mkdir", "write_file", "list_dir", "launch_app", "shell", "screen_capture", "mouse_control", "keyboard_control", "window_management", "docker_control", "network_admin"]:
+        if action in ["mkdir", "write_file", "list_dir", "launch_app", "shell", "screen_capture", "mouse_control", "keyboard_control", "window_management", "input_macro", "docker_control", "network_admin"]:
             # For file operations, check path permission
             path = params.get("path", "")
             if action in ["mkdir", "write_file", "list_dir"] and path:
@@ -448,6 +1623,9 @@ class BuddyActionsDaemon:
         elif action == "window_management":
             return self._execute_window_management(params)
 
+        elif action == "input_macro":
+            return self._execute_input_macro(params)
+
         elif action == "docker_control":
             return self._execute_docker_control(params)
 
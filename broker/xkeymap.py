@@ -0,0 +1,104 @@
+"""
+XTest key taps over python-xlib, shared by broker/buddy_actionsd.py
+(XAutomation) and buddy/broker/buddy_actionsd.py (BuddyActions).
+
+Keysyms the current layout has no plain or shifted slot for are bound to a
+spare ("scratch") keycode while they are typed, as xdotool does. The binding
+stays for the rest of the call, so repeats of a character reuse it, and is
+reverted by send() when the call ends. Before the scratch keycode is rebound
+or reverted the connection is synced and then given settle_s: sync() only
+proves the server has generated the key events, while a client that reads
+the keymap lazily when it handles them would otherwise translate the keycode
+with the new mapping and type the wrong character.
+"""
+import time
+
+import Xlib.X
+import Xlib.XK
+import Xlib.ext.xtest
+
+SETTLE_S = 0.02
+
+
+class KeyTapper:
+    def __init__(self, display, settle_s: float = SETTLE_S):
+        self.display = display
+        self.settle_s = settle_s
+        self._scratch = None  # spare keycode; 0 when the keymap has none
+        self._bound = None  # keysym currently bound to the scratch keycode
+
+    def scratch_keycode(self) -> int:
+        if self._scratch is None:
+            first = self.display.display.info.min_keycode
+            count = self.display.display.info.max_keycode - first + 1
+            self._scratch = 0
+            for i, syms in enumerate(self.display.get_keyboard_mapping(first, count)):
+                if not any(syms):
+                    self._scratch = first + i
+                    break
+        return self._scratch
+
+    def _settle(self):
+        self.display.sync()
+        if self.settle_s > 0:
+            time.sleep(self.settle_s)
+
+    def keycode(self, keysym: int, chord_scratch: list) -> tuple:
+        """
+        (keycode, needs_shift) for a keysym, binding it to the scratch
+        keycode when the current keymap has no plain or shifted slot for it.
+        chord_scratch collects the keysym taking the scratch keycode within
+        one chord; only one key per chord can.
+        """
+        for code, index in self.display.keysym_to_keycodes(keysym):
+            if index in (0, 1):
+                return code, index == 1
+        if chord_scratch and chord_scratch[0] != keysym:
+            raise ValueError("only one key per chord can be outside the keymap")
+        scratch = self.scratch_keycode()
+        if not scratch:
+            raise ValueError(f"keysym 0x{keysym:x} not in keymap and no spare keycode")
+        chord_scratch.append(keysym)
+        if self._bound != keysym:
+            if self._bound is not None:
+                self._settle()  # the previous character's events go out first
+            self.display.change_keyboard_mapping(scratch, [(keysym, keysym)])
+            self.display.sync()
+            self._bound = keysym
+        return scratch, False
+
+    def tap(self, keysyms: list):
+        """
+        Press keysyms in order and release them in reverse (a chord when
+        there is more than one). Shifted symbols keep their Shift inside
+        chords too ("ctrl+A").
+        """
+        shift = self.display.keysym_to_keycode(Xlib.XK.string_to_keysym("Shift_L"))
+        chord_scratch = []
+        codes = []
+        for keysym in keysyms:
+            code, needs_shift = self.keycode(keysym, chord_scratch)
+            if needs_shift and shift not in codes:
+                codes.append(shift)
+            codes.append(code)
+        for code in codes:
+            Xlib.ext.xtest.fake_input(self.display, Xlib.X.KeyPress, code)
+        for code in reversed(codes):
+            Xlib.ext.xtest.fake_input(self.display, Xlib.X.KeyRelease, code)
+
+    def release(self):
+        """Reverts the scratch keycode once the typed events have been handled."""
+        if self._bound is None:
+            return
+        self._settle()
+        self.display.change_keyboard_mapping(self._scratch, [(Xlib.X.NoSymbol, Xlib.X.NoSymbol)])
+        self.display.sync()
+        self._bound = None
+
+    def send(self, chords: list):
+        """Taps each chord (a list of keysyms) in turn, then releases the scratch keycode."""
+        try:
+            for keysyms in chords:
+                self.tap(keysyms)
+        finally:
+            self.release()
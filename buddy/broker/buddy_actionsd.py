@@ -1,13 +1,32 @@
 import Xlib
 import Xlib.display
+import Xlib.error
+import Xlib.ext.xtest
+import Xlib.protocol.request
+import Xlib.X
+import Xlib.Xatom
+import Xlib.XK
 from PIL import Image
+import importlib.util
 import subprocess
 import os
 
+def load_xkeymap():
+    # XTest key taps with scratch-keycode remapping, shared with the actions
+    # daemon: broker/xkeymap.py at the repo (install) root
+    path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "broker", "xkeymap.py")
+    spec = importlib.util.spec_from_file_location("xkeymap", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+xkeymap = load_xkeymap()
+
 class BuddyActions:
     def __init__(self):
         self.display = Xlib.display.Display()
         self.root = self.display.screen().root
+        self.keys = xkeymap.KeyTapper(self.display)
 
     def screen_capture(self):
         # Capture full screen
@@ -22,29 +41,55 @@ class BuddyActions:
         self.display.sync()
 
     def mouse_click(self, button=1):
-        # Button 1 = left, 3 = right
-        self.root.send_event(Xlib.X.ButtonPress, button=button)
-        self.root.send_event(Xlib.X.ButtonRelease, button=button)
+        # Button 1 = left, 3 = right (synthesized with XTest)
+        Xlib.ext.xtest.fake_input(self.display, Xlib.X.ButtonPress, button)
+        Xlib.ext.xtest.fake_input(self.display, Xlib.X.ButtonRelease, button)
         self.display.sync()
 
+    @staticmethod
+    def _char_keysym(ch):
+        name = {"\n": "Return", "\t": "Tab"}.get(ch)
+        if name:
+            return Xlib.XK.string_to_keysym(name)
+        return ord(ch) if ord(ch) <= 0xff else 0x01000000 | ord(ch)
+
     def keyboard_type(self, text):
-        # Use xdotool for typing
-        subprocess.run(["xdotool", "type", text])
+        # Type through XTest on the open connection (no xdotool fork)
+        self.keys.send([[self._char_keysym(ch)] for ch in text])
+        self.display.sync()
 
     def keyboard_press(self, key):
-        # Use xdotool for key press
-        subprocess.run(["xdotool", "key", key])
+        # xdotool-style key names, "+" for chords: "Return", "ctrl+c"
+        aliases = {"ctrl": "Control_L", "shift": "Shift_L", "alt": "Alt_L", "super": "Super_L"}
+        keysyms = []
+        for name in [k for k in key.split("+") if k] or ["+"]:
+            if len(name) == 1:
+                keysyms.append(self._char_keysym(name))
+                continue
+            keysym = Xlib.XK.string_to_keysym(aliases.get(name.lower(), name))
+            if not keysym:
+                raise ValueError(f"unknown key: {name}")
+            keysyms.append(keysym)
+        self.keys.send([keysyms])
+        self.display.sync()
 
     def window_find(self, title):
-        # Find windows by title
+        # Find windows by title: fetch every top-level window's name in one
+        # pipelined batch instead of one get_wm_name() round trip each
         windows = self.root.query_tree().children
-        for window in windows:
+        pending = [(window, Xlib.protocol.request.GetProperty(
+            display=self.display.display, defer=True, delete=False, window=window.id,
+            property=Xlib.Xatom.WM_NAME, type=Xlib.X.AnyPropertyType,
+            long_offset=0, long_length=1024)) for window in windows]
+        for window, r in pending:
             try:
-                name = window.get_wm_name()
-                if name and title in name:
-                    return window
-            except:
+                r.reply()
+            except Xlib.error.XError:
                 continue
+            if r.property_type and r.value[0] == 8:
+                name = bytes(r.value[1]).decode("latin-1", "replace")
+                if title in name:
+                    return window
         return None
 
     def window_focus(self, window_id):
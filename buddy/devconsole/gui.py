@@ -1,8 +1,30 @@
 import gi
 gi.require_version('Gtk', '3.0')
 from gi.repository import Gtk, Gdk, GLib
+import json
+import os
 import threading
 import time
+import urllib.error
+import urllib.request
+
+BUDDY_BASE = os.environ.get("BUDDY_BASE", "http://127.0.0.1:8765")
+
+def decode_reply(body, status):
+    # Broker replies are JSON; a proxy or HTML error page becomes an error reply
+    try:
+        reply = json.loads(body or b"{}")
+    except ValueError:
+        return {"ok": False, "error": f"HTTP {status}: non-JSON reply"}
+    return reply if isinstance(reply, dict) else {"ok": False, "error": f"HTTP {status}: unexpected reply"}
+
+def broker_call(method, path):
+    req = urllib.request.Request(BUDDY_BASE + path, method=method, data=b"" if method == "POST" else None)
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return decode_reply(resp.read(), resp.status)
+    except urllib.error.HTTPError as e:
+        return decode_reply(e.read(), e.code)
 
 class BuddyDevConsole(Gtk.Window):
     def __init__(self):
@@ -42,8 +64,11 @@ class BuddyDevConsole(Gtk.Window):
         self.modify_button.connect("clicked", self.on_modify_button_clicked)
         hbox.pack_start(self.modify_button, True, True, 0)
 
-        # Start a thread to simulate real-time updates
-        self.update_thread = threading.Thread(target=self.simulate_updates)
+        # The broker job the Pause/Cancel buttons act on (newest running/paused job)
+        self.current_job = None
+
+        # Start a thread to follow broker jobs
+        self.update_thread = threading.Thread(target=self.poll_jobs)
         self.update_thread.daemon = True
         self.update_thread.start()
 
@@ -59,14 +84,45 @@ class BuddyDevConsole(Gtk.Window):
         self.move(x, y)
 
     def on_pause_button_clicked(self, button):
-        self.add_log_entry("Pause button clicked")
+        job = self.current_job
+        if job is None:
+            self.add_log_entry("No running job to pause")
+            return
+        op = "resume" if job["status"] == "paused" else "pause"
+        self.run_in_background(self.job_request, "POST", f"/jobs/{job['action_id']}/{op}")
 
     def on_cancel_button_clicked(self, button):
-        self.add_log_entry("Cancel button clicked")
+        job = self.current_job
+        if job is None:
+            self.add_log_entry("No running job to cancel")
+            return
+        self.run_in_background(self.job_request, "DELETE", f"/jobs/{job['action_id']}")
 
     def on_modify_button_clicked(self, button):
         self.add_log_entry("Modify button clicked")
 
+    def run_in_background(self, fn, *args):
+        threading.Thread(target=fn, args=args, daemon=True).start()
+
+    def job_request(self, method, path):
+        try:
+            resp = broker_call(method, path)
+        except OSError as e:
+            self.log_from_thread(f"{method} {path} failed: {e}")
+            return
+        if resp.get("ok"):
+            self.log_from_thread(f"Job {resp.get('action_id')}: {resp.get('status')}")
+        else:
+            self.log_from_thread(f"{method} {path}: {resp.get('error', 'failed')}")
+
+    def log_from_thread(self, text):
+        GLib.idle_add(self.add_log_entry, text)
+
+    def set_current_job(self, job):
+        self.current_job = job
+        self.pause_button.set_label("Resume" if job and job["status"] == "paused" else "Pause")
+        return False
+
     def add_log_entry(self, text):
         buffer = self.log_view.get_buffer()
         buffer.insert(buffer.get_end_iter(), text + "\n")
@@ -74,13 +130,21 @@ class BuddyDevConsole(Gtk.Window):
         adjustment = self.log_view.get_vadjustment()
         adjustment.set_value(adjustment.get_upper() - adjustment.get_page_size())
 
-    def simulate_updates(self):
-        # Simulate real-time command execution and GUI actions
+    def poll_jobs(self):
+        # Follow broker jobs: log status changes, track the newest active job
+        seen = {}
         while True:
             time.sleep(1)
-            self.add_log_entry(f"Executing command: ls -l at {time.strftime('%H:%M:%S')}")
-            self.add_log_entry(f"Mouse moved to (100, 100) at {time.strftime('%H:%M:%S')}")
-            self.add_log_entry(f"Window 'Terminal' focused at {time.strftime('%H:%M:%S')}")
+            try:
+                jobs = broker_call("GET", "/jobs").get("jobs", [])
+            except (OSError, ValueError):
+                continue  # keep polling: the broker may be restarting
+            for job in jobs:
+                if seen.get(job["action_id"]) != job["status"]:
+                    seen[job["action_id"]] = job["status"]
+                    self.log_from_thread(f"{job['action']} {job['action_id'][:8]}: {job['status']} at {time.strftime('%H:%M:%S')}")
+            active = [j for j in jobs if j["status"] in ("running", "paused")]
+            GLib.idle_add(self.set_current_job, active[-1] if active else None)
 
 if __name__ == "__main__":
     app = BuddyDevConsole()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Benchmark: screen_capture frames/sec per output format, and damage mode
+(unchanged frame, one small widget changed, whole screen changed).
+
+Grabs from $DISPLAY through the broker's CaptureEngine when an X server is
+available; otherwise encodes a synthetic BGRX frame of the given size so the
+encode and pool paths can still be measured. Also times the old
+pyscreenshot + NamedTemporaryFile PNG path for comparison when it can run.
+
+usage: bench_capture.py [seconds] [WxH]     (default: 3 1920x1080)
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+def load_broker():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    path = os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(repo_root, "broker", "buddy_actionsd.py"),
+    )
+    spec = importlib.util.spec_from_file_location("buddy_actionsd", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+bd = load_broker()
+
+def synthetic_frame(w, h):
+    # Gradient with some edges, so the encoders have realistic work to do
+    row = bytearray()
+    for x in range(w):
+        v = (x * 255) // max(1, w - 1)
+        row += bytes((v, (x // 16 % 2) * 255, 255 - v, 0))
+    rows = []
+    for y in range(h):
+        shift = (y % 64) * 4
+        rows.append(bytes(row[shift:]) + bytes(row[:shift]))
+    return b"".join(rows)
+
+def rate(fn, seconds):
+    n = 0
+    t0 = time.perf_counter()
+    while time.perf_counter() - t0 < seconds:
+        fn()
+        n += 1
+    dt = time.perf_counter() - t0
+    return n / dt, dt * 1000 / n
+
+def main():
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 3.0
+    size = sys.argv[2] if len(sys.argv) > 2 else "1920x1080"
+    w, h = (int(v) for v in size.lower().split("x"))
+
+    engine = bd.CaptureEngine(tempfile.mkdtemp(prefix="buddy-bench-capture-"), 8)
+    live = bd.XLIB_AVAILABLE or bd.PYAUTOGUI_AVAILABLE
+    if live:
+        w, h, frame = engine.grab()
+        print(f"live capture from {os.environ.get('DISPLAY', '?')} ({w}x{h}, "
+              f"{'xlib' if bd.XLIB_AVAILABLE else 'pyscreenshot'})")
+        fps, ms = rate(engine.grab, seconds)
+        print(f"{'grab':<12} {fps:8.1f} fps {ms:8.2f} ms/frame")
+    else:
+        print(f"no X display: synthetic {w}x{h} BGRX frame (encode + pool only)")
+        frame = synthetic_frame(w, h)
+
+    try:
+        for fmt in bd.CAPTURE_FORMATS:
+            if live:
+                fn = lambda: engine.capture(fmt=fmt, quality=80)
+            else:
+                def fn():
+                    out, ext, _, _ = engine.encode(w, h, frame, fmt, 80)
+                    engine._write_slot(ext, out)
+            fps, ms = rate(fn, seconds)
+            size_kb = len(engine.encode(w, h, frame, fmt, 80)[0]) / 1024
+            print(f"{fmt:<12} {fps:8.1f} fps {ms:8.2f} ms/frame {size_kb:10.1f} KiB")
+
+        # Damage mode against a static frame: replay fixed frames through grab()
+        frames = {"cur": frame}
+        engine.grab = lambda region=None: (w, h, frames["cur"])
+        widget = bytearray(frame)
+        for y in range(100, min(h, 140)):
+            widget[(y * w + 200) * 4:(y * w + min(w, 400)) * 4] = bytes(min(w, 400) * 4 - 800)
+        widget = bytes(widget)
+        inverted = bytes(255 - v for v in frame)
+        same = bytes(bytearray(frame))  # equal contents, separate buffer, like a fresh grab
+        for label, nxt in (("unchanged", same), ("widget", widget), ("full", inverted)):
+            n, spent, r = 0, 0.0, None
+            t_end = time.perf_counter() + seconds
+            while time.perf_counter() < t_end:
+                frames["cur"] = frame
+                engine.capture_damage(fmt="jpeg", key="bench")
+                frames["cur"] = nxt
+                t0 = time.perf_counter()
+                r = engine.capture_damage(fmt="jpeg", key="bench")
+                spent += time.perf_counter() - t0
+                n += 1
+            print(f"{'damage ' + label:<16} {spent * 1000 / n:8.2f} ms/frame {r['bytes'] / 1024:10.1f} KiB "
+                  f"tiles={len(r.get('tiles', []))} full={r['full']}")
+
+        if live and bd.PYAUTOGUI_AVAILABLE:
+            def legacy():
+                shot = bd.ImageGrab.grab()
+                f = tempfile.NamedTemporaryFile(suffix=".png", delete=False)
+                shot.save(f.name, "PNG")
+                os.unlink(f.name)
+            fps, ms = rate(legacy, seconds)
+            print(f"{'legacy png':<12} {fps:8.1f} fps {ms:8.2f} ms/frame")
+
+        files = sorted(os.listdir(engine.capture_dir))
+        print(f"pool: {len(files)} files in {engine.capture_dir}")
+    finally:
+        engine.close()
+
+if __name__ == "__main__":
+    main()
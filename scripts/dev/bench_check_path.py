@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark: ActionsEngine.check_path linear scan vs compiled PathRuleIndex.
+
+usage: bench_check_path.py [rules ...]     (default: 10 1000 100000)
+"""
+import importlib.util
+import os
+import sys
+import time
+
+def load_broker():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    path = os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(repo_root, "snaps", "_src", "buddy-core", "broker", "buddy_actionsd.py"),
+    )
+    spec = importlib.util.spec_from_file_location("buddy_actionsd", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+bd = load_broker()
+
+def linear_check(policy, target_path):
+    # the pre-index ActionsEngine.check_path, verbatim
+    p = bd.abspath(target_path)
+    allow_mode = str(policy.get("allow_mode", "allowlist")).lower()
+    allowlist = [bd.abspath(x) for x in policy.get("allowlist", []) if isinstance(x, str)]
+    blacklist = [bd.abspath(x) for x in policy.get("blacklist", []) if isinstance(x, str)]
+    for b in blacklist:
+        if bd.path_is_under(p, b):
+            return False, f"Path is blacklisted: {b}"
+    if allow_mode == "allowlist":
+        for a in allowlist:
+            if bd.path_is_under(p, a):
+                return True, ""
+        return False, "Path not in allowlist"
+    return True, ""
+
+def make_policy(n):
+    half = max(1, n // 2)
+    allow = [f"/srv/projects/team{i % 97}/proj{i}" for i in range(half)]
+    black = [f"/srv/projects/team{i % 97}/proj{i}/secrets" for i in range(0, half, 3)]
+    black += [f"/home/user/.cache/app{i}" for i in range(n - half - len(black))]
+    return {"allow_mode": "allowlist", "allowlist": allow, "blacklist": black}
+
+def make_targets(n):
+    half = max(1, n // 2)
+    out = []
+    for i in range(0, half, max(1, half // 50)):
+        out.append(f"/srv/projects/team{i % 97}/proj{i}/src/main.py")      # allowed
+        out.append(f"/srv/projects/team{i % 97}/proj{i}/secrets/key.pem")   # blacklisted (maybe)
+    out.append("/etc/passwd")                                              # not in allowlist
+    return out
+
+def bench(fn, targets, min_s=0.5):
+    calls = 0
+    t0 = time.perf_counter()
+    while True:
+        for t in targets:
+            fn(t)
+        calls += len(targets)
+        dt = time.perf_counter() - t0
+        if dt >= min_s:
+            return dt / calls
+
+def main():
+    sizes = [int(x) for x in sys.argv[1:]] or [10, 1000, 100000]
+    print(f"{'rules':>8} {'linear us/call':>16} {'index us/call':>15} {'speedup':>9} {'compile ms':>11}")
+    for n in sizes:
+        policy = make_policy(n)
+        targets = make_targets(n)
+
+        t0 = time.perf_counter()
+        idx = bd.PathRuleIndex(policy)
+        compile_ms = (time.perf_counter() - t0) * 1000
+
+        for t in targets:
+            assert idx.check(bd.abspath(t)) == linear_check(policy, t), t
+
+        lin = bench(lambda t: linear_check(policy, t), targets)
+        fast = bench(lambda t: idx.check(bd.abspath(t)), targets)
+        print(f"{n:>8} {lin * 1e6:>16.2f} {fast * 1e6:>15.2f} {lin / fast:>8.0f}x {compile_ms:>11.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Benchmark: a 20-step form fill as one input_macro request against 20
+single-event mouse_control/keyboard_control requests.
+
+Needs an X server; on a headless box run it in Xvfb:
+
+    xvfb-run -a -s "-screen 0 1280x800x24" python3 scripts/dev/bench_macro.py
+
+Keys are typed into a synthetic window this script maps and focuses, so
+nothing lands in a real application. For reference it also prints the floor
+the old fixed pyautogui.PAUSE = 0.5 put under the same steps.
+
+usage: bench_macro.py [rounds]     (default: 5)
+"""
+import importlib.util
+import os
+import sys
+import tempfile
+import time
+
+def load_broker():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    path = os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(repo_root, "broker", "buddy_actionsd.py"),
+    )
+    spec = importlib.util.spec_from_file_location("buddy_actionsd", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+bd = load_broker()
+
+def form_fill():
+    steps = [{"op": "click", "x": 60, "y": 40}]
+    for i in range(9):
+        steps.append({"op": "type", "text": f"field value {i}"})
+        steps.append({"op": "press", "key": "tab"})
+    steps.append({"op": "hotkey", "keys": ["ctrl", "s"]})
+    return steps
+
+def single_requests(steps):
+    for step in steps:
+        op = step["op"]
+        if op == "click":
+            yield "mouse_control", {"action": "move", "x": step["x"], "y": step["y"]}
+            yield "mouse_control", {"action": "click"}
+        else:
+            yield "keyboard_control", dict(step, action=op)
+
+def main():
+    rounds = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    if not bd.XLIB_AVAILABLE:
+        raise SystemExit("needs python-xlib and $DISPLAY (try: xvfb-run -a python3 " + sys.argv[0] + ")")
+
+    os.environ.setdefault("BUDDY_ENABLE_SCREEN_CONTROL", "1")
+    daemon = bd.BuddyActionsDaemon(tempfile.mkdtemp(prefix="buddy-bench-macro-"))
+    daemon.enable_screen_control = True
+    if not daemon._use_xauto():
+        raise SystemExit(f"XAutomation unavailable: {daemon.xauto._failed}")
+
+    d = bd.Xlib.display.Display()
+    w = d.screen().root.create_window(0, 0, 400, 300, 0, d.screen().root_depth,
+                                      event_mask=bd.Xlib.X.KeyPressMask)
+    w.set_wm_name("bench-macro-form")
+    w.map()
+    d.sync()
+    time.sleep(0.1)
+    w.set_input_focus(bd.Xlib.X.RevertToParent, bd.Xlib.X.CurrentTime)
+    d.sync()
+
+    steps = form_fill()
+    print(f"{len(steps)} steps, {rounds} rounds")
+
+    def drain():
+        while d.pending_events():
+            d.next_event()
+
+    macro_ms = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        ok, out, msg = daemon.handle_execute({"action": "input_macro", "params": {"steps": steps}})
+        macro_ms.append((time.perf_counter() - t0) * 1000)
+        if not ok:
+            raise SystemExit(f"macro failed: {msg}")
+        drain()
+
+    single_ms = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        for action, params in single_requests(steps):
+            ok, out, msg = daemon.handle_execute({"action": action, "params": params})
+            if not ok:
+                raise SystemExit(f"{action} failed: {msg}")
+        single_ms.append((time.perf_counter() - t0) * 1000)
+        drain()
+
+    events = sum(1 for _ in single_requests(steps))
+    print(f"{'input_macro (one request)':<34} {min(macro_ms):9.1f} ms")
+    print(f"{'single-event requests':<34} {min(single_ms):9.1f} ms  ({events} requests)")
+    print(f"{'old PAUSE=0.5 floor':<34} {events * 500:9.1f} ms")
+    daemon.xauto.close()
+    daemon.window_registry.close()
+    d.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark + golden check: redact_secrets vs the original six-pass implementation.
+
+usage: bench_redact.py [size_mb]     (default: 1)
+"""
+import importlib.util
+import os
+import random
+import sys
+import time
+
+def load_broker():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    path = os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(repo_root, "snaps", "_src", "buddy-core", "broker", "buddy_actionsd.py"),
+    )
+    spec = importlib.util.spec_from_file_location("buddy_actionsd", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+bd = load_broker()
+
+def redact_reference(obj):
+    # the original redact_secrets, verbatim
+    if isinstance(obj, str):
+        s = obj
+        for pat, rep in bd._SECRET_PATTERNS:
+            s = pat.sub(rep, s)
+        return s
+    if isinstance(obj, list):
+        return [redact_reference(x) for x in obj]
+    if isinstance(obj, dict):
+        return {k: redact_reference(v) for k, v in obj.items()}
+    return obj
+
+GOLDEN = [
+    "",
+    "hello",
+    "token=abc",
+    "token=abcdefgh",
+    "TOKEN : 'abcdefghij'",
+    "api_key=sk-" + "a" * 30,
+    "apikey: ghp_" + "b" * 24,
+    "secret=" + "AIza" + "c" * 30,
+    "Authorization: Bearer abc.def-ghi_jkl",
+    "authorization: bearer " + "x" * 9,
+    "token=Bearer abcdefghijkl",
+    "eyJ" + "h" * 30 + "." + "p" * 20 + "." + "s" * 20,
+    "see sk-" + "z" * 19 + " and sk-" + "z" * 20,
+    "mytoken=abcdefghijk",
+    "ghp_" + "q" * 40 + "\nsecret = \"hunter22222\"",
+    "path/to/file.py: def token(): return 1",
+    "Bearer [REDACTED] token=[REDACTED_GITHUB_TOKEN]",
+    "\u017fecret=abcdefghij",          # long s: re.IGNORECASE matches it as "s"
+    "caf\u00e9 BEARER   abcdefghijkl",
+    "token\t=\tabcdefghij",
+]
+
+FRAGMENTS = [
+    "token", "api_key", "api-key", "secret", "Bearer", "bearer ", "ghp_", "sk-", "AIza",
+    "=", ":", " ", "\n", "\"", "'", ".", "-", "_", "abcdefghij", "ABCDEFGHIJKLMNOP",
+    "0123456789", "eyJhbGciOiJIUzI1NiIsInR5cCI6", "x", "[REDACTED]", "\u017f", "\u00e9", "\t",
+]
+
+def fuzz_cases(n, seed=1234):
+    rnd = random.Random(seed)
+    for _ in range(n):
+        yield "".join(rnd.choice(FRAGMENTS) for _ in range(rnd.randint(1, 40)))
+
+def make_payload(size, secrets):
+    line = "    result = compute(value, other_value) + offset  # plain source code line\n"
+    body = line * (size // len(line) + 1)
+    body = body[:size]
+    if secrets:
+        step = max(1, len(body) // (secrets + 1))
+        parts = [body[i:i + step] for i in range(0, len(body), step)]
+        body = ("api_key=sk-" + "k" * 32 + "\n").join(parts)[:size]
+    return {"path": "/tmp/out.py", "content": body}
+
+def bench(fn, obj, min_s=1.0):
+    n = 0
+    t0 = time.perf_counter()
+    while True:
+        fn(obj)
+        n += 1
+        dt = time.perf_counter() - t0
+        if dt >= min_s:
+            return dt / n
+
+def main():
+    size = int(float(sys.argv[1]) * 1_000_000) if len(sys.argv) > 1 else 1_000_000
+
+    cases = GOLDEN + list(fuzz_cases(20000))
+    for c in cases:
+        got = bd.redact_secrets(c, max_chars=0)
+        want = redact_reference(c)
+        assert got == want, (c, got, want)
+    print(f"golden corpus: {len(cases)} strings identical")
+
+    print(f"{'payload':>22} {'reference ms':>13} {'engine ms':>10} {'speedup':>8}")
+    for label, secrets in (("1 MB, no secrets", 0), ("1 MB, 10 secrets", 10)):
+        payload = make_payload(size, secrets)
+        assert bd.redact_secrets(payload, max_chars=0) == redact_reference(payload)
+        ref = bench(redact_reference, payload)
+        new = bench(lambda o: bd.redact_secrets(o, max_chars=0), payload)
+        print(f"{label:>22} {ref * 1e3:>13.2f} {new * 1e3:>10.2f} {ref / new:>7.1f}x")
+
+    payload = make_payload(size, 10)
+    capped = bench(lambda o: bd.redact_secrets(o, max_chars=64_000), payload)
+    print(f"{'1 MB, cap 64k chars':>22} {'':>13} {capped * 1e3:>10.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Benchmark: search_files index build, mtime-diff refresh and name queries.
+
+Creates a throwaway tree of N empty files (100 per directory), indexes it as
+the only allowlist root, then times a full build, a no-change refresh, a
+one-directory-changed refresh, a restart (load from sqlite) and a few name
+queries.
+
+usage: bench_search.py [files]     (default: 100000)
+"""
+import fnmatch
+import importlib.util
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+def load_broker():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    path = os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(repo_root, "snaps", "_src", "buddy-core", "broker", "buddy_actionsd.py"),
+    )
+    spec = importlib.util.spec_from_file_location("buddy_actionsd", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+bd = load_broker()
+
+def make_tree(root, n):
+    per_dir = 100
+    for i in range(0, n, per_dir):
+        d = os.path.join(root, f"team{i // 100000}", f"proj{i // 10000}", f"pkg{i // per_dir}")
+        os.makedirs(d, exist_ok=True)
+        for j in range(i, min(n, i + per_dir)):
+            ext = (".py", ".txt", ".json", ".md")[j % 4]
+            open(os.path.join(d, f"module_{j}{ext}"), "w").close()
+
+def timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - t0) * 1000
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    work = tempfile.mkdtemp(prefix="buddy-bench-search-")
+    root = os.path.join(work, "root")
+    try:
+        t0 = time.perf_counter()
+        make_tree(root, n)
+        print(f"created {n} files in {time.perf_counter() - t0:.1f}s")
+        time.sleep(2.1)  # let directory mtimes settle (see FileIndex.refresh)
+
+        policy = {"allowlist": [root], "blacklist": [], "no_memory_zones": []}
+        db = os.path.join(work, "index.sqlite")
+        idx = bd.FileIndex(db, policy)
+        stats, ms = timed(idx.refresh)
+        print(f"{'initial build':>32} {ms:>10.1f} ms  {stats}")
+        _, ms = timed(idx.view)
+        print(f"{'search view build':>32} {ms:>10.1f} ms")
+        stats, ms = timed(idx.refresh)
+        print(f"{'refresh, nothing changed':>32} {ms:>10.1f} ms  {stats}")
+        open(os.path.join(root, "team0", "proj0", "pkg0", "added.py"), "w").close()
+        time.sleep(2.1)
+        stats, ms = timed(idx.refresh)
+        print(f"{'refresh, one dir changed':>32} {ms:>10.1f} ms  {stats}")
+        idx.close()
+
+        idx, ms = timed(lambda: bd.FileIndex(db, policy))
+        print(f"{'restart (load sqlite)':>32} {ms:>10.1f} ms")
+        view = idx.view()
+        queries = [
+            ("substring 'module_4242'", {"literal": "module_4242"}),
+            ("glob '*_99999.md'", {"literal": bd.glob_literal("*_99999.md"),
+                                   "verify": re.compile(fnmatch.translate("*_99999.md"), re.I).match}),
+            ("substring 'json' (limit 100)", {"literal": "json"}),
+            ("no match 'zzzz'", {"literal": "zzzz"}),
+            ("regex '^module_1234[0-9]\\.py$'", {"rx": re.compile(r"^module_1234[0-9]\.py$", re.M | re.I)}),
+        ]
+        for label, query in queries:
+            hits, ms = timed(lambda: [view.path(i) for _, i in zip(range(100), view.find("name", **query))])
+            print(f"{label:>32} {ms:>10.2f} ms  {len(hits)} hits")
+        idx.close()
+    finally:
+        shutil.rmtree(work, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()
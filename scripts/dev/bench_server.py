@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Load test: threaded vs asyncio broker server modes.
+
+Starts the broker as a subprocess once per mode (BUDDY_SERVER=threaded|asyncio)
+on a throwaway policy/audit dir, then drives it with N concurrent keep-alive
+clients (reconnecting whenever the server closes) and reports p50/p99 latency
+and requests/sec.
+
+usage: bench_server.py [--clients 1,50,500] [--seconds 3] [--route health|execute]
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from urllib.request import urlopen
+
+def broker_path():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    return os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(repo_root, "snaps", "_src", "buddy-core", "broker", "buddy_actionsd.py"),
+    )
+
+def free_port():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return port
+
+def start_broker(mode, workdir):
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "BUDDY_SERVER": mode,
+        "BUDDY_PORT": str(port),
+        "BUDDY_POLICY_PATH": os.path.join(workdir, "policy.json"),
+        "BUDDY_AUDIT_PATH": os.path.join(workdir, "audit.log.jsonl"),
+    })
+    proc = subprocess.Popen([sys.executable, broker_path()], env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            urlopen(f"http://127.0.0.1:{port}/health", timeout=0.5).read()
+            return proc, port
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"{mode} broker did not start")
+
+def build_request(route, workdir):
+    if route == "health":
+        return b"GET /health HTTP/1.1\r\nHost: bench\r\n\r\n"
+    body = json.dumps({"action": "list_dir", "params": {"path": workdir}, "reason": "bench"}).encode()
+    return (b"POST /execute HTTP/1.1\r\nHost: bench\r\nContent-Type: application/json\r\n"
+            b"Content-Length: %d\r\n\r\n" % len(body)) + body
+
+async def read_response(reader):
+    head = await reader.readuntil(b"\r\n\r\n")
+    lines = head.split(b"\r\n")
+    status = int(lines[0].split()[1])
+    headers = {}
+    for ln in lines[1:]:
+        k, _, v = ln.partition(b":")
+        headers[k.strip().lower()] = v.strip().lower()
+    if b"content-length" in headers:
+        await reader.readexactly(int(headers[b"content-length"]))
+    else:
+        await reader.read()
+    keep = lines[0].startswith(b"HTTP/1.1") and headers.get(b"connection") != b"close"
+    return status, keep
+
+async def client(port, request, stop_at, lat, errors):
+    reader = writer = None
+    while time.perf_counter() < stop_at:
+        t0 = time.perf_counter()
+        try:
+            if writer is None:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), 5)
+            writer.write(request)
+            status, keep = await asyncio.wait_for(read_response(reader), 10)
+            if status != 200:
+                errors.append(status)
+            lat.append(time.perf_counter() - t0)
+            if not keep:
+                writer.close()
+                reader = writer = None
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError) as e:
+            errors.append(type(e).__name__)
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+async def run_level(port, request, clients, seconds):
+    lat, errors = [], []
+    stop_at = time.perf_counter() + seconds
+    t0 = time.perf_counter()
+    await asyncio.gather(*(client(port, request, stop_at, lat, errors) for _ in range(clients)))
+    elapsed = time.perf_counter() - t0
+    lat.sort()
+    pct = lambda q: lat[min(len(lat) - 1, int(q * len(lat)))] * 1000 if lat else float("nan")
+    return {"rps": len(lat) / elapsed, "p50": pct(0.50), "p99": pct(0.99), "n": len(lat), "errors": len(errors)}
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--clients", default="1,50,500")
+    ap.add_argument("--seconds", type=float, default=3.0)
+    ap.add_argument("--route", choices=("health", "execute"), default="health")
+    ap.add_argument("--modes", default="threaded,asyncio")
+    args = ap.parse_args()
+
+    levels = [int(x) for x in args.clients.split(",")]
+    print(f"route={args.route} seconds={args.seconds}")
+    print(f"{'mode':>9} {'clients':>8} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'requests':>9} {'errors':>7}")
+    for mode in args.modes.split(","):
+        workdir = tempfile.mkdtemp(prefix=f"buddy-bench-{mode}-")
+        proc, port = start_broker(mode, workdir)
+        try:
+            request = build_request(args.route, workdir)
+            for n in levels:
+                r = asyncio.run(run_level(port, request, n, args.seconds))
+                print(f"{mode:>9} {n:>8} {r['rps']:>9.0f} {r['p50']:>8.2f} {r['p99']:>8.2f} {r['n']:>9} {r['errors']:>7}")
+        finally:
+            proc.terminate()
+            proc.wait(10)
+
+if __name__ == "__main__":
+    main()
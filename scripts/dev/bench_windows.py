@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+"""
+Benchmark: event-driven WindowRegistry against per-query window listing.
+
+Needs an X server; on a headless box run it in Xvfb:
+
+    xvfb-run -a -s "-screen 0 1280x800x24" python3 scripts/dev/bench_windows.py
+
+Starts the registry, maps N synthetic windows on a separate connection and
+checks that the index follows them: how long until all N are visible, until
+a retitle (PropertyNotify), a move (ConfigureNotify) and a destroy
+(DestroyNotify) show up in queries. Then times find by substring / regex /
+fuzzy title against XAutomation.find_windows (pipelined listing per query)
+and a get_wm_name() walk.
+
+usage: bench_windows.py [windows] [iterations]     (default: 200 200)
+"""
+import importlib.util
+import os
+import sys
+import time
+
+def load_broker():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    path = os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(repo_root, "broker", "buddy_actionsd.py"),
+    )
+    spec = importlib.util.spec_from_file_location("buddy_actionsd", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+bd = load_broker()
+
+def wait_for(label, cond, timeout=5.0):
+    t0 = time.perf_counter()
+    while not cond():
+        if time.perf_counter() - t0 > timeout:
+            raise SystemExit(f"registry never saw: {label}")
+        time.sleep(0.001)
+    print(f"{label:<34} {(time.perf_counter() - t0) * 1000:9.2f} ms")
+
+def timed(label, fn, iterations):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    print(f"{label:<34} {(time.perf_counter() - t0) * 1000 / iterations:9.3f} ms/query")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    if not bd.XLIB_AVAILABLE:
+        raise SystemExit("needs python-xlib and $DISPLAY (try: xvfb-run -a python3 " + sys.argv[0] + ")")
+
+    registry = bd.WindowRegistry()
+    if not registry.start():
+        raise SystemExit(f"registry failed to start: {registry.stats()['error']}")
+    base = len(registry.list())
+
+    d = bd.Xlib.display.Display()
+    root = d.screen().root
+    pid_atom = d.intern_atom("_NET_WM_PID")
+    windows = []
+    for i in range(n):
+        w = root.create_window(10 + i % 50, 10 + i % 40, 120, 80, 0, d.screen().root_depth)
+        w.set_wm_name(f"bench-window-{i}")
+        w.set_wm_class(f"bench{i}", "BenchWindow")
+        w.change_property(pid_atom, bd.Xlib.Xatom.CARDINAL, 32, [os.getpid()])
+        w.map()
+        windows.append(w)
+    d.sync()
+    print(f"{n} synthetic windows, {iterations} queries each\n")
+
+    wait_for(f"all {n} windows indexed", lambda: len(registry.list()) >= base + n)
+    wait_for("titles/class/pid read", lambda: len(registry.find(wm_class="benchwindow", pid=os.getpid())) == n)
+
+    target = windows[n // 2]
+    target.set_wm_name("Renamed Target Window")
+    d.sync()
+    wait_for("retitle visible", lambda: registry.find("renamed target", match="substring"))
+    target.configure(x=500, y=300)
+    d.sync()
+    wait_for("move visible", lambda: (registry.get(target.id) or {}).get("x") == 500)
+    windows[0].destroy()
+    d.sync()
+    wait_for("destroy visible", lambda: registry.get(windows[0].id) is None)
+    print()
+
+    xauto = bd.XAutomation()
+    last = f"bench-window-{n - 1}"
+
+    def naive_find():
+        for w in root.query_tree().children:
+            try:
+                if last in (w.get_wm_name() or ""):
+                    return w
+            except bd.Xlib.error.XError:
+                continue
+
+    timed("registry find (substring)", lambda: registry.find(last), iterations)
+    timed("registry find (regex)", lambda: registry.find(r"window-\d+9$", match="regex"), iterations)
+    timed("registry find (fuzzy)", lambda: registry.find("renamd targt", match="fuzzy"), iterations)
+    timed("registry find (point)", lambda: registry.find(at=[520, 320]), iterations)
+    if xauto.available():
+        timed("XAutomation.find_windows", lambda: xauto.find_windows(last), max(1, iterations // 10))
+    timed("get_wm_name walk", naive_find, max(1, iterations // 10))
+    print(f"\n{registry.stats()}")
+
+    registry.close()
+    xauto.close()
+    d.close()
+
+if __name__ == "__main__":
+    main()
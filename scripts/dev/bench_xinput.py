@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Benchmark: GUI automation over the persistent X connection (XAutomation)
+against the subprocess path (xdotool per call) and per-window round trips.
+
+Needs an X server with XTEST; under CI or a headless box run it in Xvfb:
+
+    xvfb-run -a -s "-screen 0 1280x800x24" python3 scripts/dev/bench_xinput.py
+
+It maps N synthetic top-level windows (title/class/pid set) on its own
+connection, then times window find, key press, typing 20 characters and
+pointer moves. Before timing it types a test string into a focused window of
+its own and checks the KeyPress events that arrive, so a broken keymap or
+XTest path fails loudly instead of benchmarking nothing.
+
+usage: bench_xinput.py [windows] [iterations]     (default: 200 50)
+"""
+import importlib.util
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+def load_broker():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    path = os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(repo_root, "broker", "buddy_actionsd.py"),
+    )
+    spec = importlib.util.spec_from_file_location("buddy_actionsd", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+bd = load_broker()
+
+def make_windows(d, n):
+    root = d.screen().root
+    pid_atom = d.intern_atom("_NET_WM_PID")
+    windows = []
+    for i in range(n):
+        w = root.create_window(10 + i % 50, 10 + i % 40, 120, 80, 0, d.screen().root_depth,
+                               event_mask=bd.Xlib.X.StructureNotifyMask | bd.Xlib.X.KeyPressMask)
+        w.set_wm_name(f"bench-window-{i}")
+        w.set_wm_class(f"bench{i}", "BenchWindow")
+        w.change_property(pid_atom, bd.Xlib.Xatom.CARDINAL, 32, [os.getpid()])
+        w.map()
+        windows.append(w)
+    d.sync()
+    return windows
+
+def wait_event(d, kind, window, timeout=2.0):
+    end = time.time() + timeout
+    while time.time() < end:
+        while d.pending_events():
+            ev = d.next_event()
+            if ev.type == kind and ev.window.id == window.id:
+                return ev
+        time.sleep(0.005)
+    raise SystemExit(f"timed out waiting for X event {kind}")
+
+def check_typing(d, xauto, window, text):
+    window.set_input_focus(bd.Xlib.X.RevertToParent, bd.Xlib.X.CurrentTime)
+    d.sync()
+    while d.pending_events():
+        d.next_event()
+    xauto.type_text(text)
+    got = []
+    end = time.time() + 2.0
+    while len(got) < len(text) and time.time() < end:
+        while d.pending_events():
+            ev = d.next_event()
+            if ev.type != bd.Xlib.X.KeyPress:
+                continue
+            keysym = d.keycode_to_keysym(ev.detail, 1 if ev.state & bd.Xlib.X.ShiftMask else 0)
+            if 0x20 <= keysym <= 0xff:  # printable latin-1: keysym == code point
+                got.append(chr(keysym))
+        time.sleep(0.005)
+    typed = "".join(got)
+    if typed != text:
+        raise SystemExit(f"XTest typing check failed: sent {text!r}, window saw {typed!r}")
+    print(f"typing check ok: {typed!r}")
+
+def timed(label, fn, iterations):
+    fn()
+    t0 = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    ms = (time.perf_counter() - t0) * 1000 / iterations
+    print(f"{label:<34} {ms:9.3f} ms/op")
+    return ms
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    iterations = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    if not bd.XLIB_AVAILABLE:
+        raise SystemExit("needs python-xlib and $DISPLAY (try: xvfb-run -a python3 " + sys.argv[0] + ")")
+
+    d = bd.Xlib.display.Display()
+    xauto = bd.XAutomation()
+    if not xauto.available():
+        raise SystemExit(f"XAutomation unavailable: {xauto._failed}")
+    windows = make_windows(d, n)
+    wait_event(d, bd.Xlib.X.MapNotify, windows[-1])
+    check_typing(d, xauto, windows[0], "Hello, World! 123")
+
+    target = f"bench-window-{n - 1}"
+    found = xauto.find_windows(target)
+    assert found and found[0]["class"] == "BenchWindow" and found[0]["pid"] == os.getpid(), found
+    print(f"{n} windows mapped, {iterations} iterations each\n")
+
+    def naive_find():
+        for w in d.screen().root.query_tree().children:
+            try:
+                if target in (w.get_wm_name() or ""):
+                    return w
+            except bd.Xlib.error.XError:
+                continue
+
+    xdotool = shutil.which("xdotool")
+    run = lambda *args: subprocess.run(["xdotool", *args], capture_output=True)
+    rows = [
+        ("find: XAutomation (pipelined)", lambda: xauto.find_windows(target)),
+        ("find: get_wm_name per window", naive_find),
+        ("key: XAutomation", lambda: xauto.press("shift")),
+        ("type 20 chars: XAutomation", lambda: xauto.type_text("abcdefghij0123456789")),
+        ("move: XAutomation", lambda: xauto.move(100, 100)),
+    ]
+    if xdotool:
+        rows += [
+            ("find: xdotool search", lambda: run("search", "--name", target)),
+            ("key: xdotool", lambda: run("key", "shift")),
+            ("type 20 chars: xdotool", lambda: run("type", "abcdefghij0123456789")),
+            ("move: xdotool", lambda: run("mousemove", "100", "100")),
+        ]
+    else:
+        print("(xdotool not installed: subprocess rows skipped)")
+    # keep typed text landing in our own window
+    windows[0].set_input_focus(bd.Xlib.X.RevertToParent, bd.Xlib.X.CurrentTime)
+    d.sync()
+    for label, fn in rows:
+        timed(label, fn, iterations)
+        while d.pending_events():
+            d.next_event()
+    xauto.close()
+    d.close()
+
+if __name__ == "__main__":
+    main()
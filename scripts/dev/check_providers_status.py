@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Check ActionsEngine.providers_status against local stub providers.
+
+Starts one stub HTTP server per behaviour (fast, slow, HTTP error, closed port),
+points the broker at them via BUDDY_OLLAMA_URL / BUDDY_PROVIDER_<ID>_URL and
+checks that probing is concurrent, bounded by the deadline, and reports
+per-provider latency/error fields.
+"""
+import importlib.util
+import json
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+def load_broker():
+    repo_root = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    path = os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(repo_root, "snaps", "_src", "buddy-core", "broker", "buddy_actionsd.py"),
+    )
+    spec = importlib.util.spec_from_file_location("buddy_actionsd", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+def stub(delay_s=0.0, status=200, body=None):
+    payload = json.dumps(body or {}).encode("utf-8")
+
+    class H(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay_s)
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+            except OSError:
+                pass
+
+        def log_message(self, *args):
+            pass
+
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), H)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{httpd.server_address[1]}/"
+
+def closed_port_url():
+    s = socket.socket()
+    s.bind(("127.0.0.1", 0))
+    port = s.getsockname()[1]
+    s.close()
+    return f"http://127.0.0.1:{port}/"
+
+def main():
+    os.environ["BUDDY_OLLAMA_URL"] = stub(0.2, body={"models": [{"name": "qwen3-vl:2b"}]})
+    os.environ["BUDDY_PROVIDER_OPENAI_URL"] = stub(0.3, body={"data": [{"id": "gpt-x"}, {"id": "gpt-y"}]})
+    os.environ["BUDDY_PROVIDER_GROK_URL"] = stub(0.3, body={"data": [{"id": "grok-z"}]})
+    os.environ["BUDDY_PROVIDER_GEMINI_URL"] = stub(0.1, status=500)
+    os.environ["BUDDY_PROVIDER_CLAUDE_URL"] = closed_port_url()
+    os.environ["BUDDY_PROVIDER_OLLAMA_CLOUD_URL"] = stub(5.0, body={"models": []})
+    os.environ["BUDDY_PROVIDERS_DEADLINE_S"] = "1.0"
+
+    bd = load_broker()
+    d = tempfile.mkdtemp()
+    engine = bd.ActionsEngine(d, os.path.join(d, "policy.json"), os.path.join(d, "audit.log.jsonl"))
+    try:
+        st = engine.providers_status()
+    finally:
+        engine.close()
+    print(json.dumps(st, indent=2))
+
+    p = st["providers"]
+    checks = [
+        ("whole call bounded by the deadline", st["elapsed_ms"] < 1500),
+        ("probes ran concurrently (not 0.2+0.3+0.3+0.1s)", st["elapsed_ms"] >= 900 and p["openai"]["latency_ms"] < 900),
+        ("ollama-local connected", p["ollama-local"]["connected"] and p["ollama-local"]["models"] == ["qwen3-vl:2b"]),
+        ("openai models parsed", p["openai"]["models"] == ["gpt-x", "gpt-y"]),
+        ("grok connected", p["grok"]["connected"]),
+        ("gemini HTTP error reported", not p["gemini"]["connected"] and "500" in p["gemini"]["error"]),
+        ("claude unreachable reported", not p["claude"]["connected"] and p["claude"]["error"]),
+        ("slow provider cut at deadline", p["ollama-cloud"]["error"] == "deadline exceeded" and st["partial"]),
+    ]
+    failed = 0
+    for name, ok in checks:
+        print(("PASS " if ok else "FAIL ") + name)
+        failed += not ok
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
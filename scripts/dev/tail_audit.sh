@@ -3,4 +3,5 @@ set -euo pipefail
 cd ~/Buddy-OS 2>/dev/null || cd ~/Buddy-os
 LOG="broker/audit.log.jsonl"
 touch "$LOG"
-tail -n 50 -f "$LOG"
+# -F: keep following across audit segment rotation
+tail -n 50 -F "$LOG"
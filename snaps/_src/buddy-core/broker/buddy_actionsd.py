@@ -18,9 +18,26 @@ This update is **backward compatible** with your current file:
 
 Adds (non-breaking) endpoints for UI plumbing:
     GET  /policy                 (current policy)
+    GET  /policy/status          (hot-reload watcher: reloads, failures, last_error)
     POST /policy                 (update policy fields safely)
+    POST /execute/stream         (shell output / list_dir entries live as NDJSON or SSE; also /execute?stream=1)
+    GET  /files?path=...         (streamed download: Range, offset/length, line window, head/tail)
+    PUT  /files?path=...         (streaming binary upload: temp file + atomic replace, sha256)
+    POST /execute/batch          (ordered multi-step plan; one request, one grouped audit record)
+    POST /jobs                   (run an action in the background; returns action_id at once)
+    GET  /jobs, /jobs/<id>       (job list / status + output tail)
+    DELETE /jobs/<id>            (cancel: kills the job's process group)
+    POST /jobs/<id>/pause|resume (SIGSTOP/SIGCONT the job's process group)
+    POST /shell/sessions         (start a persistent shell session; returns its id)
+    GET  /shell/sessions         (persistent shell sessions: cwd, commands, idle time; ids shortened)
+    DELETE /shell/sessions/<id>  (close a session's shell)
     GET  /providers/status        (single place for UI to read provider reachability/model lists)
     GET  /providers/ollama-local/tags  (raw-ish tags info from Ollama for richer dropdowns)
+    GET  /audit                   (filtered, cursor-paginated audit entries as streamed NDJSON)
+    GET  /audit/stats             (audit writer queue depth / backpressure / fsync counters)
+    GET  /scheduler/stats         (per action class: limit, running, queued, wait times, rejections)
+    GET  /metrics                 (Prometheus text; ?format=json for JSON): per-action outcomes,
+                                  phase latency histograms, in-flight, subprocesses, bytes, providers
 
 Shell execution:
 - Still **disabled by default** for safety, BUT can be enabled via env var:
@@ -34,19 +51,99 @@ Environment variables:
 - BUDDY_PORT          (default: 8765)
 - BUDDY_ENABLE_SHELL  (default: 0)
 - BUDDY_OLLAMA_URL    (default: http://127.0.0.1:11434/api/tags)
+- BUDDY_AUDIT_COMMIT_MS  (default: 200; audit fsync group-commit interval)
+- BUDDY_AUDIT_QUEUE      (default: 10000; max queued audit entries before backpressure)
+- BUDDY_REDACT_MAX_CHARS (default: 0 = unlimited; chars of each audited string scanned/kept,
+                          the rest replaced by "[TRUNCATED <n> chars]")
+- BUDDY_AUDIT_ROTATE_MB    (default: 16; rotate the active audit segment at this size)
+- BUDDY_AUDIT_ROTATE_HOURS (default: 24; ...or when it is this old)
+- BUDDY_AUDIT_KEEP         (default: 30; closed segments kept before the oldest is deleted)
+- BUDDY_AUDIT_COMPRESS     (default: gzip; or zstd if the zstandard module is installed)
+- BUDDY_PROVIDER_TTL_S     (default: 10; provider model listings are fresh this long)
+- BUDDY_PROVIDER_STALE_S   (default: 300; ...then served stale while one refresh runs)
+- BUDDY_PROVIDER_NEG_TTL_S (default: 5; unreachable-provider errors are cached this long)
+- BUDDY_PROVIDER_TIMEOUT_S (default: 3; per-provider probe timeout, override with
+                            BUDDY_PROVIDER_<ID>_TIMEOUT_S, e.g. BUDDY_PROVIDER_OPENAI_TIMEOUT_S)
+- BUDDY_PROVIDERS_DEADLINE_S (default: 4; overall /providers/status deadline)
+- BUDDY_SERVER             (default: threaded; "asyncio" runs the event-loop server mode)
+- BUDDY_ASYNC_WORKERS      (default: 32; asyncio mode: executor threads for blocking routes)
+- BUDDY_KEEPALIVE_S        (default: 15; asyncio mode: idle keep-alive timeout)
+- BUDDY_ASYNC_UI_WORKERS   (default: 4; asyncio mode: separate threads for policy/provider/status routes)
+- BUDDY_SCHED_LIMITS       (default: shell=4,gui=2,fs=16,provider=4; concurrent actions per class)
+- BUDDY_SCHED_QUEUE        (default: 64; requests queued per class before 429)
+- BUDDY_SCHED_WAIT_S       (default: 30; max queue wait before 429, 0 = reject at once when full)
+- BUDDY_POLICY_POLL_S      (default: 1; policy.json change polling interval, 0 = off)
+- BUDDY_SEARCH_INDEX_PATH  (default: <audit dir>/search_index.sqlite; "off" disables search_files)
+- BUDDY_SEARCH_REFRESH_S   (default: 300; background mtime-diff refresh of the search index)
+- BUDDY_SEARCH_WORKERS     (default: 4; threads for search_files content grep)
+- BUDDY_LIST_LIMIT         (default: 10000; list_dir entries per page when limit/cursor is given)
+- BUDDY_LIST_MAX_SCANNED   (default: 1000000; entries a list_dir walk visits per call)
+- BUDDY_READ_MAX_KB        (default: 1024; content returned by the read_file action per call)
+- BUDDY_UPLOAD_MAX_MB      (default: 0 = unlimited; PUT /files size limit)
+- BUDDY_BATCH_MAX_STEPS    (default: 500; steps accepted per /execute/batch)
+- BUDDY_BATCH_WORKERS      (default: 8; threads for parallel batch steps)
+- BUDDY_BATCH_MAX_MB       (default: 16; /execute/batch request body limit)
+- BUDDY_JOB_WORKERS        (default: 4; background jobs running at once)
+- BUDDY_JOB_QUEUE          (default: 64; queued jobs before POST /jobs answers 429)
+- BUDDY_SHELL_CWD          (default: $HOME; starting directory of shell sessions)
+- BUDDY_SHELL_LIMITS       (default: core_mb=0; hard rlimits for shell sessions: core_mb, fsize_mb, mem_mb,
+                            cpu_s, nofile, nproc, e.g. mem_mb=2048,cpu_s=300)
+- BUDDY_SHELL_ENV_KEEP     (optional; comma list of env vars ("PREFIX*" for a prefix) sessions keep
+                            although BUDDY_* and credential-like names are scrubbed; DISPLAY,
+                            WAYLAND_DISPLAY, XAUTHORITY, XDG_RUNTIME_DIR, SSH_AUTH_SOCK,
+                            SSH_AGENT_PID and DBUS_* are always kept)
+- BUDDY_SHELL_SESSIONS     (default: 0; 1 enables persistent shell sessions, shell params "session")
+- BUDDY_SHELL_WARM         (default: 2; pre-spawned login shells kept ready for new sessions)
+- BUDDY_SHELL_MAX_SESSIONS (default: 16; sessions alive at once, least recently used idle one evicted)
+- BUDDY_SHELL_IDLE_S       (default: 600; idle sessions are closed after this long)
+- BUDDY_PROVIDER_<ID>_URL  (optional; model-list URL that enables a scaffolded provider,
+                            e.g. BUDDY_PROVIDER_OPENAI_URL=https://api.openai.com/v1/models)
 """
 
+import asyncio
+import atexit
+import array
+import base64
+import bisect
+import codecs
+import collections
+import concurrent.futures
+import copy
+import fnmatch
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
 import json
 import os
+import queue
 import re
+import resource
+import secrets
+import selectors
+import shlex
+import signal
+import sqlite3
+import stat
 import subprocess
 import sys
+import tempfile
+import threading
 import time
+import traceback
 import uuid
 from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import urlparse, parse_qs
 from urllib.request import Request, urlopen
 from urllib.error import URLError, HTTPError
 
+try:
+    import zstandard  # optional: BUDDY_AUDIT_COMPRESS=zstd
+except ImportError:
+    zstandard = None
+
 
 # -----------------------------
 # Time / JSON helpers
@@ -61,56 +158,2022 @@ def read_json(path: str):
 
 def write_json(path: str, obj):
     os.makedirs(os.path.dirname(path), exist_ok=True)
-    tmp = path + ".tmp"
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
     with open(tmp, "w", encoding="utf-8") as f:
         json.dump(obj, f, indent=2, sort_keys=True)
         f.write("\n")
     os.replace(tmp, path)
 
-def abspath(p: str) -> str:
-    return os.path.abspath(os.path.expanduser(p))
+def _read_umask_at_import() -> int:
+    mask = os.umask(0)
+    os.umask(mask)
+    return mask
+
+# fallback for kernels without "Umask:" in /proc/self/status; read while the
+# module loads, before any broker thread exists
+_UMASK_AT_IMPORT = _read_umask_at_import()
+
+def process_umask() -> int:
+    """
+    The process umask without changing it (os.umask can only read by
+    setting, which would briefly affect files created by other threads).
+    """
+    try:
+        with open("/proc/self/status", "r", encoding="ascii") as f:
+            for line in f:
+                if line.startswith("Umask:"):
+                    return int(line.split()[1], 8)
+    except (OSError, ValueError, IndexError):
+        pass
+    return _UMASK_AT_IMPORT
+
+def iso_utc(v) -> Optional[str]:
+    """
+    Accept an ISO-8601 UTC string (passed through) or epoch seconds.
+    None or "" (no bound) gives None.
+    """
+    if v is None or v == "":
+        return None
+    try:
+        return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(float(v)))
+    except (TypeError, ValueError):
+        return str(v)
+
+def abspath(p: str) -> str:
+    return os.path.abspath(os.path.expanduser(p))
+
+def path_is_under(p: str, root: str) -> bool:
+    p = os.path.normpath(p)
+    root = os.path.normpath(root)
+    if p == root:
+        return True
+    return p.startswith(root + os.sep)
+
+
+# -----------------------------
+# Path rule index (compiled policy)
+# -----------------------------
+
+_RULE = ""  # trie key for "a rule ends here" (path components are never empty)
+
+class PathRuleIndex:
+    """
+    allowlist/blacklist compiled into path-component tries.
+
+    Built once per policy (load, reload, update_policy), so check() costs
+    O(path depth) instead of abspath() + a linear scan over every rule.
+    Answers match the old scan exactly: blacklist wins, and the reported
+    blacklist entry is the first matching one in policy order.
+    """
+
+    def __init__(self, policy: dict):
+        self.allow_mode = str(policy.get("allow_mode", "allowlist")).lower()
+        self.allow = self._build(policy.get("allowlist", []))
+        self.black = self._build(policy.get("blacklist", []))
+
+    @staticmethod
+    def _parts(p: str):
+        return [c for c in os.path.normpath(p).split(os.sep) if c]
+
+    @classmethod
+    def _build(cls, rules):
+        trie = {}
+        for i, r in enumerate(rules or []):
+            if not isinstance(r, str):
+                continue
+            r = abspath(r)
+            node = trie
+            for c in cls._parts(r):
+                node = node.setdefault(c, {})
+            # keep the earliest rule so error messages match list order
+            if _RULE not in node:
+                node[_RULE] = (i, r)
+        return trie
+
+    @staticmethod
+    def _match(trie, parts):
+        """
+        Return (index, rule) of the first rule (in policy order) that covers parts.
+        """
+        # path_is_under(p, "/") only holds for p == "/" ("//" prefix); keep that
+        best = trie.get(_RULE) if not parts else None
+        node = trie
+        for c in parts:
+            node = node.get(c)
+            if node is None:
+                break
+            hit = node.get(_RULE)
+            if hit is not None and (best is None or hit[0] < best[0]):
+                best = hit
+        return best
+
+    def check(self, p: str):
+        """
+        p must already be absolute (see abspath).
+        """
+        parts = self._parts(p)
+
+        # Blacklist wins
+        hit = self._match(self.black, parts)
+        if hit is not None:
+            return False, f"Path is blacklisted: {hit[1]}"
+
+        # Allowlist mode
+        if self.allow_mode == "allowlist":
+            if self._match(self.allow, parts) is not None:
+                return True, ""
+            return False, "Path not in allowlist"
+
+        # Blacklist mode/open mode: already handled blacklist; allow otherwise
+        return True, ""
+
+
+class PolicySnapshot:
+    """
+    One generation of the policy: a private copy of the dict plus everything
+    compiled from it (path index, consent and re-auth tables). Never mutated
+    after construction; a policy change builds a new snapshot and the engine
+    swaps one reference, so readers need no lock. A request takes the current
+    snapshot once and evaluates every check against it.
+    """
+
+    __slots__ = ("version", "policy", "path_index", "consent", "reauth", "loaded_at")
+
+    def __init__(self, policy: dict, version: int):
+        self.version = version
+        self.policy = copy.deepcopy(policy)
+        self.path_index = PathRuleIndex(self.policy)
+        self.consent = {k: str(v).lower() for k, v in (self.policy.get("consent") or {}).items()}
+        self.reauth = {k: bool(v) for k, v in (self.policy.get("re_auth_required") or {}).items()}
+        self.loaded_at = now_utc()
+
+    def check_path(self, target_path: str):
+        return self.path_index.check(abspath(target_path))
+
+    def consent_rule(self, action: str) -> str:
+        return self.consent.get(action, "ask")
+
+    def require_reauth(self, action: str) -> bool:
+        return self.reauth.get(action, False)
+
+
+# -----------------------------
+# Redaction (improved, recursive)
+# -----------------------------
+
+_SECRET_PATTERNS = [
+    # GitHub tokens
+    (re.compile(r"(ghp_[A-Za-z0-9]{20,})"), "[REDACTED_GITHUB_TOKEN]"),
+    # OpenAI-ish keys
+    (re.compile(r"(sk-[A-Za-z0-9]{20,})"), "[REDACTED_OPENAI_KEY]"),
+    # Google API keys
+    (re.compile(r"(AIza[0-9A-Za-z\-_]{20,})"), "[REDACTED_GOOGLE_KEY]"),
+    # JWTs
+    (re.compile(r"([A-Za-z0-9_\-]{24,}\.[A-Za-z0-9_\-]{10,}\.[A-Za-z0-9_\-]{10,})"), "[REDACTED_JWT]"),
+    # Generic bearer tokens
+    (re.compile(r"(?i)\bBearer\s+[A-Za-z0-9._\-]{10,}"), "Bearer [REDACTED]"),
+    # Generic api_key=... patterns
+    (re.compile(r"(?i)\b(api[_-]?key|token|secret)\b\s*[:=]\s*([^\s\"']{8,})"), r"\1=[REDACTED]"),
+]
+
+# Prefilter: each pattern gets a cheap necessary-condition gate (literal search
+# or a literal-anchored regex). Most audited strings (paths, file contents) fail
+# every gate and are returned after a few memchr-speed scans instead of six
+# full regex passes. Gates are only shortcuts; matching is still done by
+# _SECRET_PATTERNS, so output is identical to the plain sequential version.
+# The patterns are deliberately not merged into one alternation: that loses
+# the regex engine's literal-prefix scan and measured slower than six passes,
+# and sequential passes see the previous pattern's replacements (e.g. a JWT
+# after "Bearer " is already gone), which one pass would not reproduce.
+
+_JWT_GATE = re.compile(r"\.(?<=[A-Za-z0-9_\-]{24}\.)")  # dot after a 24-char token run
+_SEP_AT = re.compile(r"\s*[:=]")
+
+def _gate_literal(*lits):
+    return lambda s, low: any(x in s for x in lits)
+
+def _gate_bearer(s, low):
+    # str.lower() only mirrors re.IGNORECASE for ASCII ("\u017f" matches "s"),
+    # so non-ASCII strings always go to the real regex.
+    return low is None or "bearer" in low
+
+def _gate_assignment(s, low):
+    if low is None:
+        return True
+    for kw in ("key", "token", "secret"):
+        i = low.find(kw)
+        while i >= 0:
+            if _SEP_AT.match(low, i + len(kw)):
+                return True
+            i = low.find(kw, i + 1)
+    return False
+
+_SECRET_GATES = [
+    _gate_literal("ghp_"),
+    _gate_literal("sk-"),
+    _gate_literal("AIza"),
+    lambda s, low: _JWT_GATE.search(s) is not None,
+    _gate_bearer,
+    _gate_assignment,
+]
+assert len(_SECRET_GATES) == len(_SECRET_PATTERNS)
+
+# Shortest string any pattern can match: "token=" + 8 chars.
+_SECRET_MIN_LEN = 14
+
+# Optional cap on how much of one string gets scanned (0 = no cap). The unscanned
+# tail is never logged as-is: it is replaced by a "[TRUNCATED <n> chars]" marker
+# so a reader can tell a cut field from a short one.
+REDACT_MAX_CHARS = int(os.environ.get("BUDDY_REDACT_MAX_CHARS", "0") or "0")
+_TOKEN_TAIL = re.compile(r"\S*")
+
+def redact_string(s: str, max_chars: int = 0) -> str:
+    if max_chars and len(s) > max_chars:
+        # also drop a partial token at the cut so no secret prefix survives
+        # (matched on the reversed head: r"\S+$" backtracks quadratically)
+        head = s[:max_chars]
+        head = head[:len(head) - _TOKEN_TAIL.match(head[::-1]).end()]
+        return redact_string(head) + f"[TRUNCATED {len(s) - len(head)} chars]"
+    if len(s) < _SECRET_MIN_LEN:
+        return s
+    low = s.lower() if s.isascii() else None
+    for (pat, rep), gate in zip(_SECRET_PATTERNS, _SECRET_GATES):
+        if not gate(s, low):
+            continue
+        s, n = pat.subn(rep, s)
+        if n:
+            low = s.lower() if s.isascii() else None
+    return s
+
+def redact_secrets(obj, max_chars: int = None):
+    """
+    Recursively redact secrets from strings inside dicts/lists.
+    """
+    if max_chars is None:
+        max_chars = REDACT_MAX_CHARS
+    if isinstance(obj, str):
+        return redact_string(obj, max_chars)
+    if isinstance(obj, list):
+        return [redact_secrets(x, max_chars) for x in obj]
+    if isinstance(obj, dict):
+        return {k: redact_secrets(v, max_chars) for k, v in obj.items()}
+    return obj
+
+
+# -----------------------------
+# Audit store (rotating segments + sidecar index)
+# -----------------------------
+
+class AuditStore:
+    """
+    Append-only audit log split into segments.
+
+    The active segment is audit_path itself (plain JSONL, so tail -F still
+    works). When it reaches rotate_bytes or rotate_s it is recompressed into
+    <audit_path>.<segment>.gz (or .zst) as a series of independently
+    compressed ~64 KiB blocks, and a fresh active file is started.
+
+    Every entry is indexed in the sqlite sidecar <audit_path>.idx with its
+    timestamp, action, action_id and result plus where its bytes live
+    (segment, block offset/length, offset/length inside the block). "Last N",
+    "by action_id" and time-range queries are B-tree lookups followed by
+    reading only the blocks holding the matching lines.
+
+    The index can be rebuilt from the active file: on open, any lines past the
+    last indexed offset (crash, or a pre-existing log) are indexed.
+    """
+
+    BLOCK_BYTES = 64 * 1024
+
+    def __init__(self, path: str, rotate_bytes: int = 16 * 1024 * 1024, rotate_s: float = 24 * 3600,
+                 keep_segments: int = 30, compress: str = "gzip"):
+        self.path = path
+        self.rotate_bytes = int(rotate_bytes)
+        self.rotate_s = float(rotate_s)
+        self.keep_segments = max(1, int(keep_segments))
+        self.compress = "zstd" if compress == "zstd" and zstandard is not None else "gzip"
+        self._lock = threading.RLock()
+        self._f = None
+        self._size = 0
+        self._dirty = False
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(path + ".idx", check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+            CREATE TABLE IF NOT EXISTS segments (
+                segment INTEGER PRIMARY KEY, file TEXT, codec TEXT,
+                first_ts TEXT, last_ts TEXT, entries INTEGER);
+            CREATE TABLE IF NOT EXISTS entries (
+                seq INTEGER PRIMARY KEY,
+                ts TEXT, action TEXT, action_id TEXT, result TEXT,
+                segment INTEGER, off INTEGER, len INTEGER,
+                block_off INTEGER, block_len INTEGER);
+            CREATE INDEX IF NOT EXISTS entries_ts ON entries(ts);
+            CREATE INDEX IF NOT EXISTS entries_action ON entries(action, seq);
+            CREATE INDEX IF NOT EXISTS entries_action_id ON entries(action_id);
+            CREATE INDEX IF NOT EXISTS entries_segment ON entries(segment, seq);
+        """)
+        if self._meta("active_segment") is None:
+            self._set_meta("active_segment", "1")
+            self._set_meta("active_started", str(time.time()))
+        self._db.commit()
+        with self._lock:
+            self._open_active()
+            self._catch_up()
+
+    # ---- meta ----
+
+    def _meta(self, key: str):
+        row = self._db.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def _set_meta(self, key: str, value: str):
+        self._db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def active_segment(self) -> int:
+        return int(self._meta("active_segment"))
+
+    # ---- writing ----
+
+    def _open_active(self):
+        self._f = open(self.path, "ab")
+        self._size = self._f.seek(0, os.SEEK_END)
+
+    def _catch_up(self):
+        """
+        Index lines written but not indexed (crash before commit, or an old log).
+
+        A nonzero rotated_bytes means the process died after a rotation was
+        committed but before the active file was emptied: those leading bytes
+        are already in the closed segment, so they are dropped rather than
+        indexed again under the new segment.
+        """
+        if int(self._meta("rotated_bytes") or 0):
+            self._f.truncate(0)  # nothing is appended before rotated_bytes is reset
+            self._size = 0
+            self._set_meta("rotated_bytes", "0")
+            self._db.commit()
+        seg = self.active_segment
+        row = self._db.execute("SELECT MAX(off + len) FROM entries WHERE segment=?", (seg,)).fetchone()
+        pos = row[0] or 0
+        if pos >= self._size:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(pos)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # torn write: terminate it so the next entry starts on its own line
+                    self._f.write(b"\n")
+                    self._size += 1
+                    break
+                self._index(seg, pos, line)
+                pos += len(line)
+        self._db.commit()
+
+    def _index(self, seg: int, off: int, line: bytes, entry: dict = None):
+        if entry is None:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                return
+            if not isinstance(entry, dict):
+                return
+        self._db.execute(
+            "INSERT INTO entries(ts, action, action_id, result, segment, off, len) VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (str(entry.get("timestamp", "")), str(entry.get("action", "")), str(entry.get("action_id", "")),
+             str(entry.get("result", "")), seg, off, len(line)),
+        )
+
+    def append(self, entries):
+        with self._lock:
+            seg = self.active_segment
+            chunks = []
+            for e in entries:
+                line = (json.dumps(e, ensure_ascii=False) + "\n").encode("utf-8")
+                self._index(seg, self._size, line, e)
+                self._size += len(line)
+                chunks.append(line)
+            self._f.write(b"".join(chunks))
+            self._f.flush()
+            self._dirty = True
+
+    def sync(self):
+        """
+        Group commit: fsync the active segment, then commit the index.
+        """
+        with self._lock:
+            if not self._dirty:
+                return False
+            os.fsync(self._f.fileno())
+            self._db.commit()
+            self._dirty = False
+        self.maybe_rotate()
+        return True
+
+    def maybe_rotate(self, force: bool = False):
+        with self._lock:
+            started = float(self._meta("active_started") or time.time())
+            due = self._size >= self.rotate_bytes or (self.rotate_s > 0 and time.time() - started >= self.rotate_s)
+            if self._size == 0 or not (force or due):
+                return False
+            self._rotate()
+            return True
+
+    def _segment_file(self, seg: int) -> str:
+        return f"{self.path}.{seg:06d}." + ("zst" if self.compress == "zstd" else "gz")
+
+    def _compress(self, data: bytes) -> bytes:
+        if self.compress == "zstd":
+            return zstandard.ZstdCompressor(level=3).compress(data)
+        return gzip.compress(data, compresslevel=6)
+
+    def _rotate(self):
+        self.sync_locked()
+        seg = self.active_segment
+        final = self._segment_file(seg)
+        tmp = final + ".tmp"
+        updates = []
+        rows = self._db.execute(
+            "SELECT seq, off, len FROM entries WHERE segment=? ORDER BY seq", (seg,)).fetchall()
+        with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+            block, block_rows = [], []
+            block_size = 0
+
+            def flush_block():
+                data = self._compress(b"".join(block))
+                block_off = dst.tell()
+                dst.write(data)
+                for seq, inner_off, ln in block_rows:
+                    updates.append((block_off, len(data), inner_off, seq))
+
+            for seq, off, ln in rows:
+                src.seek(off)
+                line = src.read(ln)
+                block_rows.append((seq, block_size, ln))
+                block.append(line)
+                block_size += ln
+                if block_size >= self.BLOCK_BYTES:
+                    flush_block()
+                    block, block_rows, block_size = [], [], 0
+            if block:
+                flush_block()
+            dst.flush()
+            os.fsync(dst.fileno())
+        os.replace(tmp, final)
+
+        first, last = self._db.execute(
+            "SELECT MIN(ts), MAX(ts) FROM entries WHERE segment=?", (seg,)).fetchone()
+        self._db.executemany("UPDATE entries SET block_off=?, block_len=?, off=? WHERE seq=?", updates)
+        self._db.execute(
+            "INSERT OR REPLACE INTO segments(segment, file, codec, first_ts, last_ts, entries) VALUES (?, ?, ?, ?, ?, ?)",
+            (seg, os.path.basename(final), self.compress, first, last, len(rows)))
+        self._set_meta("active_segment", str(seg + 1))
+        self._set_meta("active_started", str(time.time()))
+        self._set_meta("rotated_bytes", str(self._size))
+        self._db.commit()
+
+        # index now points at the closed segment; start a fresh active file
+        self._f.close()
+        self._f = open(self.path, "wb")
+        self._size = 0
+        self._set_meta("rotated_bytes", "0")
+        self._db.commit()
+        self._prune()
+
+    def _prune(self):
+        old = self._db.execute(
+            "SELECT segment, file FROM segments ORDER BY segment DESC LIMIT -1 OFFSET ?",
+            (self.keep_segments,)).fetchall()
+        for seg, name in old:
+            try:
+                os.remove(os.path.join(os.path.dirname(self.path), name))
+            except FileNotFoundError:
+                pass
+            self._db.execute("DELETE FROM entries WHERE segment=?", (seg,))
+            self._db.execute("DELETE FROM segments WHERE segment=?", (seg,))
+        if old:
+            self._db.commit()
+
+    def sync_locked(self):
+        if self._dirty:
+            os.fsync(self._f.fileno())
+            self._db.commit()
+            self._dirty = False
+
+    def close(self):
+        with self._lock:
+            if self._f is None:
+                return
+            self.sync_locked()
+            self._f.close()
+            self._f = None
+            self._db.close()
+
+    # ---- reading ----
+
+    def _decompress(self, codec: str, data: bytes) -> bytes:
+        if codec == "zstd":
+            if zstandard is None:
+                raise RuntimeError("zstandard module required to read .zst audit segments")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def _load(self, rows):
+        """
+        rows: (seq, segment, off, len, block_off, block_len). Returns [(seq, entry)].
+        """
+        out = []
+        seg_files = {}
+        blocks = {}
+        active = None
+        try:
+            for seq, seg, off, ln, block_off, block_len in rows:
+                if block_off is None:
+                    if active is None:
+                        active = open(self.path, "rb")
+                    active.seek(off)
+                    line = active.read(ln)
+                else:
+                    key = (seg, block_off)
+                    if key not in blocks:
+                        if seg not in seg_files:
+                            r = self._db.execute("SELECT file, codec FROM segments WHERE segment=?", (seg,)).fetchone()
+                            seg_files[seg] = r
+                        name, codec = seg_files[seg]
+                        with open(os.path.join(os.path.dirname(self.path), name), "rb") as f:
+                            f.seek(block_off)
+                            blocks = {key: self._decompress(codec, f.read(block_len))}  # keep one block
+                    line = blocks[key][off:off + ln]
+                try:
+                    out.append((seq, json.loads(line)))
+                except ValueError:
+                    continue
+        finally:
+            if active is not None:
+                active.close()
+        return out
+
+    def query(self, action: str = None, result: str = None, action_id: str = None,
+              since: str = None, until: str = None, after_seq: int = None, before_seq: int = None,
+              newest_first: bool = False, limit: int = 100):
+        """
+        Indexed lookup. since/until compare against the ISO-8601 UTC "timestamp"
+        field (inclusive). after_seq/before_seq are exclusive cursors on the
+        append order. Returns [(seq, entry)].
+        """
+        where, args = [], []
+        for col, val in (("action", action), ("result", result), ("action_id", action_id)):
+            if val:
+                where.append(f"{col} = ?")
+                args.append(val)
+        if since:
+            where.append("ts >= ?")
+            args.append(since)
+        if until:
+            where.append("ts <= ?")
+            args.append(until)
+        if after_seq is not None:
+            where.append("seq > ?")
+            args.append(int(after_seq))
+        if before_seq is not None:
+            where.append("seq < ?")
+            args.append(int(before_seq))
+        sql = "SELECT seq, segment, off, len, block_off, block_len FROM entries"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY seq " + ("DESC" if newest_first else "ASC") + " LIMIT ?"
+        args.append(max(0, int(limit)))
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+            return self._load(rows)
+
+    def last(self, n: int = 50):
+        return [e for _, e in reversed(self.query(newest_first=True, limit=n))]
+
+    def by_action_id(self, action_id: str):
+        return [e for _, e in self.query(action_id=action_id, limit=1000)]
+
+    def time_range(self, since: str, until: str, limit: int = 1000):
+        return [e for _, e in self.query(since=since, until=until, limit=limit)]
+
+    def stats(self) -> dict:
+        with self._lock:
+            segs, closed_entries = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(entries), 0) FROM segments").fetchone()
+            total = self._db.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                "active_segment": self.active_segment,
+                "active_bytes": self._size,
+                "closed_segments": segs,
+                "closed_entries": closed_entries,
+                "indexed_entries": total,
+                "codec": self.compress,
+            }
+
+
+# -----------------------------
+# Audit writer (background, group commit)
+# -----------------------------
+
+class AuditWriter:
+    """
+    Single background writer for the audit JSONL file.
+
+    Request threads only enqueue (already redacted) entries. The writer hands
+    whatever is queued to the AuditStore as one batch and fsyncs at most
+    once per commit interval. close() drains the queue, fsyncs and joins, so
+    nothing queued before shutdown is lost.
+
+    When the queue is full, submit() waits up to put_timeout_s; if it is still
+    full the entry is written synchronously by the caller instead of dropped.
+    """
+
+    def __init__(self, store: AuditStore, commit_interval_s: float = 0.2, max_queue: int = 10000,
+                 max_batch: int = 512, put_timeout_s: float = 1.0):
+        self.store = store
+        self.commit_interval_s = max(0.0, float(commit_interval_s))
+        self.max_batch = max(1, int(max_batch))
+        self.put_timeout_s = put_timeout_s
+        self._q = queue.Queue(maxsize=max(1, int(max_queue)))
+        self._lock = threading.Lock()  # serializes store writes and guards the counters below
+        self._last_sync = time.monotonic()
+        self._closed = False
+        self._counters = {
+            "enqueued": 0,
+            "written": 0,
+            "batches": 0,
+            "fsyncs": 0,
+            "blocked": 0,
+            "blocked_ms": 0.0,
+            "overflow_sync": 0,
+            "write_errors": 0,
+            "high_water": 0,
+        }
+        self._last_error = ""
+        self._thread = threading.Thread(target=self._run, name="buddy-audit-writer", daemon=True)
+        self._thread.start()
+
+    # ---- producer side ----
+
+    def submit(self, entry: dict):
+        if self._closed:
+            self._write_sync([entry])
+            return
+        try:
+            self._q.put_nowait(entry)
+        except queue.Full:
+            t0 = time.monotonic()
+            try:
+                self._q.put(entry, timeout=self.put_timeout_s)
+                overflow = False
+            except queue.Full:
+                overflow = True
+            with self._lock:
+                self._counters["blocked"] += 1
+                self._counters["blocked_ms"] += (time.monotonic() - t0) * 1000.0
+            if overflow:
+                with self._lock:
+                    self._counters["overflow_sync"] += 1
+                self._write_sync([entry])
+                return
+        with self._lock:
+            self._counters["enqueued"] += 1
+            depth = self._q.qsize()
+            if depth > self._counters["high_water"]:
+                self._counters["high_water"] = depth
+
+    def stats(self) -> dict:
+        with self._lock:
+            st = dict(self._counters)
+            st["last_error"] = self._last_error
+        st["blocked_ms"] = round(st["blocked_ms"], 3)
+        st["queue_depth"] = self._q.qsize()
+        st["queue_max"] = self._q.maxsize
+        st["commit_interval_ms"] = int(self.commit_interval_s * 1000)
+        st["running"] = self._thread.is_alive()
+        return st
+
+    def close(self, timeout_s: float = 10.0):
+        """
+        Flush everything queued so far, fsync and stop the writer.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        try:
+            self._q.put(None, timeout=timeout_s)  # sentinel; the writer is draining
+        except queue.Full:
+            pass
+        self._thread.join(timeout_s)
+        with self._lock:
+            self._sync_locked()
+            self.store.close()
+
+    # ---- writer side ----
+
+    def _sync_locked(self):
+        if self.store.sync():
+            self._counters["fsyncs"] += 1
+        self._last_sync = time.monotonic()
+
+    def _write_locked(self, batch):
+        self.store.append(batch)
+        self._counters["written"] += len(batch)
+        self._counters["batches"] += 1
+
+    def _write_sync(self, batch):
+        with self._lock:
+            try:
+                self._write_locked(batch)
+                self._sync_locked()
+            except Exception as e:
+                self._counters["write_errors"] += 1
+                self._last_error = str(e)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            try:
+                item = self._q.get(timeout=self.commit_interval_s or None)
+            except queue.Empty:
+                item = False  # idle tick: just commit what is pending
+            batch = []
+            if item is None:
+                stop = True
+            elif item is not False:
+                batch.append(item)
+            while not stop and len(batch) < self.max_batch:
+                try:
+                    item = self._q.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    stop = True
+                else:
+                    batch.append(item)
+
+            with self._lock:
+                try:
+                    if batch:
+                        self._write_locked(batch)
+                    if stop or time.monotonic() - self._last_sync >= self.commit_interval_s:
+                        self._sync_locked()
+                except Exception as e:
+                    self._counters["write_errors"] += 1
+                    self._last_error = str(e)
+
+
+# -----------------------------
+# Provider metadata cache
+# -----------------------------
+
+class CachedFetch:
+    """
+    Caches one provider call (e.g. Ollama /api/tags).
+
+    - fresh (younger than ttl_s, or neg_ttl_s for a failure): returned as-is
+    - stale (up to stale_s past that): returned as-is while a single
+      background thread revalidates
+    - older, or nothing cached yet: fetched synchronously, single-flight;
+      concurrent callers wait for the one fetch instead of starting their own
+
+    Failures are cached like values (negative caching), so a provider that is
+    down costs one timeout per neg_ttl_s rather than one per request.
+    get() returns the value or re-raises the cached exception.
+    """
+
+    def __init__(self, fetch, ttl_s: float = 10.0, stale_s: float = 300.0, neg_ttl_s: float = 5.0):
+        self.fetch = fetch
+        self.ttl_s = float(ttl_s)
+        self.stale_s = float(stale_s)
+        self.neg_ttl_s = float(neg_ttl_s)
+        self._lock = threading.Lock()
+        self._entry = None  # (ok, value_or_exc, fetched_at monotonic, latency_s)
+        self._inflight = None  # threading.Event while a fetch runs
+        self._counters = {"hits": 0, "stale_hits": 0, "misses": 0, "fetches": 0, "errors": 0}
+
+    def _fetch_once(self, done: threading.Event):
+        t0 = time.monotonic()
+        try:
+            entry = (True, self.fetch(), time.monotonic(), time.monotonic() - t0)
+        except Exception as e:
+            entry = (False, e, time.monotonic(), time.monotonic() - t0)
+        with self._lock:
+            self._entry = entry
+            self._inflight = None
+            self._counters["fetches"] += 1
+            if not entry[0]:
+                self._counters["errors"] += 1
+        done.set()
+
+    def _start_fetch_locked(self):
+        done = threading.Event()
+        self._inflight = done
+        return done
+
+    def get(self):
+        with self._lock:
+            entry = self._entry
+            now = time.monotonic()
+            if entry is not None:
+                ttl = self.ttl_s if entry[0] else self.neg_ttl_s
+                age = now - entry[2]
+                if age < ttl:
+                    self._counters["hits"] += 1
+                    return self._unwrap(entry)
+                if age < ttl + self.stale_s:
+                    self._counters["stale_hits"] += 1
+                    if self._inflight is None:
+                        done = self._start_fetch_locked()
+                        threading.Thread(target=self._fetch_once, args=(done,),
+                                         name="buddy-provider-refresh", daemon=True).start()
+                    return self._unwrap(entry)
+            self._counters["misses"] += 1
+            done = self._inflight
+            owner = done is None
+            if owner:
+                done = self._start_fetch_locked()
+        if owner:
+            self._fetch_once(done)
+        else:
+            done.wait()
+        with self._lock:
+            return self._unwrap(self._entry)
+
+    @staticmethod
+    def _unwrap(entry):
+        if entry[0]:
+            return entry[1]
+        raise entry[1]
+
+    def invalidate(self):
+        with self._lock:
+            self._entry = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            st = dict(self._counters)
+            entry = self._entry
+        if entry is not None:
+            st["age_s"] = round(time.monotonic() - entry[2], 3)
+            st["last_ok"] = entry[0]
+            st["last_fetch_ms"] = round(entry[3] * 1000, 1)
+        return st
+
+
+# -----------------------------
+# Provider probes
+# -----------------------------
+
+# Scaffolded providers: id -> env var holding its API key
+PROVIDER_SCAFFOLDS = {
+    "ollama-cloud": "OLLAMA_API_KEY",
+    "openai": "OPENAI_API_KEY",
+    "gemini": "GEMINI_API_KEY",
+    "claude": "ANTHROPIC_API_KEY",
+    "grok": "XAI_API_KEY",
+}
+
+def provider_env(pid: str, suffix: str, default: str = "") -> str:
+    key = "BUDDY_PROVIDER_" + pid.upper().replace("-", "_") + "_" + suffix
+    return os.environ.get(key, default).strip()
+
+def parse_model_names(data) -> list:
+    """
+    Model names from the list shapes providers return:
+    Ollama {"models":[{"name"}]}, OpenAI/xAI {"data":[{"id"}]},
+    Gemini {"models":[{"name":"models/..."}]}.
+    """
+    items = []
+    if isinstance(data, dict):
+        items = data.get("models") or data.get("data") or []
+    names = []
+    for m in items if isinstance(items, list) else []:
+        if not isinstance(m, dict):
+            continue
+        name = m.get("name") or m.get("model") or m.get("id")
+        if isinstance(name, str) and name.strip():
+            names.append(name.strip())
+    return sorted(set(names))
+
+def http_model_probe(url: str, api_key_env: str):
+    """
+    Probe for a provider wired up via BUDDY_PROVIDER_<ID>_URL.
+    """
+    def probe(timeout_s: float):
+        headers = {"Accept": "application/json"}
+        key = os.environ.get(api_key_env, "").strip()
+        if key:
+            headers["Authorization"] = "Bearer " + key
+        with urlopen(Request(url, headers=headers), timeout=timeout_s) as r:
+            return parse_model_names(json.loads(r.read().decode("utf-8", errors="replace")))
+    return probe
+
+
+# -----------------------------
+# Directory listing (scandir, keyset-paged)
+# -----------------------------
+
+LIST_FIELDS = ("type", "size", "mtime", "mode")
+
+
+def scandir_sorted(path: str, after: str = None, batch: int = 4096, max_batch: int = 65536):
+    """
+    DirEntries of `path` in name order, starting after `after`. Each pass keeps
+    only the next `batch` names (heapq.nsmallest), so memory stays bounded for
+    directories of any size at the cost of one scandir pass per batch; the
+    batch doubles up to `max_batch` for callers that keep reading.
+    """
+    while True:
+        with os.scandir(path) as it:
+            page = heapq.nsmallest(batch, (e for e in it if after is None or e.name > after),
+                                   key=lambda e: e.name)
+        yield from page
+        if len(page) < batch:
+            return
+        after = page[-1].name
+        batch = min(batch * 2, max_batch)
+
+
+def iter_dir(root: str, cursor: str = "", max_depth: int = 0, sort: bool = True, skip=None, batch: int = 4096):
+    """
+    Depth-first walk yielding (relative_name, DirEntry). With sort, entries
+    come in path order and `cursor` (a relative name previously yielded)
+    resumes right after it, descending into it first if it is a directory.
+    Symlinked directories are not followed; skip(path) prunes entries.
+    """
+    def listing(path, after):
+        if sort:
+            return scandir_sorted(path, after, batch)
+        return os.scandir(path)
+
+    def descend(path, depth):
+        return depth < max_depth and not (skip and skip(path))
+
+    def walk(path, rel, depth, resume):
+        after = None
+        if resume:
+            after = resume[0]
+            head = os.path.join(path, after)
+            if descend(head, depth) and os.path.isdir(head) and not os.path.islink(head):
+                yield from walk(head, rel + after + "/", depth + 1, resume[1:])
+        try:
+            entries = listing(path, after)
+            for e in entries:
+                if skip and skip(e.path):
+                    continue
+                yield rel + e.name, e
+                if e.is_dir(follow_symlinks=False) and descend(e.path, depth):
+                    yield from walk(e.path, rel + e.name + "/", depth + 1, None)
+        except (PermissionError, FileNotFoundError, NotADirectoryError):
+            if depth == 0:
+                raise
+
+    yield from walk(root, "", 0, [x for x in cursor.split("/") if x] if sort else [])
+
+
+def dir_entry_info(rel: str, entry, fields) -> dict:
+    out = {"name": rel}
+    if "type" in fields:
+        if entry.is_symlink():
+            out["type"] = "symlink"
+        elif entry.is_dir():
+            out["type"] = "dir"
+        elif entry.is_file():
+            out["type"] = "file"
+        else:
+            out["type"] = "other"
+    if fields & {"size", "mtime", "mode"}:
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            st = None
+        if "size" in fields:
+            out["size"] = st.st_size if st else None
+        if "mtime" in fields:
+            out["mtime"] = st.st_mtime if st else None
+        if "mode" in fields:
+            out["mode"] = format(st.st_mode & 0o7777, "04o") if st else None
+    return out
+
+
+# -----------------------------
+# File reads (byte ranges / line windows)
+# -----------------------------
+
+READ_CHUNK = 64 * 1024
+
+
+def parse_byte_range(header: str, size: int):
+    """
+    Single "bytes=a-b" / "bytes=a-" / "bytes=-n" range -> (start, end_exclusive).
+    None if the header is absent, not a single byte range or invalid (b < a):
+    per RFC 9110 such a Range is ignored and the whole file served. Raises
+    ValueError if it is valid but unsatisfiable (HTTP 416).
+    """
+    m = re.fullmatch(r"\s*bytes\s*=\s*(\d*)\s*-\s*(\d*)\s*", header or "")
+    if not m or m.group(1) == m.group(2) == "":
+        return None
+    if m.group(1) != "" and m.group(2) != "" and int(m.group(2)) < int(m.group(1)):
+        return None
+    if m.group(1) == "":
+        n = int(m.group(2))
+        if n == 0:
+            raise ValueError("unsatisfiable range")
+        return max(0, size - n), size
+    start = int(m.group(1))
+    end = size if m.group(2) == "" else min(size, int(m.group(2)) + 1)
+    if start >= size:
+        raise ValueError("unsatisfiable range")
+    return start, end
+
+
+def line_offset(f, size: int, start: int, nlines: int) -> int:
+    """
+    Offset just past the `nlines`-th newline at or after `start` (or EOF).
+    Reads forward in READ_CHUNK blocks; never holds more than one block.
+    """
+    if nlines <= 0:
+        return start
+    f.seek(start)
+    pos = start
+    while pos < size:
+        block = f.read(READ_CHUNK)
+        if not block:
+            break
+        c = block.count(b"\n")
+        if c < nlines:
+            nlines -= c
+            pos += len(block)
+            continue
+        i = -1
+        for _ in range(nlines):
+            i = block.index(b"\n", i + 1)
+        return pos + i + 1
+    return size
+
+
+def tail_offset(f, size: int, nlines: int) -> int:
+    """
+    Offset where the last `nlines` lines start, scanning backwards in blocks.
+    A trailing newline ends the last line rather than starting an empty one.
+    """
+    if nlines <= 0 or size == 0:
+        return size
+    f.seek(size - 1)
+    need = nlines + (1 if f.read(1) == b"\n" else 0)
+    pos = size
+    while pos > 0:
+        n = min(READ_CHUNK, pos)
+        pos -= n
+        f.seek(pos)
+        block = f.read(n)
+        c = block.count(b"\n")
+        if c < need:
+            need -= c
+            continue
+        i = len(block)
+        for _ in range(need):
+            i = block.rindex(b"\n", 0, i)
+        return pos + i + 1
+    return 0
+
+
+def iter_file_range(path: str, start: int, end: int, chunk: int = READ_CHUNK):
+    with open(path, "rb") as f:
+        f.seek(start)
+        left = end - start
+        while left > 0:
+            data = f.read(min(chunk, left))
+            if not data:
+                break
+            left -= len(data)
+            yield data
+
+
+# -----------------------------
+# File search index (allowlist roots, mtime-diff refresh)
+# -----------------------------
+
+def glob_literal(pattern: str) -> str:
+    """
+    Longest wildcard-free run of an fnmatch pattern (every match contains it).
+    """
+    runs = re.split(r"\*|\?|\[[^\]]*\]", pattern)
+    return max(runs, key=len) if runs else ""
+
+
+class _SearchView:
+    """
+    Immutable snapshot the queries run against: entry names (and, lazily,
+    full paths) joined into one newline-separated string, plus a lowercased
+    copy. A query with a literal part is a str.find() sweep over contiguous
+    memory; only the few candidate lines are checked with a regex.
+    """
+
+    def __init__(self, dirs: dict, generation: int):
+        self.generation = generation
+        self.dir_paths = []
+        self.owner = array.array("l")   # entry -> index into dir_paths
+        self.is_dir = bytearray()       # entry -> 1 for directories
+        names = []
+        for d in sorted(dirs):
+            di = len(self.dir_paths)
+            self.dir_paths.append(d)
+            for n in dirs[d][1]:
+                isdir = n.endswith("/")
+                names.append((n[:-1] if isdir else n).replace("\n", "?"))
+                self.owner.append(di)
+                self.is_dir.append(isdir)
+        self.names = names
+        self._blobs = {"name": (self._blob(names), self._blob(self._lower(names)))}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _lower(items):
+        # str.lower() can change a string's length; keep those as-is
+        return [x.lower() if len(x.lower()) == len(x) else x for x in items]
+
+    @staticmethod
+    def _blob(items):
+        starts = array.array("q")
+        pos = 0
+        for x in items:
+            starts.append(pos)
+            pos += len(x) + 1
+        return "\n".join(items) + "\n", starts
+
+    def path(self, i: int) -> str:
+        return os.path.join(self.dir_paths[self.owner[i]], self.names[i])
+
+    def blobs(self, field: str):
+        with self._lock:
+            if field not in self._blobs:
+                paths = [self.path(i) for i in range(len(self.names))]
+                self._blobs[field] = (self._blob(paths), self._blob(self._lower(paths)))
+            return self._blobs[field]
+
+    def find(self, field: str = "name", literal: str = "", verify=None, rx=None, case_sensitive: bool = False):
+        """
+        Yields entry indexes whose name (field="name") or full path matches.
+        With `literal`, candidates are lines containing it (lowercased unless
+        case_sensitive) and `verify(line)` (if given) confirms each one.
+        Without it, compiled multi-line `rx` is run over the blob.
+        """
+        (blob, starts), (lblob, lstarts) = self.blobs(field)
+        if literal and not case_sensitive:
+            blob, starts, literal = lblob, lstarts, literal.lower()
+        pos = 0
+        while True:
+            if literal:
+                j = blob.find(literal, pos)
+                if j < 0:
+                    return
+            else:
+                m = rx.search(blob, pos)
+                if not m:
+                    return
+                j = m.start()
+            i = bisect.bisect_right(starts, j) - 1
+            end = starts[i + 1] if i + 1 < len(starts) else len(blob)
+            line = None
+            if verify is not None:
+                line = self.names[i] if field == "name" else self.path(i)
+                ok = verify(line)
+            elif not literal and "\n" in m.group(0):
+                ok = rx.search(blob, starts[i], end - 1) is not None
+            else:
+                ok = True
+            if ok:
+                yield i
+            pos = end
+
+
+class FileIndex:
+    """
+    Name/path index over the policy's allowlist roots, skipping blacklist and
+    no_memory_zones. refresh() is an mtime-diff scan: every indexed directory
+    is stat()ed, and only directories whose mtime changed are re-listed, so a
+    refresh costs one stat per directory rather than per file. Directory
+    listings persist in sqlite (one row per directory) across restarts.
+
+    A background thread refreshes every `refresh_s`; search() can also ask
+    for a synchronous refresh.
+    """
+
+    def __init__(self, db_path: str, policy: dict, refresh_s: float = 300.0):
+        self.db_path = db_path
+        self.set_policy(policy)
+        self.refresh_s = refresh_s
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._dirs = {}  # dir -> (mtime_ns, names); directory names end with "/"
+        self._gen = 0
+        self._view = None
+        self.last_refresh = None
+        self.last_refresh_stats = {}
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS dirs (path TEXT PRIMARY KEY, mtime_ns INTEGER, names TEXT)")
+        for path, mtime_ns, names in self._db.execute("SELECT path, mtime_ns, names FROM dirs"):
+            self._dirs[path] = (mtime_ns, tuple(names.split("\0")) if names else ())
+        self._db.commit()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="buddy-search-index", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.refresh()
+            except Exception:
+                sys.stderr.write(f"search index refresh failed:\n{traceback.format_exc()}")
+            self._stop.wait(self.refresh_s)
+
+    def set_policy(self, pol: dict):
+        """
+        Roots = allowlist; blacklist and no_memory_zones are never indexed.
+        Takes effect on the next refresh (queries filter by it immediately).
+        """
+        roots = [abspath(x) for x in pol.get("allowlist", []) if isinstance(x, str)]
+        skip = [x for x in (pol.get("blacklist", []) or []) + (pol.get("no_memory_zones", []) or [])
+                if isinstance(x, str)]
+        self._roots_rules = (roots, PathRuleIndex({"allow_mode": "allowlist", "allowlist": roots, "blacklist": skip}))
+
+    def allowed(self, path: str) -> bool:
+        return self._roots_rules[1].check(path)[0]
+
+    def refresh(self) -> dict:
+        with self._refresh_lock:
+            t0 = time.monotonic()
+            roots, rules = self._roots_rules
+            old = self._dirs
+            seen = set()
+            changed = {}
+            settle_ns = time.time_ns() - 2_000_000_000
+            stack = list(reversed(roots))
+            while stack:
+                d = stack.pop()
+                if d in seen or not rules.check(d)[0]:
+                    continue
+                try:
+                    st = os.stat(d)
+                except OSError:
+                    continue
+                if not stat.S_ISDIR(st.st_mode):
+                    continue
+                seen.add(d)
+                prev = old.get(d)
+                if prev is not None and prev[0] == st.st_mtime_ns:
+                    names = prev[1]
+                else:
+                    try:
+                        with os.scandir(d) as it:
+                            names = tuple(sorted(e.name + ("/" if e.is_dir(follow_symlinks=False) else "") for e in it))
+                    except OSError:
+                        continue
+                    # a directory touched within the last ~2s may change again within
+                    # the same mtime tick; store no mtime so the next pass re-lists it
+                    mtime_ns = st.st_mtime_ns if st.st_mtime_ns < settle_ns else -1
+                    if prev is None or prev != (mtime_ns, names):
+                        changed[d] = (mtime_ns, names)
+                stack.extend(os.path.join(d, n[:-1]) for n in reversed(names) if n.endswith("/"))
+            removed = [d for d in old if d not in seen]
+
+            if changed or removed:
+                with self._lock:
+                    dirs = dict(self._dirs)
+                    dirs.update(changed)
+                    for d in removed:
+                        dirs.pop(d, None)
+                    self._dirs = dirs
+                    self._gen += 1
+                self._db.executemany("INSERT OR REPLACE INTO dirs (path, mtime_ns, names) VALUES (?, ?, ?)",
+                                     [(d, m, "\0".join(n)) for d, (m, n) in changed.items()])
+                self._db.executemany("DELETE FROM dirs WHERE path = ?", [(d,) for d in removed])
+                self._db.commit()
+                self.view()  # build the new snapshot here, not on the next query
+            self.last_refresh = now_utc()
+            self.last_refresh_stats = {
+                "dirs": len(seen),
+                "dirs_relisted": len(changed),
+                "dirs_removed": len(removed),
+                "elapsed_ms": round((time.monotonic() - t0) * 1000, 1),
+            }
+            return self.last_refresh_stats
+
+    def view(self) -> _SearchView:
+        with self._lock:
+            dirs, gen, view = self._dirs, self._gen, self._view
+        if view is None or view.generation != gen:
+            view = _SearchView(dirs, gen)
+            with self._lock:
+                if self._view is None or self._view.generation < gen:
+                    self._view = view
+        return view
+
+    def stats(self) -> dict:
+        view = self._view
+        return {
+            "db_path": self.db_path,
+            "dirs": len(self._dirs),
+            "entries": len(view.names) if view else None,
+            "generation": self._gen,
+            "last_refresh": self.last_refresh,
+            "last_refresh_stats": self.last_refresh_stats,
+        }
+
+    def close(self):
+        self._stop.set()
+        with self._refresh_lock:
+            self._db.close()
+
+
+def grep_file(path: str, rx, max_bytes: int, max_matches: int, stop):
+    """
+    Line matches of `rx` in one text file: [(line_no, line)]. Skips files over
+    max_bytes and files that look binary (NUL in the first 8 KiB).
+    """
+    out = []
+    try:
+        if os.path.getsize(path) > max_bytes:
+            return out
+        with open(path, "rb") as f:
+            if b"\0" in f.read(8192):
+                return out
+            f.seek(0)
+            for no, raw in enumerate(f, 1):
+                line = raw.decode("utf-8", errors="replace").rstrip("\r\n")
+                if rx.search(line):
+                    out.append((no, line[:500]))
+                    if len(out) >= max_matches or stop.is_set():
+                        break
+    except OSError:
+        pass
+    return out
+
+
+# -----------------------------
+# Background jobs
+# -----------------------------
+
+class Job:
+    TAIL_CHARS = 20000  # same cap exec_shell applies to its output
+
+    def __init__(self, action_id: str, action: str, params: dict, reason: str, snap: PolicySnapshot):
+        self.action_id = action_id
+        self.action = action
+        self.params = params
+        self.reason = reason
+        self.snap = snap  # policy pinned when the job was accepted
+        self.status = "queued"  # queued|running|paused|done|failed|cancelled
+        self.created = now_utc()
+        self.started = None
+        self.finished = None
+        self.result = None
+        self.error = ""
+        self.pid = None  # process group leader, for shell jobs
+        self.cancel_requested = False
+        self.tails = {"stdout": collections.deque(), "stderr": collections.deque()}
+        self.tail_len = {"stdout": 0, "stderr": 0}
+        self.bytes = {"stdout": 0, "stderr": 0}
+
+    def append(self, stream: str, text: str):
+        dq = self.tails[stream]
+        dq.append(text)
+        self.tail_len[stream] += len(text)
+        while self.tail_len[stream] - len(dq[0]) >= self.TAIL_CHARS:
+            self.tail_len[stream] -= len(dq.popleft())
+
+    def tail(self, stream: str) -> str:
+        return "".join(self.tails[stream])[-self.TAIL_CHARS:]
+
+    def summary(self, output: bool = False) -> dict:
+        out = {
+            "action_id": self.action_id,
+            "action": self.action,
+            "status": self.status,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "error": self.error,
+        }
+        if output:
+            out["result"] = self.result
+            out["stdout_tail"] = self.tail("stdout")
+            out["stderr_tail"] = self.tail("stderr")
+            out["stdout_bytes"] = self.bytes["stdout"]
+            out["stderr_bytes"] = self.bytes["stderr"]
+        return out
+
+
+class JobRegistry:
+    """
+    Runs actions off the request thread. POST /jobs returns as soon as the job
+    is queued; a bounded pool runs at most `workers` jobs at once and at most
+    `max_queue` more may wait (beyond that submit() refuses, HTTP 429).
+
+    Shell jobs run through exec_shell_stream in their own process group, so
+    cancel/pause/resume signal the whole group. Other actions run through the
+    normal dispatcher and can only be cancelled while still queued.
+    Finished jobs are kept (most recent `keep_finished`) for polling.
+    """
+
+    PROCESS_ACTIONS = {"shell"}  # run as a process group via execute_stream
+
+    def __init__(self, engine, workers: int = 4, max_queue: int = 64, keep_finished: int = 200):
+        self.engine = engine
+        self.max_queue = max(0, int(max_queue))
+        self.keep_finished = max(1, int(keep_finished))
+        self._pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, int(workers)), thread_name_prefix="buddy-job")
+        self._lock = threading.Lock()
+        self._jobs = collections.OrderedDict()
+        self._queued = 0
+
+    def submit(self, action_id: str, action: str, params: dict, reason: str, snap: PolicySnapshot):
+        with self._lock:
+            if self._queued >= self.max_queue:
+                return None
+            job = Job(action_id, action, params, reason, snap)
+            self._jobs[action_id] = job
+            self._queued += 1
+            self._prune_locked()
+        self._pool.submit(self._run, job)
+        return job
+
+    def get(self, action_id: str):
+        with self._lock:
+            return self._jobs.get(action_id)
+
+    def list(self):
+        with self._lock:
+            return [j.summary() for j in self._jobs.values()]
+
+    def cancel(self, action_id: str):
+        with self._lock:
+            job = self._jobs.get(action_id)
+            if job is None:
+                return None
+            if job.status in ("done", "failed", "cancelled"):
+                return job
+            if job.status != "queued" and job.action not in self.PROCESS_ACTIONS:
+                return job  # in-process action already running; let it finish
+            job.cancel_requested = True
+            if job.status == "queued":
+                job.status = "cancelled"
+                job.finished = now_utc()
+                queued = True
+            else:
+                queued = False
+            pid = job.pid
+        if queued:
+            self.engine.audit({"action_id": job.action_id, "action": job.action, "reason": job.reason,
+                               "result": "cancelled", "params": job.params, "queued": True})
+            return job
+        if pid is not None:
+            self._signal(pid, signal.SIGKILL)
+        return job
+
+    def pause(self, action_id: str, resume: bool = False):
+        with self._lock:
+            job = self._jobs.get(action_id)
+            if job is None:
+                return None, "not found"
+            if job.pid is None:
+                return job, "only shell jobs can be paused"
+            if job.status != ("paused" if resume else "running"):
+                return job, f"job is {job.status}"
+            job.status = "running" if resume else "paused"
+            pid = job.pid
+        self._signal(pid, signal.SIGCONT if resume else signal.SIGSTOP)
+        return job, ""
+
+    @staticmethod
+    def _signal(pgid: int, sig):
+        try:
+            os.killpg(pgid, sig)
+        except (ProcessLookupError, PermissionError):
+            pass
+
+    def close(self):
+        with self._lock:
+            pids = [j.pid for j in self._jobs.values() if j.pid is not None and j.status in ("running", "paused")]
+        for pid in pids:
+            self._signal(pid, signal.SIGKILL)
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _prune_locked(self):
+        finished = [k for k, j in self._jobs.items() if j.status in ("done", "failed", "cancelled")]
+        for k in finished[:max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[k]
+
+    def _run(self, job: Job):
+        with self._lock:
+            self._queued -= 1
+            if job.cancel_requested:
+                return
+            job.status = "running"
+            job.started = now_utc()
+
+        ok = False
+        try:
+            if job.action in self.PROCESS_ACTIONS:
+                events = self.engine.execute_stream(job.action, job.params, True, job.reason,
+                                                    action_id=job.action_id,
+                                                    cancelled=lambda: job.cancel_requested,
+                                                    snap=job.snap, wait_s=float("inf"))
+                for ev in events:
+                    kind = ev["event"]
+                    if kind == "start":
+                        with self._lock:
+                            job.pid = ev["pid"]
+                            cancel = job.cancel_requested
+                        if cancel:
+                            self._signal(job.pid, signal.SIGKILL)
+                    elif kind in ("stdout", "stderr"):
+                        with self._lock:
+                            job.append(kind, ev["data"])
+                            job.bytes[kind] += len(ev["data"].encode("utf-8"))
+                    elif kind == "exit":
+                        job.result = {"returncode": ev["returncode"], "timed_out": ev["timed_out"]}
+                        job.error = "command timed out" if ev["timed_out"] else ""
+                    elif kind in ("error", "result"):
+                        job.error = ev.get("error", "")
+                ok = not job.error
+            else:
+                resp = self.engine.run_action(job.action_id, job.action, job.params, job.reason, job.snap,
+                                              wait_s=float("inf"))
+                ok = resp["ok"]
+                job.result = resp.get("result")
+                job.error = resp.get("error", "")
+        except Exception as e:
+            # a handler raising must not leave the job "running" forever
+            ok = False
+            job.error = str(e) or e.__class__.__name__
+            self.engine.audit({"action_id": job.action_id, "action": job.action, "reason": job.reason,
+                               "result": "error", "error": job.error}, job.snap)
+        finally:
+            with self._lock:
+                job.finished = now_utc()
+                if job.cancel_requested:
+                    job.status = "cancelled"
+                else:
+                    job.status = "done" if ok else "failed"
+                self._prune_locked()
+
+
+# -----------------------------
+# Persistent shell sessions
+# -----------------------------
+
+SHELL_OUTPUT_CHARS = 20000  # exec_shell keeps the last this-many chars of each stream
+
+# BUDDY_SHELL_LIMITS name -> (bash ulimit flag, multiplier to ulimit's unit)
+SHELL_LIMIT_FLAGS = {
+    "core_mb": ("c", 1024),
+    "fsize_mb": ("f", 1024),
+    "mem_mb": ("v", 1024),
+    "cpu_s": ("t", 1),
+    "nofile": ("n", 1),
+    "nproc": ("u", 1),
+}
+DEFAULT_SHELL_LIMITS = {"core_mb": 0}
+# credential-style names, matched on whole "_"-separated parts (GITHUB_TOKEN,
+# OPENAI_API_KEY, AWS_SECRET_ACCESS_KEY) so XAUTHORITY or SSH_AUTH_SOCK survive
+SHELL_SECRET_RE = re.compile(
+    r"(^|_)(TOKENS?|SECRETS?|PASSWORDS?|PASSWD|PASSPHRASE|API_?KEYS?|CREDENTIALS?|PRIVATE_KEY|ACCESS_KEY)(_|$)",
+    re.I)
+# always passed through: what X/Wayland clients, D-Bus and ssh agents need
+# ("PREFIX*" keeps every name with that prefix)
+DEFAULT_SHELL_ENV_KEEP = ("DISPLAY", "WAYLAND_DISPLAY", "XAUTHORITY", "XDG_RUNTIME_DIR",
+                          "SSH_AUTH_SOCK", "SSH_AGENT_PID", "DBUS_*")
+
+
+def parse_shell_limits(spec: str) -> dict:
+    """
+    "mem_mb=2048,nofile=256" -> DEFAULT_SHELL_LIMITS with those limits set.
+    Unknown names are ignored.
+    """
+    limits = dict(DEFAULT_SHELL_LIMITS)
+    for item in (spec or "").split(","):
+        name, sep, n = item.partition("=")
+        if sep and name.strip() in SHELL_LIMIT_FLAGS and n.strip().isdigit():
+            limits[name.strip()] = int(n)
+    return limits
+
+
+class ShellSandbox:
+    """
+    Confinement for persistent session workers (one-shot, streamed and job
+    shells keep the plain `bash -lc` behavior):
+    - env: the broker's environment minus BUDDY_* settings and anything that
+      looks like a credential (names matching SHELL_SECRET_RE), except names
+      in DEFAULT_SHELL_ENV_KEEP or `keep` ("PREFIX*" entries match prefixes)
+    - cwd: a fixed starting directory
+    - limits: hard rlimits applied with bash's own `ulimit` before the
+      command runs, so they cannot be raised again from inside (no
+      preexec_fn, which is not safe in this threaded process)
+    """
+
+    def __init__(self, cwd: str = None, limits: dict = None, keep=()):
+        self.cwd = cwd or os.path.expanduser("~")
+        self.limits = dict(DEFAULT_SHELL_LIMITS if limits is None else limits)
+        keep = set(DEFAULT_SHELL_ENV_KEEP) | set(keep)
+        self.keep = {k for k in keep if not k.endswith("*")}
+        self.keep_prefixes = tuple(k[:-1] for k in keep if k.endswith("*"))
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            cwd=os.environ.get("BUDDY_SHELL_CWD", "").strip() or None,
+            limits=parse_shell_limits(os.environ.get("BUDDY_SHELL_LIMITS", "")),
+            keep=[k.strip() for k in os.environ.get("BUDDY_SHELL_ENV_KEEP", "").split(",") if k.strip()],
+        )
+
+    def env(self) -> dict:
+        return {k: v for k, v in os.environ.items()
+                if k in self.keep or k.startswith(self.keep_prefixes)
+                or not (k.startswith("BUDDY_") or SHELL_SECRET_RE.search(k))}
+
+    def prelude(self) -> str:
+        """
+        `ulimit -H -S` lines for the configured limits. A limit that cannot be
+        set because the inherited hard limit is already lower is left as is.
+        """
+        out = []
+        for name, value in sorted(self.limits.items()):
+            flag, unit = SHELL_LIMIT_FLAGS[name]
+            out.append(f"ulimit -H -S -{flag} {int(value) * unit} 2>/dev/null\n")
+        return "".join(out)
+
+    def popen_kwargs(self) -> dict:
+        return {"env": self.env(), "cwd": self.cwd}
+
+
+class ShellWorker:
+    """
+    One long-lived `bash --login -s` reading commands from its stdin, so the
+    login profile is sourced once per worker instead of once per command, and
+    `cd`/`export` persist between commands.
+
+    Framing: each command is sent as `eval '<cmd>' </dev/null` followed by two
+    printf's of a per-command random token, one on stdout carrying $? and $PWD
+    and one on stderr. Output up to the token is the command's output. The
+    worker runs in its own process group; a timeout kills the group and the
+    worker is dead from then on (the pool replaces it). The sandbox's env and
+    cwd apply at spawn, its limits as the worker's first command.
+    """
+
+    def __init__(self, sandbox: ShellSandbox):
+        self.proc = subprocess.Popen(
+            ["bash", "--login", "-s"],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,
+            **sandbox.popen_kwargs(),
+        )
+        for f in (self.proc.stdout, self.proc.stderr):
+            os.set_blocking(f.fileno(), False)
+        self.lock = threading.Lock()  # one command at a time
+        self.created = now_utc()
+        self.last_used = time.monotonic()
+        self.commands = 0
+        self.cwd = sandbox.cwd
+        # wait out profile sourcing so its output is not charged to the first command
+        self.run(sandbox.prelude() + ":", timeout_s=60)
+        self.commands = 0
+
+    @property
+    def alive(self) -> bool:
+        return self.proc.poll() is None
+
+    def run(self, cmd: str, timeout_s: float, cap_bytes: int = 4 * SHELL_OUTPUT_CHARS):
+        """
+        Runs one command. Returns a dict with returncode, stdout, stderr,
+        timed_out and exited (the command ended the shell, e.g. `exit`).
+        Only the last cap_bytes of each stream are kept.
+        """
+        self.last_used = time.monotonic()
+        self.commands += 1
+        tok = uuid.uuid4().hex
+        frame = (f"eval {shlex.quote(cmd)} </dev/null\n"
+                 f"printf '\\n{tok}:%d:%s\\n' \"$?\" \"$PWD\"\n"
+                 f"printf '\\n{tok}\\n' >&2\n")
+        ends = {"stdout": f"\n{tok}:".encode(), "stderr": f"\n{tok}\n".encode()}
+        bufs = {"stdout": bytearray(), "stderr": bytearray()}
+        marks = {}
+        found = {}
+        try:
+            self.proc.stdin.write(frame.encode("utf-8"))
+            self.proc.stdin.flush()
+        except OSError:
+            return self._finish(bufs, found, timed_out=False)
+
+        sel = selectors.DefaultSelector()
+        streams = {self.proc.stdout.fileno(): "stdout", self.proc.stderr.fileno(): "stderr"}
+        for fd in streams:
+            sel.register(fd, selectors.EVENT_READ)
+        deadline = time.monotonic() + timeout_s
+        try:
+            while streams and len(found) < 2:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    self.kill()
+                    return self._finish(bufs, found, timed_out=True)
+                for key, _ in sel.select(timeout=left):
+                    name = streams[key.fd]
+                    try:
+                        data = os.read(key.fd, 65536)
+                    except BlockingIOError:
+                        continue
+                    if not data:
+                        sel.unregister(key.fd)
+                        del streams[key.fd]
+                        continue
+                    buf = bufs[name]
+                    buf += data
+                    i = marks.get(name)
+                    if i is None:
+                        i = buf.find(ends[name], max(0, len(buf) - len(data) - len(ends[name])))
+                        if i < 0:
+                            if len(buf) > 2 * cap_bytes:
+                                del buf[:len(buf) - cap_bytes]
+                            continue
+                        marks[name] = i
+                    rest = bytes(buf[i + len(ends[name]):])
+                    if name == "stdout" and b"\n" not in rest:
+                        continue  # "<rc>:<cwd>\n" not complete yet
+                    found[name] = rest
+                    del buf[i:]
+                    sel.unregister(key.fd)
+                    del streams[key.fd]
+        finally:
+            sel.close()
+        return self._finish(bufs, found, timed_out=False)
+
+    def _finish(self, bufs, found, timed_out: bool):
+        rc = None
+        if "stdout" in found:
+            rc_s, _, cwd = found["stdout"].split(b"\n", 1)[0].decode("utf-8", "replace").partition(":")
+            rc = int(rc_s) if rc_s.lstrip("-").isdigit() else None
+            self.cwd = cwd or self.cwd
+        exited = not timed_out and len(found) < 2
+        if exited:
+            self.kill()
+            rc = self.proc.returncode
+        return {
+            "returncode": rc,
+            "stdout": bufs["stdout"].decode("utf-8", "replace")[-SHELL_OUTPUT_CHARS:],
+            "stderr": bufs["stderr"].decode("utf-8", "replace")[-SHELL_OUTPUT_CHARS:],
+            "timed_out": timed_out,
+            "exited": exited,
+        }
+
+    def kill(self):
+        if self.alive:
+            try:
+                os.killpg(self.proc.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        try:
+            self.proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            pass
+        for f in (self.proc.stdin, self.proc.stdout, self.proc.stderr):
+            try:
+                f.close()
+            except OSError:
+                pass
+
+
+def session_hint(session) -> str:
+    """
+    Shortened session id for listings and audit records: the full id is
+    what grants access to the session, so it is never shown back.
+    """
+    session = str(session)
+    return session if session == "new" else session[:6] + "..."
+
+
+def mask_audit_sessions(entry: dict) -> dict:
+    """
+    Replaces params.session of an audit entry, and of each batch step under
+    "steps", with session_hint() (in place; entry is the redacted copy).
+    """
+    for e in [entry] + [x for x in entry.get("steps") or [] if isinstance(x, dict)]:
+        p = e.get("params")
+        if isinstance(p, dict) and p.get("session"):
+            p["session"] = session_hint(p["session"])
+    return entry
+
+
+class ShellSessionPool:
+    """
+    Shell sessions (one ShellWorker each) for agents that send many small
+    commands. Session ids are unguessable tokens issued by create(); a client
+    can only use a session whose id it was given, and unknown ids are an
+    error rather than a new session. `warm` workers are kept pre-spawned, so
+    a new session gets a shell whose profile is already sourced. Sessions
+    idle for `idle_s` are closed; at most `max_sessions` exist (the least
+    recently used idle one is evicted to make room). A worker that timed out
+    or exited is replaced on the session's next command, with a fresh cwd/env.
+    """
+
+    def __init__(self, sandbox: ShellSandbox, metrics: "Metrics" = None, warm: int = 2,
+                 max_sessions: int = 16, idle_s: float = 600.0):
+        self.sandbox = sandbox
+        self.metrics = metrics
+        self.warm = max(0, int(warm))
+        self.max_sessions = max(1, int(max_sessions))
+        self.idle_s = idle_s
+        self._lock = threading.Lock()
+        self._spare = collections.deque()
+        # id -> ShellWorker (None until first use or after a reset), least recently used first
+        self._sessions = collections.OrderedDict()
+        self._touched = {}  # id -> monotonic time of last use (idle expiry for sessions with no shell)
+        self.spawned = 0
+        self.resets = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="buddy-shell-pool", daemon=True)
+        self._thread.start()
+
+    def _spawn(self) -> ShellWorker:
+        self.spawned += 1
+        if self.metrics is not None:
+            self.metrics.inc("buddy_subprocesses_spawned_total", (("kind", "shell_session"),))
+        return ShellWorker(self.sandbox)
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self._reap()
+            while not self._stop.is_set():
+                with self._lock:
+                    short = len(self._spare) < self.warm
+                if not short:
+                    break
+                w = self._spawn()
+                with self._lock:
+                    self._spare.append(w)
+            self._wake.wait(min(30.0, max(1.0, self.idle_s / 2)))
+            self._wake.clear()
+
+    def _reap(self):
+        now = time.monotonic()
+        dead = []
+        with self._lock:
+            for sid, w in list(self._sessions.items()):
+                if w is None:
+                    if now - self._touched.get(sid, now) > self.idle_s:
+                        del self._sessions[sid]
+                        self._touched.pop(sid, None)
+                    continue
+                if not w.lock.locked() and (now - w.last_used > self.idle_s or not w.alive):
+                    dead.append(self._sessions.pop(sid))
+                    self._touched.pop(sid, None)
+            dead += [w for w in self._spare if not w.alive]
+            self._spare = collections.deque(w for w in self._spare if w.alive)
+        for w in dead:
+            w.kill()
+
+    def create(self):
+        """
+        Issues a new session id; None if the session limit is reached and
+        every session is busy. The shell itself starts on first use.
+        """
+        evicted = None
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                idle = [sid for sid, x in self._sessions.items() if x is None or not x.lock.locked()]
+                if not idle:
+                    return None
+                evicted = self._sessions.pop(idle[0])
+                self._touched.pop(idle[0], None)
+            session = secrets.token_urlsafe(24)
+            self._sessions[session] = None
+            self._touched[session] = time.monotonic()
+        if evicted is not None:
+            evicted.kill()
+        return session
+
+    def _acquire(self, session: str):
+        """
+        The session's worker, starting (or replacing) it if needed; None if
+        the session id was never issued, or was closed/expired.
+        """
+        with self._lock:
+            if session not in self._sessions:
+                return None
+            w = self._sessions[session]
+            self._sessions.move_to_end(session)
+            self._touched[session] = time.monotonic()
+            if w is not None and w.alive:
+                return w
+            w = self._spare.popleft() if self._spare else None
+        if w is None:
+            w = self._spawn()
+        with self._lock:
+            if session not in self._sessions:  # closed while the shell started
+                stale, old = w, None
+            else:
+                stale, old = None, self._sessions[session]
+                self._sessions[session] = w
+        if stale is not None:
+            stale.kill()
+            return None
+        if old is not None:
+            self.resets += 1
+            old.kill()
+        self._wake.set()  # top the spare pool back up
+        return w
 
-def path_is_under(p: str, root: str) -> bool:
-    p = os.path.normpath(p)
-    root = os.path.normpath(root)
-    if p == root:
-        return True
-    return p.startswith(root + os.sep)
+    def run(self, session: str, cmd: str, timeout_s: float):
+        """
+        Runs cmd in the session's shell. Returns (ok, err, result); result has
+        the exec_shell fields plus session, cwd and session_reset (the shell
+        was replaced: timeout, or the command exited it).
+        """
+        w = self._acquire(session)
+        if w is None:
+            return False, "unknown or expired shell session (start one with session \"new\")", None
+        with w.lock:
+            if not w.alive:  # replaced while we waited
+                return self.run(session, cmd, timeout_s)
+            if self.metrics is not None:
+                self.metrics.gauge_add("buddy_subprocesses_running", (), 1)
+            try:
+                r = w.run(cmd, timeout_s)
+            finally:
+                if self.metrics is not None:
+                    self.metrics.gauge_add("buddy_subprocesses_running", (), -1)
+        reset = r["timed_out"] or r["exited"]
+        if reset:
+            with self._lock:
+                if self._sessions.get(session) is w:
+                    self._sessions[session] = None  # the id stays valid; next use gets a new shell
+                    self.resets += 1
+        if r["timed_out"]:
+            return False, "command timed out (session restarted)", None
+        return True, "", {
+            "cmd": cmd,
+            "returncode": r["returncode"],
+            "stdout": r["stdout"],
+            "stderr": r["stderr"],
+            "session": session,
+            "cwd": w.cwd,
+            "session_reset": reset,
+        }
 
+    def close_session(self, session: str) -> bool:
+        with self._lock:
+            if session not in self._sessions:
+                return False
+            w = self._sessions.pop(session)
+            self._touched.pop(session, None)
+        if w is not None:
+            w.kill()
+        return True
 
-# -----------------------------
-# Redaction (improved, recursive)
-# -----------------------------
+    def list(self):
+        """
+        Sessions with ids shortened to a prefix: the full id is the
+        credential for the session, so listings do not hand it out.
+        """
+        now = time.monotonic()
+        with self._lock:
+            return [{"session": session_hint(sid), "pid": w.proc.pid if w else None,
+                     "cwd": w.cwd if w else self.sandbox.cwd, "commands": w.commands if w else 0,
+                     "busy": bool(w and w.lock.locked()), "created": w.created if w else None,
+                     "idle_s": round(now - w.last_used, 1) if w else None}
+                    for sid, w in self._sessions.items()]
 
-_SECRET_PATTERNS = [
-    # GitHub tokens
-    (re.compile(r"(ghp_[A-Za-z0-9]{20,})"), "[REDACTED_GITHUB_TOKEN]"),
-    # OpenAI-ish keys
-    (re.compile(r"(sk-[A-Za-z0-9]{20,})"), "[REDACTED_OPENAI_KEY]"),
-    # Google API keys
-    (re.compile(r"(AIza[0-9A-Za-z\-_]{20,})"), "[REDACTED_GOOGLE_KEY]"),
-    # JWTs
-    (re.compile(r"([A-Za-z0-9_\-]{24,}\.[A-Za-z0-9_\-]{10,}\.[A-Za-z0-9_\-]{10,})"), "[REDACTED_JWT]"),
-    # Generic bearer tokens
-    (re.compile(r"(?i)\bBearer\s+[A-Za-z0-9._\-]{10,}"), "Bearer [REDACTED]"),
-    # Generic api_key=... patterns
-    (re.compile(r"(?i)\b(api[_-]?key|token|secret)\b\s*[:=]\s*([^\s\"']{8,})"), r"\1=[REDACTED]"),
-]
+    def stats(self) -> dict:
+        with self._lock:
+            return {"sessions": len(self._sessions), "spare": len(self._spare), "warm": self.warm,
+                    "max_sessions": self.max_sessions, "idle_s": self.idle_s,
+                    "spawned": self.spawned, "resets": self.resets}
 
-def redact_secrets(obj):
-    """
-    Recursively redact secrets from strings inside dicts/lists.
-    """
-    if isinstance(obj, str):
-        s = obj
-        for pat, rep in _SECRET_PATTERNS:
-            s = pat.sub(rep, s)
-        return s
-    if isinstance(obj, list):
-        return [redact_secrets(x) for x in obj]
-    if isinstance(obj, dict):
-        return {k: redact_secrets(v) for k, v in obj.items()}
-    return obj
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        with self._lock:
+            workers = [w for w in self._sessions.values() if w is not None] + list(self._spare)
+            self._sessions.clear()
+            self._touched.clear()
+            self._spare.clear()
+        for w in workers:
+            w.kill()
 
 
 # -----------------------------
@@ -130,6 +2193,8 @@ def default_policy(repo_root: str):
             "mkdir": "allow",
             "write_file": "ask",
             "list_dir": "allow",
+            "read_file": "allow",
+            "search_files": "allow",
             "open_url": "allow",
             "launch_app": "ask",
             "shell": "deny",
@@ -140,6 +2205,431 @@ def default_policy(repo_root: str):
     }
 
 
+# -----------------------------
+# Policy validation + hot reload
+# -----------------------------
+
+def validate_policy(pol) -> str:
+    """
+    "" if `pol` has the policy.json shape the engine relies on, else why not.
+    """
+    if not isinstance(pol, dict):
+        return "policy must be a JSON object"
+    mode = pol.get("allow_mode", "allowlist")
+    if str(mode).lower() not in ("allowlist", "blacklist", "open"):
+        return f"allow_mode must be allowlist|blacklist|open, not {mode!r}"
+    for key in ("allowlist", "blacklist", "no_memory_zones"):
+        v = pol.get(key, [])
+        if not isinstance(v, list) or not all(isinstance(x, str) for x in v):
+            return f"{key} must be a list of paths"
+    for key in ("consent", "re_auth_required"):
+        if not isinstance(pol.get(key, {}), dict):
+            return f"{key} must be an object"
+    for action, rule in pol.get("consent", {}).items():
+        if str(rule).lower() not in ("allow", "ask", "deny"):
+            return f"consent.{action} must be allow|ask|deny, not {rule!r}"
+    return ""
+
+
+class PolicyWatcher:
+    """
+    Watches policy.json by polling its (mtime_ns, size, inode) every
+    `interval_s`. On a change the file is parsed, validated and compiled on
+    this thread and then swapped into the engine in one step, so request
+    threads never parse JSON or see a partly built policy. A file that fails
+    to parse or validate is reported (stats()["last_error"]) and the last
+    good policy stays in force.
+    """
+
+    def __init__(self, engine, path: str, interval_s: float = 1.0):
+        self.engine = engine
+        self.path = path
+        self.interval_s = interval_s
+        self.lock = threading.RLock()
+        self._sig = self._signature()
+        self._failed_sig = None
+        self.reloads = 0
+        self.failures = 0
+        self.last_error = ""
+        self.last_reload = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size, st.st_ino
+
+    def mark_current(self):
+        """
+        The engine just wrote the file itself; don't reload it again.
+        """
+        with self.lock:
+            self._sig = self._signature()
+
+    def check(self, force: bool = False):
+        """
+        Reloads if the file changed (or force). Returns (reloaded, error).
+        """
+        with self.lock:
+            sig = self._signature()
+            if not force and (sig == self._sig or sig == self._failed_sig):
+                return False, ""
+            if sig is None:
+                err = "policy file missing"
+            else:
+                try:
+                    pol = read_json(self.path)
+                    err = validate_policy(pol)
+                except (OSError, ValueError) as e:
+                    err = f"cannot parse policy: {e}"
+            if err:
+                self._failed_sig = sig
+                self.failures += 1
+                self.last_error = err
+                sys.stderr.write(f"policy reload failed ({self.path}): {err}; keeping last good policy\n")
+                return False, err
+            self.engine._set_policy(pol)
+            self._sig = sig
+            self._failed_sig = None
+            self.reloads += 1
+            self.last_error = ""
+            self.last_reload = now_utc()
+            return True, ""
+
+    def start(self):
+        if self.interval_s <= 0:
+            return
+        self._thread = threading.Thread(target=self._loop, name="buddy-policy-watch", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval_s):
+            try:
+                self.check()
+            except Exception:
+                sys.stderr.write(f"policy watcher error:\n{traceback.format_exc()}")
+
+    def stats(self) -> dict:
+        return {
+            "path": self.path,
+            "version": self.engine.policy_snapshot().version,
+            "poll_s": self.interval_s,
+            "reloads": self.reloads,
+            "failures": self.failures,
+            "last_reload": self.last_reload,
+            "last_error": self.last_error,
+        }
+
+    def close(self):
+        self._stop.set()
+
+
+# -----------------------------
+# Metrics (in-process counters, Prometheus text / JSON)
+# -----------------------------
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+METRIC_HELP = {
+    "buddy_requests_total": ("counter", "Audited requests by action and outcome (ok/denied/consent_required/error/busy/...)."),
+    "buddy_action_phase_seconds": ("histogram", "Time per request phase: policy check, execution, audit."),
+    "buddy_actions_in_flight": ("gauge", "Actions currently executing."),
+    "buddy_http_requests_total": ("counter", "HTTP requests handled, by method."),
+    "buddy_http_requests_in_flight": ("gauge", "HTTP requests being handled."),
+    "buddy_http_bytes_received_total": ("counter", "Request bytes read (head and body)."),
+    "buddy_http_bytes_sent_total": ("counter", "Response bytes written."),
+    "buddy_subprocesses_spawned_total": ("counter", "Subprocesses started, by kind."),
+    "buddy_subprocesses_running": ("gauge", "Subprocesses the broker is waiting on."),
+    "buddy_provider_fetch_seconds": ("histogram", "Provider model-list probe latency."),
+}
+
+
+class Histogram:
+    __slots__ = ("counts", "sum", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)  # last one is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+
+class Metrics:
+    """
+    Counters, gauges and fixed-bucket histograms keyed by (name, labels),
+    where labels is a tuple of (key, value) pairs. Each update is a dict
+    lookup and an add under one lock, so instrumenting a request costs a
+    few microseconds. Exported by GET /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = collections.defaultdict(float)
+        self._gauges = collections.defaultdict(float)
+        self._hists = {}
+
+    def inc(self, name: str, labels: tuple = (), n: float = 1):
+        with self._lock:
+            self._counters[(name, labels)] += n
+
+    def gauge_add(self, name: str, labels: tuple = (), delta: float = 1):
+        with self._lock:
+            self._gauges[(name, labels)] += delta
+
+    def observe(self, name: str, labels: tuple, seconds: float):
+        i = bisect.bisect_left(LATENCY_BUCKETS, seconds)
+        with self._lock:
+            h = self._hists.get((name, labels))
+            if h is None:
+                h = self._hists[(name, labels)] = Histogram()
+            h.counts[i] += 1
+            h.sum += seconds
+            h.count += 1
+
+    def snapshot(self) -> dict:
+        """
+        {"counters": [...], "gauges": [...], "histograms": [...]}, each item
+        {"name", "labels": {...}, ...}; histogram buckets are cumulative.
+        """
+        with self._lock:
+            counters = list(self._counters.items())
+            gauges = list(self._gauges.items())
+            hists = [(k, list(h.counts), h.sum, h.count) for k, h in self._hists.items()]
+        out = {
+            "counters": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in counters],
+            "gauges": [{"name": n, "labels": dict(l), "value": v} for (n, l), v in gauges],
+            "histograms": [],
+        }
+        for (n, l), counts, total, count in hists:
+            cum = list(itertools.accumulate(counts))
+            out["histograms"].append({
+                "name": n, "labels": dict(l), "count": count, "sum": round(total, 6),
+                "buckets": {**{str(b): c for b, c in zip(LATENCY_BUCKETS, cum)}, "+Inf": cum[-1]},
+            })
+        return out
+
+    @staticmethod
+    def _num(v) -> str:
+        v = float(v)
+        return str(int(v)) if v.is_integer() else repr(v)
+
+    @staticmethod
+    def _labels(labels: dict, le: str = None) -> str:
+        items = list(labels.items()) + ([("le", le)] if le is not None else [])
+        if not items:
+            return ""
+        esc = lambda v: str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        return "{" + ",".join('%s="%s"' % (k, esc(v)) for k, v in items) + "}"
+
+    def prometheus(self, extra=()) -> str:
+        """
+        Prometheus text exposition (format 0.0.4). extra: (name, type, help,
+        labels dict, value) sampled by the caller at scrape time.
+        """
+        snap = self.snapshot()
+        lines = []
+        seen = set()
+
+        def header(name, kind=None, text=None):
+            if name in seen:
+                return
+            seen.add(name)
+            k, t = METRIC_HELP.get(name, (kind, text))
+            lines.append(f"# HELP {name} {t}")
+            lines.append(f"# TYPE {name} {k}")
+
+        for item in sorted(snap["counters"] + snap["gauges"], key=lambda x: x["name"]):
+            header(item["name"])
+            lines.append(f"{item['name']}{self._labels(item['labels'])} {self._num(item['value'])}")
+        for item in sorted(snap["histograms"], key=lambda x: x["name"]):
+            name = item["name"]
+            header(name)
+            for le, c in item["buckets"].items():
+                lines.append(f"{name}_bucket{self._labels(item['labels'], le)} {c}")
+            lines.append(f"{name}_sum{self._labels(item['labels'])} {self._num(item['sum'])}")
+            lines.append(f"{name}_count{self._labels(item['labels'])} {item['count']}")
+        for name, kind, text, labels, value in sorted(extra, key=lambda x: x[0]):  # families contiguous
+            header(name, kind, text)
+            lines.append(f"{name}{self._labels(labels)} {self._num(value)}")
+        return "\n".join(lines) + "\n"
+
+
+class _CountingIO:
+    """
+    Wraps a handler's rfile/wfile and counts the bytes moved through it (n).
+    """
+
+    __slots__ = ("_f", "n")
+
+    def __init__(self, f):
+        self._f = f
+        self.n = 0
+
+    def read(self, *args):
+        data = self._f.read(*args)
+        self.n += len(data)
+        return data
+
+    def readline(self, *args):
+        data = self._f.readline(*args)
+        self.n += len(data)
+        return data
+
+    def write(self, data):
+        self.n += len(data)
+        return self._f.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._f, name)
+
+
+def process_stats() -> dict:
+    """
+    CPU seconds, resident memory and thread count of this process.
+    """
+    ru = resource.getrusage(resource.RUSAGE_SELF)
+    rss = 0
+    try:
+        with open("/proc/self/statm", "rb") as f:
+            rss = int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        rss = ru.ru_maxrss * 1024
+    return {"cpu_seconds": ru.ru_utime + ru.ru_stime, "resident_bytes": rss, "threads": threading.active_count()}
+
+
+# -----------------------------
+# Action scheduler (per-class concurrency)
+# -----------------------------
+
+# action -> scheduling class; anything not listed is "fs". The "provider"
+# class has no action: provider probes take it directly (acquire_class).
+ACTION_CLASSES = {
+    "shell": "shell",
+    "launch_app": "gui",
+    "open_url": "gui",
+}
+DEFAULT_CLASS_LIMITS = {"shell": 4, "gui": 2, "fs": 16, "provider": 4}
+
+
+def parse_class_limits(spec: str) -> dict:
+    """
+    "shell=2,fs=8" -> DEFAULT_CLASS_LIMITS with those classes overridden.
+    """
+    limits = dict(DEFAULT_CLASS_LIMITS)
+    for item in (spec or "").split(","):
+        name, sep, n = item.partition("=")
+        if sep and name.strip() and n.strip().isdigit():
+            limits[name.strip()] = max(1, int(n))
+    return limits
+
+
+class ActionScheduler:
+    """
+    Caps how many actions of each class (shell, gui, fs, provider) run at once,
+    so a burst of one kind cannot take every thread or spawn unbounded
+    subprocesses. Over capacity, callers queue FIFO per class (a released slot
+    is handed straight to the oldest waiter) for up to `wait_s`; a full queue
+    or an expired wait is a rejection (HTTP 429). UI/health routes never pass
+    through here, so they never queue behind actions: the threaded server
+    gives every connection its own thread, and the asyncio server runs them
+    inline or on its separate UI pool (AsyncBrokerServer.PRIORITY_PREFIXES).
+    """
+
+    class _Class:
+        __slots__ = ("limit", "running", "waiters", "admitted", "rejected", "timeouts",
+                     "wait_total_s", "wait_max_s", "queue_high_water")
+
+        def __init__(self, limit: int):
+            self.limit = limit
+            self.running = 0
+            self.waiters = collections.deque()
+            self.admitted = 0
+            self.rejected = 0
+            self.timeouts = 0
+            self.wait_total_s = 0.0
+            self.wait_max_s = 0.0
+            self.queue_high_water = 0
+
+    def __init__(self, limits: dict = None, max_queue: int = 64, wait_s: float = 30.0):
+        self.max_queue = max(0, int(max_queue))
+        self.wait_s = wait_s
+        self._lock = threading.Lock()
+        self._classes = {name: self._Class(n) for name, n in (limits or DEFAULT_CLASS_LIMITS).items()}
+
+    @staticmethod
+    def class_of(action: str) -> str:
+        return ACTION_CLASSES.get(action, "fs")
+
+    def acquire(self, action: str, wait_s: float = None):
+        """
+        Takes a slot for `action`'s class. Returns the class name to pass to
+        release(), or None if rejected. wait_s: None = the scheduler default,
+        float("inf") = wait as long as it takes.
+        """
+        return self.acquire_class(self.class_of(action), wait_s)
+
+    def acquire_class(self, name: str, wait_s: float = None):
+        """acquire() for work that is not an action, by class name."""
+        wait_s = self.wait_s if wait_s is None else wait_s
+        t0 = time.monotonic()
+        with self._lock:
+            c = self._classes.setdefault(name, self._Class(DEFAULT_CLASS_LIMITS.get(name, 4)))
+            if c.running < c.limit and not c.waiters:
+                c.running += 1
+                c.admitted += 1
+                return name
+            if len(c.waiters) >= self.max_queue or wait_s <= 0:
+                c.rejected += 1
+                return None
+            ev = threading.Event()
+            c.waiters.append(ev)
+            c.queue_high_water = max(c.queue_high_water, len(c.waiters))
+        got = ev.wait(None if wait_s == float("inf") else wait_s)
+        waited = time.monotonic() - t0
+        with self._lock:
+            if not got and not ev.is_set():
+                c.waiters.remove(ev)
+                c.timeouts += 1
+                c.rejected += 1
+                return None
+            # release() handed its slot over (running already counts us)
+            c.admitted += 1
+            c.wait_total_s += waited
+            c.wait_max_s = max(c.wait_max_s, waited)
+        return name
+
+    def release(self, name: str):
+        with self._lock:
+            c = self._classes[name]
+            if c.waiters:
+                c.waiters.popleft().set()
+            else:
+                c.running -= 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "max_queue": self.max_queue,
+                "wait_s": self.wait_s,
+                "classes": {
+                    name: {
+                        "limit": c.limit,
+                        "running": c.running,
+                        "queued": len(c.waiters),
+                        "queue_high_water": c.queue_high_water,
+                        "admitted": c.admitted,
+                        "rejected": c.rejected,
+                        "timeouts": c.timeouts,
+                        "wait_avg_ms": round(c.wait_total_s * 1000 / c.admitted, 2) if c.admitted else 0.0,
+                        "wait_max_ms": round(c.wait_max_s * 1000, 2),
+                    }
+                    for name, c in self._classes.items()
+                },
+            }
+
+
 # -----------------------------
 # Actions Engine
 # -----------------------------
@@ -149,30 +2639,123 @@ class ActionsEngine:
         self.repo_root = repo_root
         self.policy_path = policy_path
         self.audit_path = audit_path
-        self.policy = self.load_policy()
+        self.metrics = Metrics()
+        self._set_policy(self.load_policy())
+        self.policy_watcher = PolicyWatcher(self, policy_path,
+                                            interval_s=float(os.environ.get("BUDDY_POLICY_POLL_S", "1")))
+        self.policy_watcher.start()
+        self.audit_store = AuditStore(
+            audit_path,
+            rotate_bytes=int(float(os.environ.get("BUDDY_AUDIT_ROTATE_MB", "16")) * 1024 * 1024),
+            rotate_s=float(os.environ.get("BUDDY_AUDIT_ROTATE_HOURS", "24")) * 3600,
+            keep_segments=int(os.environ.get("BUDDY_AUDIT_KEEP", "30")),
+            compress=os.environ.get("BUDDY_AUDIT_COMPRESS", "gzip").strip().lower(),
+        )
+        self.audit_writer = AuditWriter(
+            self.audit_store,
+            commit_interval_s=float(os.environ.get("BUDDY_AUDIT_COMMIT_MS", "200")) / 1000.0,
+            max_queue=int(os.environ.get("BUDDY_AUDIT_QUEUE", "10000")),
+        )
 
         self.enable_shell = os.environ.get("BUDDY_ENABLE_SHELL", "0").strip() in ("1", "true", "yes", "on")
+        self.shell_sandbox = ShellSandbox.from_env()
+        self.shell_sessions = None
+        if self.enable_shell and os.environ.get("BUDDY_SHELL_SESSIONS", "0").strip() in ("1", "true", "yes", "on"):
+            self.shell_sessions = ShellSessionPool(
+                self.shell_sandbox,
+                self.metrics,
+                warm=int(os.environ.get("BUDDY_SHELL_WARM", "2")),
+                max_sessions=int(os.environ.get("BUDDY_SHELL_MAX_SESSIONS", "16")),
+                idle_s=float(os.environ.get("BUDDY_SHELL_IDLE_S", "600")),
+            )
         self.ollama_tags_url = os.environ.get("BUDDY_OLLAMA_URL", "http://127.0.0.1:11434/api/tags").strip()
+        self.scheduler = ActionScheduler(
+            parse_class_limits(os.environ.get("BUDDY_SCHED_LIMITS", "")),
+            max_queue=int(os.environ.get("BUDDY_SCHED_QUEUE", "64")),
+            wait_s=float(os.environ.get("BUDDY_SCHED_WAIT_S", "30")),
+        )
+        self.jobs = JobRegistry(
+            self,
+            workers=int(os.environ.get("BUDDY_JOB_WORKERS", "4")),
+            max_queue=int(os.environ.get("BUDDY_JOB_QUEUE", "64")),
+        )
+        self.search_index = None
+        index_path = os.environ.get("BUDDY_SEARCH_INDEX_PATH",
+                                    os.path.join(os.path.dirname(abspath(audit_path)), "search_index.sqlite"))
+        if index_path.strip().lower() not in ("", "off", "0"):
+            self.search_index = FileIndex(index_path, self.policy,
+                                          refresh_s=float(os.environ.get("BUDDY_SEARCH_REFRESH_S", "300")))
+            self.search_index.start()
+        self._search_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=int(os.environ.get("BUDDY_SEARCH_WORKERS", "4")), thread_name_prefix="buddy-grep")
+        self.list_limit = int(os.environ.get("BUDDY_LIST_LIMIT", "10000"))
+        self.list_max_scanned = int(os.environ.get("BUDDY_LIST_MAX_SCANNED", "1000000"))
+        self.read_max_bytes = int(os.environ.get("BUDDY_READ_MAX_KB", "1024")) * 1024
+        self.upload_max_bytes = int(os.environ.get("BUDDY_UPLOAD_MAX_MB", "0") or "0") * 1024 * 1024
+        self._umask = process_umask()
+        self.batch_max_steps = int(os.environ.get("BUDDY_BATCH_MAX_STEPS", "500"))
+        self._batch_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=int(os.environ.get("BUDDY_BATCH_WORKERS", "8")), thread_name_prefix="buddy-batch")
+        self.provider_timeout_s = float(os.environ.get("BUDDY_PROVIDER_TIMEOUT_S", "3"))
+        self.providers_deadline_s = float(os.environ.get("BUDDY_PROVIDERS_DEADLINE_S", "4"))
+        self._provider_pool = concurrent.futures.ThreadPoolExecutor(
+            max_workers=8, thread_name_prefix="buddy-provider")
+        self.ollama_tags_cache = CachedFetch(
+            self._fetch_ollama_tags_live,
+            ttl_s=float(os.environ.get("BUDDY_PROVIDER_TTL_S", "10")),
+            stale_s=float(os.environ.get("BUDDY_PROVIDER_STALE_S", "300")),
+            neg_ttl_s=float(os.environ.get("BUDDY_PROVIDER_NEG_TTL_S", "5")),
+        )
 
     # ---- Policy ----
 
     def load_policy(self):
         if os.path.exists(self.policy_path):
             try:
-                return read_json(self.policy_path)
+                pol = read_json(self.policy_path)
+                if not validate_policy(pol):
+                    return pol
             except Exception:
-                return default_policy(self.repo_root)
+                pass
         return default_policy(self.repo_root)
 
+    def _set_policy(self, pol: dict):
+        """
+        Compiles `pol` into the next PolicySnapshot and publishes it with a
+        single reference swap. Callers serialize on policy_watcher.lock.
+        """
+        prev = getattr(self, "_snapshot", None)
+        snap = PolicySnapshot(pol, prev.version + 1 if prev is not None else 1)
+        self._snapshot = snap
+        if getattr(self, "search_index", None) is not None:
+            self.search_index.set_policy(snap.policy)
+        return snap
+
+    @property
+    def policy(self) -> dict:
+        return self._snapshot.policy
+
+    def policy_snapshot(self) -> PolicySnapshot:
+        """
+        The current snapshot. Take it once per request and pass it along.
+        """
+        return self._snapshot
+
     def save_policy(self):
-        write_json(self.policy_path, self.policy)
+        with self.policy_watcher.lock:
+            write_json(self.policy_path, self._snapshot.policy)
+            self.policy_watcher.mark_current()
 
     def reload_policy(self):
-        self.policy = self.load_policy()
-        return self.policy
+        """
+        Explicit reload (GET /policy/reload). Returns (error, policy); on error
+        the last good policy is kept.
+        """
+        _, err = self.policy_watcher.check(force=True)
+        return err, self._snapshot.policy
 
     def get_policy(self):
-        return self.policy
+        return self._snapshot.policy
 
     def update_policy(self, patch: dict):
         """
@@ -191,7 +2774,11 @@ class ActionsEngine:
             "re_auth_required",
         }
 
-        new_pol = dict(self.policy)
+        with self.policy_watcher.lock:
+            return self._update_policy_locked(patch, allowed_keys)
+
+    def _update_policy_locked(self, patch: dict, allowed_keys: set):
+        new_pol = dict(self._snapshot.policy)  # the snapshot deep-copies; this dict is ours
         for k, v in patch.items():
             if k not in allowed_keys:
                 continue
@@ -223,96 +2810,596 @@ class ActionsEngine:
                 c[ak] = v
             new_pol["consent"] = c
 
-        self.policy = new_pol
-        self.save_policy()
-        return True, "", self.policy
+        err = validate_policy(new_pol)
+        if err:
+            return False, err, None
+
+        snap = self._set_policy(new_pol)
+        write_json(self.policy_path, snap.policy)
+        self.policy_watcher.mark_current()
+        return True, "", snap.policy
 
     # ---- Audit ----
 
-    def audit(self, entry: dict):
-        os.makedirs(os.path.dirname(self.audit_path), exist_ok=True)
-        safe = redact_secrets(entry)
+    def audit(self, entry: dict, snap: PolicySnapshot = None):
+        """
+        Redact on the request thread, write on the audit writer thread.
+        `snap` is the policy the request was evaluated against (recorded as
+        policy_version; defaults to the current one).
+        """
+        t0 = time.perf_counter()
+        safe = mask_audit_sessions(redact_secrets(entry))
         safe["timestamp"] = now_utc()
-        with open(self.audit_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(safe, ensure_ascii=False) + "\n")
+        safe["policy_version"] = (snap or self._snapshot).version
+        self.audit_writer.submit(safe)
+        action = self._action_label(entry.get("action", ""))
+        self.metrics.inc("buddy_requests_total", (("action", action), ("result", str(entry.get("result", "")))))
+        self.metrics.observe("buddy_action_phase_seconds", (("action", action), ("phase", "audit")),
+                             time.perf_counter() - t0)
 
-    # ---- Policy checks ----
+    def audit_stats(self):
+        st = self.audit_writer.stats()
+        st["store"] = self.audit_store.stats()
+        return st
 
-    def check_path(self, target_path: str):
-        p = abspath(target_path)
-        allow_mode = str(self.policy.get("allow_mode", "allowlist")).lower()
-        allowlist = [abspath(x) for x in self.policy.get("allowlist", []) if isinstance(x, str)]
-        blacklist = [abspath(x) for x in self.policy.get("blacklist", []) if isinstance(x, str)]
+    def audit_query(self, action=None, result=None, action_id=None, since=None, until=None,
+                    cursor=None, newest_first=False, limit=1000, page_size=500):
+        """
+        Generator over matching audit entries, paged from the index so memory
+        stays at one page no matter how many entries match.
 
-        # Blacklist wins
-        for b in blacklist:
-            if path_is_under(p, b):
-                return False, f"Path is blacklisted: {b}"
+        Yields ("entry", dict) items, each entry carrying its "seq", then one
+        final ("next_cursor", str|None); None means there is nothing more.
+        """
+        since, until = iso_utc(since), iso_utc(until)
+        cur = int(cursor) if cursor not in (None, "") else None
+        left = max(0, int(limit))
+        while left > 0:
+            page = self.audit_store.query(
+                action=action, result=result, action_id=action_id, since=since, until=until,
+                after_seq=None if newest_first else cur,
+                before_seq=cur if newest_first else None,
+                newest_first=newest_first, limit=min(page_size, left),
+            )
+            for seq, entry in page:
+                entry["seq"] = seq
+                yield "entry", entry
+                cur = seq
+            left -= len(page)
+            if len(page) < page_size:
+                break
+        more = cur is not None and bool(self.audit_store.query(
+            action=action, result=result, action_id=action_id, since=since, until=until,
+            after_seq=None if newest_first else cur,
+            before_seq=cur if newest_first else None,
+            newest_first=newest_first, limit=1,
+        ))
+        yield "next_cursor", str(cur) if more else None
 
-        # Allowlist mode
-        if allow_mode == "allowlist":
-            for a in allowlist:
-                if path_is_under(p, a):
-                    return True, ""
-            return False, "Path not in allowlist"
+    def audit_last(self, n: int = 50):
+        """
+        Last n audit entries (already redacted), oldest first. For diagnostics export.
+        """
+        return self.audit_store.last(n)
 
-        # Blacklist mode/open mode: already handled blacklist; allow otherwise
-        return True, ""
+    # ---- Metrics ----
 
-    def consent_rule(self, action: str) -> str:
-        return str(self.policy.get("consent", {}).get(action, "ask")).lower()
+    def _sampled_metrics(self):
+        """
+        Gauges read from their owners at scrape time: (name, type, help, labels, value).
+        """
+        proc = process_stats()
+        out = [
+            ("process_cpu_seconds_total", "counter", "User + system CPU time.", {}, proc["cpu_seconds"]),
+            ("process_resident_memory_bytes", "gauge", "Resident memory.", {}, proc["resident_bytes"]),
+            ("buddy_threads", "gauge", "Live Python threads.", {}, proc["threads"]),
+            ("buddy_audit_queue_depth", "gauge", "Audit entries waiting for the writer.", {},
+             self.audit_writer.stats()["queue_depth"]),
+        ]
+        for name, c in self.scheduler.stats()["classes"].items():
+            lab = {"class": name}
+            out += [
+                ("buddy_scheduler_running", "gauge", "Actions holding a scheduler slot.", lab, c["running"]),
+                ("buddy_scheduler_queued", "gauge", "Actions waiting for a scheduler slot.", lab, c["queued"]),
+                ("buddy_scheduler_rejected_total", "counter", "Actions refused with 429 (queue full or wait expired).",
+                 lab, c["rejected"]),
+            ]
+        if self.shell_sessions is not None:
+            st = self.shell_sessions.stats()
+            out += [
+                ("buddy_shell_sessions", "gauge", "Open persistent shell sessions.", {}, st["sessions"]),
+                ("buddy_shell_spare_workers", "gauge", "Pre-spawned shell workers.", {}, st["spare"]),
+                ("buddy_shell_workers_spawned_total", "counter", "Shell workers started.", {}, st["spawned"]),
+            ]
+        return out
 
-    def require_reauth(self, action: str) -> bool:
-        return bool(self.policy.get("re_auth_required", {}).get(action, False))
+    def metrics_text(self) -> str:
+        return self.metrics.prometheus(self._sampled_metrics())
+
+    def metrics_json(self) -> dict:
+        snap = self.metrics.snapshot()
+        snap["sampled"] = [{"name": n, "labels": lab, "value": v} for n, _, _, lab, v in self._sampled_metrics()]
+        return snap
+
+    def close(self):
+        self.policy_watcher.close()
+        self.jobs.close()
+        if self.shell_sessions is not None:
+            self.shell_sessions.close()
+        if self.search_index is not None:
+            self.search_index.close()
+        self._search_pool.shutdown(wait=False, cancel_futures=True)
+        self._batch_pool.shutdown(wait=False)
+        self._provider_pool.shutdown(wait=False)
+        self.audit_writer.close()
+
+    # ---- Policy checks ----
+
+    def check_path(self, target_path: str, snap: PolicySnapshot = None):
+        return (snap or self._snapshot).check_path(target_path)
+
+    def consent_rule(self, action: str, snap: PolicySnapshot = None) -> str:
+        return (snap or self._snapshot).consent_rule(action)
+
+    def require_reauth(self, action: str, snap: PolicySnapshot = None) -> bool:
+        return (snap or self._snapshot).require_reauth(action)
 
     # ---- Action implementations ----
 
-    def exec_mkdir(self, params: dict):
+    def exec_mkdir(self, params: dict, snap: PolicySnapshot):
         path = params.get("path", "")
         if not path:
             return False, "missing path", None
-        ok, msg = self.check_path(path)
+        ok, msg = snap.check_path(path)
         if not ok:
             return False, msg, None
         p = abspath(path)
         os.makedirs(p, exist_ok=True)
         return True, "", {"path": p}
 
-    def exec_write_file(self, params: dict):
-        path = params.get("path", "")
-        content = params.get("content", "")
-        if not path:
-            return False, "missing path", None
-        ok, msg = self.check_path(path)
+    def exec_write_file(self, params: dict, snap: PolicySnapshot):
+        path = params.get("path", "")
+        content = params.get("content", "")
+        if not path:
+            return False, "missing path", None
+        ok, msg = snap.check_path(path)
+        if not ok:
+            return False, msg, None
+        p = abspath(path)
+        os.makedirs(os.path.dirname(p), exist_ok=True)
+        data = str(content).encode("utf-8")
+        with open(p, "wb") as f:
+            f.write(data)
+        return True, "", {"path": p, "bytes": len(data)}
+
+    def read_stream(self, params: dict, consent: bool, reason: str, range_header: str = ""):
+        """
+        GET /files: consent + path checks, then (http_code, response_or_plan).
+        On success the plan's byte window is streamed by the handler.
+        """
+        action_id = str(uuid.uuid4())
+        snap = self.policy_snapshot()
+        refused = self._consent_gate("read_file", action_id, consent, reason, snap)
+        if refused is not None:
+            return 200, refused
+        ok, err, plan = self.plan_read(params, snap, range_header)
+        audit_params = {k: v for k, v in params.items() if k != "consent"}
+        if not ok:
+            self.audit({"action_id": action_id, "action": "read_file", "reason": reason, "result": "error",
+                        "error": err, "params": audit_params}, snap)
+            code = {"unsatisfiable range": 416, "not a file": 404, "missing path": 400}.get(err, 403)
+            if err.startswith("offset/"):
+                code = 400
+            resp = {"ok": False, "action_id": action_id, "error": err}
+            if plan:
+                resp["size"] = plan["size"]
+            return code, resp
+        self.audit({"action_id": action_id, "action": "read_file", "reason": reason, "result": "ok",
+                    "params": dict(audit_params, start=plan["start"], end=plan["end"], stream=True)}, snap)
+        return 200, dict(plan, ok=True, action_id=action_id)
+
+    def upload_file(self, path: str, rfile, length: int, consent: bool, reason: str,
+                    expect_sha256: str = "", chunk_bytes: int = 1024 * 1024):
+        """
+        Streaming write_file (PUT /files): same consent rule and check_path, but
+        the body goes straight from the socket to a temp file next to the
+        target in fixed-size chunks, hashed on the fly, then os.replace()d into
+        place. Memory use is one chunk regardless of file size.
+        Returns (http_code, response).
+        """
+        action_id = str(uuid.uuid4())
+        snap = self.policy_snapshot()
+        refused = self._consent_gate("write_file", action_id, consent, reason, snap)
+        if refused is not None:
+            return 200, refused
+
+        def fail(code, err):
+            self.audit({"action_id": action_id, "action": "write_file", "reason": reason, "result": "error",
+                        "error": err, "params": {"path": path, "bytes": length, "upload": True}}, snap)
+            return code, {"ok": False, "action_id": action_id, "error": err}
+
+        if not path:
+            return fail(400, "missing path")
+        ok, msg = snap.check_path(path)
+        if not ok:
+            return fail(403, msg)
+        if self.upload_max_bytes and length > self.upload_max_bytes:
+            return fail(413, "payload too large")
+
+        p = abspath(path)
+        d = os.path.dirname(p)
+        try:
+            os.makedirs(d, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=d, prefix="." + os.path.basename(p) + ".", suffix=".part")
+        except OSError as e:
+            return fail(500, str(e))
+
+        h = hashlib.sha256()
+        written = 0
+        try:
+            try:
+                while written < length:
+                    chunk = rfile.read(min(chunk_bytes, length - written))
+                    if not chunk:
+                        break
+                    h.update(chunk)
+                    view = memoryview(chunk)
+                    while view:
+                        view = view[os.write(fd, view):]
+                    written += len(chunk)
+                if written == length:
+                    os.fsync(fd)
+            finally:
+                os.close(fd)
+            if written != length:
+                os.unlink(tmp)
+                return fail(400, f"incomplete body ({written} of {length} bytes)")
+            digest = h.hexdigest()
+            if expect_sha256 and expect_sha256.lower() != digest:
+                os.unlink(tmp)
+                return fail(422, "sha256 mismatch")
+            try:
+                os.chmod(tmp, os.stat(p).st_mode & 0o7777)
+            except FileNotFoundError:
+                os.chmod(tmp, 0o666 & ~self._umask)
+            os.replace(tmp, p)
+        except OSError as e:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            return fail(500, str(e))
+
+        result = {"path": p, "bytes": written, "sha256": digest}
+        self.audit({"action_id": action_id, "action": "write_file", "reason": reason, "result": "ok",
+                    "params": dict(result, upload=True)}, snap)
+        return 200, {"ok": True, "action_id": action_id, "result": result}
+
+    def plan_read(self, params: dict, snap: PolicySnapshot, range_header: str = ""):
+        """
+        Resolves a read request to a byte window without reading the data.
+        params: path, plus at most one of
+          offset/length          byte window
+          start_line/lines       1-based line window (next_line pages on)
+          head=N / tail=N        first / last N lines
+        or an HTTP Range header (GET /files). Returns (ok, err, plan); plan has
+        path, size, start, end and, for line modes, next_line.
+        """
+        path = params.get("path", "")
+        if not path:
+            return False, "missing path", None
+        ok, msg = snap.check_path(path)
+        if not ok:
+            return False, msg, None
+        p = abspath(path)
+        if not os.path.isfile(p):
+            return False, "not a file", None
+
+        try:
+            ints = {k: int(params[k]) for k in ("offset", "length", "start_line", "lines", "head", "tail")
+                    if params.get(k) not in (None, "")}
+        except (TypeError, ValueError):
+            return False, "offset/length/start_line/lines/head/tail must be integers", None
+        if any(v < 0 for v in ints.values()):
+            return False, "offset/length/start_line/lines/head/tail must be >= 0", None
+
+        line_mode = any(k in ints for k in ("tail", "head", "start_line", "lines"))
+        # open up front in every mode, so a file the OS will not let us read
+        # fails here as an error response rather than mid-stream
+        try:
+            with open(p, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                plan = {"path": p, "size": size, "start": 0, "end": size}
+                if "tail" in ints:
+                    plan["start"] = tail_offset(f, size, ints["tail"])
+                elif line_mode:
+                    first = max(1, ints.get("start_line", 1))
+                    n = ints.get("head", ints.get("lines"))
+                    plan["start"] = line_offset(f, size, 0, first - 1)
+                    if n is not None:
+                        plan["end"] = line_offset(f, size, plan["start"], n)
+                    if plan["end"] < size:
+                        plan["next_line"] = first + n
+        except (FileNotFoundError, IsADirectoryError):
+            return False, "not a file", None
+        except OSError as e:
+            return False, str(e), None
+
+        if line_mode:
+            return True, "", plan
+        if "offset" in ints or "length" in ints:
+            plan["start"] = min(size, ints.get("offset", 0))
+            if "length" in ints:
+                plan["end"] = min(size, plan["start"] + ints["length"])
+        elif range_header:
+            try:
+                rng = parse_byte_range(range_header, size)
+            except ValueError:
+                return False, "unsatisfiable range", plan
+            if rng:
+                plan["start"], plan["end"] = rng
+                plan["ranged"] = True
+        return True, "", plan
+
+    def exec_read_file(self, params: dict, snap: PolicySnapshot):
+        ok, err, plan = self.plan_read(params, snap)
+        if not ok:
+            return False, err, None
+        end = min(plan["end"], plan["start"] + self.read_max_bytes)
+        try:
+            data = b"".join(iter_file_range(plan["path"], plan["start"], end))
+        except OSError as e:
+            return False, str(e), None
+        result = dict(plan, end=plan["start"] + len(data), truncated=end < plan["end"])
+        if str(params.get("encoding", "utf-8")).lower() == "base64":
+            result.update(encoding="base64", content=base64.b64encode(data).decode("ascii"))
+        else:
+            result.update(encoding="utf-8", content=data.decode("utf-8", errors="replace"))
+        result["eof"] = result["end"] >= plan["size"]
+        return True, "", result
+
+    def _list_dir_plan(self, params: dict, snap: PolicySnapshot, stream: bool = False):
+        """
+        Validates list_dir params. Returns (ok, err, plan) where plan has the
+        entry iterator and the limits the consumer applies:
+          fields     subset of type,size,mtime,mode (list or comma string)
+          glob       pattern or list; matched against the name, or the relative
+                     path if the pattern has a "/"
+          recursive  walk subdirectories (max_depth, default 20)
+          limit      entries per page (at most BUDDY_LIST_LIMIT; 0 = no limit when streaming)
+          max_scanned  entries visited before stopping with a cursor
+          cursor     next_cursor from a previous page
+        A non-streaming call with neither limit nor cursor is the legacy full
+        listing: every entry of the directory, as before pagination existed
+        (recursive walks still stop at max_scanned).
+          sort       name order (default true); false streams raw scandir order, no cursor
+        """
+        path = params.get("path", "")
+        if not path:
+            return False, "missing path", None
+        ok, msg = snap.check_path(path)
+        if not ok:
+            return False, msg, None
+        p = abspath(path)
+        if not os.path.isdir(p):
+            return False, "not a directory", None
+
+        fields = params.get("fields") or []
+        if isinstance(fields, str):
+            fields = [x.strip() for x in fields.split(",") if x.strip()]
+        fields = set(fields)
+        if not fields <= set(LIST_FIELDS):
+            return False, f"fields must be among {', '.join(LIST_FIELDS)}", None
+        globs = params.get("glob") or []
+        if isinstance(globs, str):
+            globs = [globs]
+        paged = stream or "limit" in params or "cursor" in params
+        try:
+            recursive = bool(params.get("recursive", False))
+            max_depth = int(params.get("max_depth", 20)) if recursive else 0
+            limit = int(params.get("limit", 0 if stream else self.list_limit))
+            max_scanned = int(params.get("max_scanned", self.list_max_scanned if paged or recursive else 0))
+        except (TypeError, ValueError):
+            return False, "max_depth/limit/max_scanned must be integers", None
+        if not paged:
+            limit = 0
+        elif not stream:
+            limit = min(limit, self.list_limit) if limit > 0 else self.list_limit
+        sort = bool(params.get("sort", True))
+
+        index = snap.path_index
+        entries = iter_dir(p, cursor=str(params.get("cursor") or ""), max_depth=max_depth, sort=sort,
+                           skip=lambda x: not index.check(x)[0])
+        return True, "", {"path": p, "entries": entries, "fields": fields, "globs": globs,
+                          "limit": limit, "max_scanned": max_scanned, "sort": sort}
+
+    @staticmethod
+    def _list_dir_walk(plan):
+        """
+        Applies glob/limit/budget to the walk. Yields entry dicts, then
+        returns (scanned, next_cursor) via StopIteration.value.
+        """
+        globs, fields = plan["globs"], plan["fields"]
+        scanned = 0
+        emitted = 0
+        last = None
+        for rel, entry in plan["entries"]:
+            if plan["max_scanned"] and scanned >= plan["max_scanned"]:
+                break
+            scanned += 1
+            last = rel
+            if globs and not any(fnmatch.fnmatchcase(rel if "/" in g else entry.name, g) for g in globs):
+                continue
+            yield dir_entry_info(rel, entry, fields)
+            emitted += 1
+            if plan["limit"] and emitted >= plan["limit"]:
+                break
+        else:
+            return scanned, None
+        plan["entries"].close()
+        return scanned, (last if plan["sort"] else None)
+
+    def exec_search_files(self, params: dict, snap: PolicySnapshot):
+        """
+        Name/path search over the allowlist index, optionally grepping contents.
+          query | glob | regex   match entry names (or full paths with match="path";
+                                 a glob containing "/" matches paths); omit for all files
+          case_sensitive, type ("file"|"dir"), under (path prefix), limit
+          content                text to grep in matching files (content_regex: true for a regex);
+                                 max_matches, max_files, max_file_bytes bound the work
+          refresh                true: run an index refresh before searching
+        """
+        if self.search_index is None:
+            return False, "search index disabled", None
+        if params.get("refresh"):
+            self.search_index.refresh()
+        case_sensitive = bool(params.get("case_sensitive"))
+        flags = 0 if case_sensitive else re.IGNORECASE
+        field = "path" if params.get("match") == "path" else "name"
+        query = {"case_sensitive": case_sensitive}
+        try:
+            if params.get("regex"):
+                query["rx"] = re.compile(str(params["regex"]), flags | re.MULTILINE)
+            elif params.get("glob"):
+                g = str(params["glob"])
+                if "/" in g:
+                    field = "path"
+                query["verify"] = re.compile(fnmatch.translate(g), flags).match
+                query["literal"] = glob_literal(g)
+                if not query["literal"]:
+                    query["rx"] = re.compile("^", re.MULTILINE)
+            elif params.get("query"):
+                query["literal"] = str(params["query"])
+            elif params.get("content"):
+                query["rx"] = re.compile("^", re.MULTILINE)
+            else:
+                return False, "need query, glob, regex or content", None
+            content = params.get("content")
+            crx = None
+            if content:
+                crx = re.compile(str(content) if params.get("content_regex") else re.escape(str(content)),
+                                 0 if params.get("case_sensitive") else re.IGNORECASE)
+            limit = max(1, min(int(params.get("limit", 100)), 10000))
+            max_matches = max(1, int(params.get("max_matches", 200)))
+            max_files = max(1, int(params.get("max_files", 10000)))
+            max_file_bytes = int(params.get("max_file_bytes", 4 * 1024 * 1024))
+        except re.error as e:
+            return False, f"bad pattern: {e}", None
+        except (TypeError, ValueError):
+            return False, "limit/max_matches/max_files/max_file_bytes must be integers", None
+        want_type = params.get("type")
+        under = params.get("under")
+        if under:
+            ok, msg = snap.check_path(under)
+            if not ok:
+                return False, msg, None
+            under = abspath(under)
+
+        view = self.search_index.view()
+        allowed = self.search_index.allowed
+        t0 = time.monotonic()
+        hits = []
+        cap = max_files if crx else limit
+        truncated = False
+        for i in view.find(field, **query):
+            if want_type and (view.is_dir[i] != (want_type == "dir")):
+                continue
+            if crx and view.is_dir[i]:
+                continue
+            path = view.path(i)
+            if under and not path_is_under(path, under):
+                continue
+            if not (allowed(path) and snap.path_index.check(path)[0]):
+                continue
+            if len(hits) >= cap:
+                truncated = True
+                break
+            hits.append(path if crx else {"path": path, "type": "dir" if view.is_dir[i] else "file"})
+
+        result = {"index": {"entries": len(view.names), "generation": view.generation,
+                            "last_refresh": self.search_index.last_refresh}}
+        if not crx:
+            result.update(results=hits, truncated=truncated, elapsed_ms=round((time.monotonic() - t0) * 1000, 2))
+            return True, "", result
+
+        stop = threading.Event()
+        per_file = {}
+        total = 0
+        futures = {self._search_pool.submit(grep_file, f, crx, max_file_bytes, max_matches, stop): f for f in hits}
+        try:
+            for fut in concurrent.futures.as_completed(futures):
+                found = fut.result()
+                if found:
+                    per_file[futures[fut]] = found
+                    total += len(found)
+                    if total >= max_matches:
+                        stop.set()
+                        truncated = True
+                        break
+        finally:
+            for fut in futures:
+                fut.cancel()
+        matches = []
+        for f in hits:  # index order, not completion order
+            for no, line in per_file.get(f, ()):
+                if len(matches) < max_matches:
+                    matches.append({"path": f, "line": no, "text": line})
+        result.update(matches=matches, files_searched=len(hits), truncated=truncated,
+                      elapsed_ms=round((time.monotonic() - t0) * 1000, 2))
+        return True, "", result
+
+    def exec_list_dir(self, params: dict, snap: PolicySnapshot):
+        ok, err, plan = self._list_dir_plan(params, snap)
         if not ok:
-            return False, msg, None
-        p = abspath(path)
-        os.makedirs(os.path.dirname(p), exist_ok=True)
-        with open(p, "w", encoding="utf-8") as f:
-            f.write(str(content))
-        return True, "", {"path": p, "bytes": len(str(content).encode("utf-8"))}
+            return False, err, None
+        walk = self._list_dir_walk(plan)
+        out = []
+        try:
+            while True:
+                out.append(next(walk))
+        except StopIteration as stop:
+            scanned, next_cursor = stop.value
+        except OSError as e:
+            return False, str(e), None
+        result = {"path": plan["path"], "items": [x["name"] for x in out], "next_cursor": next_cursor,
+                  "scanned": scanned}
+        if plan["fields"]:
+            result["entries"] = out
+        return True, "", result
 
-    def exec_list_dir(self, params: dict):
-        path = params.get("path", "")
-        if not path:
-            return False, "missing path", None
-        ok, msg = self.check_path(path)
+    def exec_list_dir_stream(self, params: dict, snap: PolicySnapshot):
+        """
+        Streaming list_dir: one {"event": "entry", "name", ...fields} per entry,
+        then {"event": "done", "count", "scanned", "next_cursor"}.
+        """
+        ok, err, plan = self._list_dir_plan(params, snap, stream=True)
         if not ok:
-            return False, msg, None
-        p = abspath(path)
-        if not os.path.isdir(p):
-            return False, "not a directory", None
-        items = sorted(os.listdir(p))
-        return True, "", {"path": p, "items": items}
+            yield {"event": "error", "error": err}
+            return
+        walk = self._list_dir_walk(plan)
+        count = 0
+        try:
+            while True:
+                ev = next(walk)
+                ev["event"] = "entry"
+                count += 1
+                yield ev
+        except StopIteration as stop:
+            scanned, next_cursor = stop.value
+        except OSError as e:
+            yield {"event": "error", "error": str(e)}
+            return
+        yield {"event": "done", "path": plan["path"], "count": count, "scanned": scanned, "next_cursor": next_cursor}
 
-    def exec_open_url(self, params: dict):
+    def exec_open_url(self, params: dict, snap: PolicySnapshot):
         url = params.get("url", "")
         if not url:
             return False, "missing url", None
         subprocess.Popen(["xdg-open", url], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.metrics.inc("buddy_subprocesses_spawned_total", (("kind", "open_url"),))
         return True, "", {"url": url}
 
-    def exec_launch_app(self, params: dict):
+    def exec_launch_app(self, params: dict, snap: PolicySnapshot):
         """
         Backward compatible:
         - accepts cmd as list (existing behavior)
@@ -321,18 +3408,26 @@ class ActionsEngine:
         cmd = params.get("cmd", [])
         if isinstance(cmd, str) and cmd.strip():
             subprocess.Popen(["bash", "-lc", cmd], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            self.metrics.inc("buddy_subprocesses_spawned_total", (("kind", "launch_app"),))
             return True, "", {"cmd": ["bash", "-lc", cmd]}
 
         if not isinstance(cmd, list) or not cmd or not all(isinstance(x, str) for x in cmd):
             return False, "missing cmd list (or cmd string)", None
 
         subprocess.Popen(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        self.metrics.inc("buddy_subprocesses_spawned_total", (("kind", "launch_app"),))
         return True, "", {"cmd": cmd}
 
-    def exec_shell(self, params: dict):
+    def exec_shell(self, params: dict, snap: PolicySnapshot):
         """
         Shell is disabled by default unless BUDDY_ENABLE_SHELL=1.
         Even if enabled, policy consent still applies (and you can keep it denied by policy).
+        With params "session" (and BUDDY_SHELL_SESSIONS=1) the command runs in
+        that session's persistent shell, confined by self.shell_sandbox
+        (scrubbed env, fixed cwd, rlimits): no login-shell startup per call,
+        and cwd/env carry over to the session's next command. Session ids are
+        issued by the broker: "new" starts a session and the result carries
+        its id; any other value must be an id handed out earlier.
         """
         cmd = params.get("cmd", "")
         timeout_s = params.get("timeout_s", 90)
@@ -347,6 +3442,18 @@ class ActionsEngine:
         except Exception:
             timeout_s = 90.0
 
+        session = params.get("session")
+        if session:
+            if self.shell_sessions is None:
+                return False, "shell sessions disabled (set BUDDY_SHELL_SESSIONS=1 to enable)", None
+            if session == "new":
+                session = self.shell_sessions.create()
+                if session is None:
+                    return False, "too many shell sessions", None
+            return self.shell_sessions.run(str(session), str(cmd), timeout_s)
+
+        self.metrics.inc("buddy_subprocesses_spawned_total", (("kind", "shell"),))
+        self.metrics.gauge_add("buddy_subprocesses_running", (), 1)
         try:
             p = subprocess.run(
                 ["bash", "-lc", str(cmd)],
@@ -366,14 +3473,129 @@ class ActionsEngine:
             }
         except subprocess.TimeoutExpired:
             return False, "command timed out", None
+        finally:
+            self.metrics.gauge_add("buddy_subprocesses_running", (), -1)
+
+    def exec_shell_stream(self, params: dict, snap: PolicySnapshot, heartbeat_s: float = 5.0, chunk_bytes: int = 16384):
+        """
+        Streaming variant of exec_shell. Yields event dicts as output arrives:
+            {"event": "start", "pid"}
+            {"event": "stdout"|"stderr", "data"}
+            {"event": "heartbeat"}           (after heartbeat_s of silence)
+            {"event": "exit", "returncode", "stdout_bytes", "stderr_bytes", "timed_out"}
+            {"event": "error", "error"}
+        Output is read in chunk_bytes pieces and handed straight to the consumer,
+        so memory does not grow with output size; a slow client stalls the pipe
+        and therefore the process. Closing the generator (client went away)
+        kills the whole process group.
+        """
+        cmd = params.get("cmd", "")
+        timeout_s = params.get("timeout_s", 90)
+        if not cmd:
+            yield {"event": "error", "error": "missing cmd"}
+            return
+        if not self.enable_shell:
+            yield {"event": "error", "error": "shell disabled (set BUDDY_ENABLE_SHELL=1 to enable)"}
+            return
+        try:
+            timeout_s = float(timeout_s)
+        except Exception:
+            timeout_s = 90.0
+
+        proc = subprocess.Popen(
+            ["bash", "-lc", str(cmd)],
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            start_new_session=True,  # own process group, so cancel kills children too
+        )
+        self.metrics.inc("buddy_subprocesses_spawned_total", (("kind", "shell_stream"),))
+        self.metrics.gauge_add("buddy_subprocesses_running", (), 1)
+        sel = selectors.DefaultSelector()
+        streams = {proc.stdout.fileno(): "stdout", proc.stderr.fileno(): "stderr"}
+        decoders = {name: codecs.getincrementaldecoder("utf-8")(errors="replace") for name in streams.values()}
+        counts = {"stdout": 0, "stderr": 0}
+        for fd in streams:
+            os.set_blocking(fd, False)
+            sel.register(fd, selectors.EVENT_READ)
+        deadline = time.monotonic() + timeout_s
+        timed_out = False
+        try:
+            yield {"event": "start", "pid": proc.pid}
+            quiet_since = time.monotonic()
+            while streams:
+                left = deadline - time.monotonic()
+                if left <= 0:
+                    timed_out = True
+                    break
+                ready = sel.select(timeout=min(left, heartbeat_s))
+                if not ready:
+                    if time.monotonic() - quiet_since >= heartbeat_s:
+                        quiet_since = time.monotonic()
+                        yield {"event": "heartbeat"}
+                    continue
+                for key, _ in ready:
+                    name = streams[key.fd]
+                    try:
+                        data = os.read(key.fd, chunk_bytes)
+                    except BlockingIOError:
+                        continue
+                    if not data:
+                        sel.unregister(key.fd)
+                        del streams[key.fd]
+                        tail = decoders[name].decode(b"", final=True)
+                        if tail:
+                            yield {"event": name, "data": tail}
+                        continue
+                    counts[name] += len(data)
+                    text = decoders[name].decode(data)
+                    if text:
+                        quiet_since = time.monotonic()
+                        yield {"event": name, "data": text}
+            if timed_out:
+                self._kill_group(proc)
+            try:
+                rc = proc.wait(timeout=max(0.1, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                timed_out = True
+                self._kill_group(proc)
+                rc = proc.wait()
+            yield {
+                "event": "exit",
+                "returncode": rc,
+                "stdout_bytes": counts["stdout"],
+                "stderr_bytes": counts["stderr"],
+                "timed_out": timed_out,
+            }
+        finally:
+            if proc.poll() is None:
+                self._kill_group(proc)
+                proc.wait()
+            self.metrics.gauge_add("buddy_subprocesses_running", (), -1)
+            sel.close()
+            proc.stdout.close()
+            proc.stderr.close()
+
+    @staticmethod
+    def _kill_group(proc):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError):
+            pass
 
     # ---- Provider: Ollama Local ----
 
-    def _fetch_ollama_tags(self):
+    def _fetch_ollama_tags_live(self):
         req = Request(self.ollama_tags_url, headers={"Accept": "application/json"})
-        with urlopen(req, timeout=3) as r:
+        with urlopen(req, timeout=self._provider_timeout("ollama-local")) as r:
             return json.loads(r.read().decode("utf-8", errors="replace"))
 
+    def _fetch_ollama_tags(self):
+        """
+        Cached /api/tags (see CachedFetch); callers must not mutate the result.
+        """
+        return self.ollama_tags_cache.get()
+
     def list_ollama_local_models(self):
         """
         Backward compatible return shape:
@@ -388,7 +3610,7 @@ class ActionsEngine:
                     models.append(name.strip())
             models = sorted(set(models))
             return True, models, ""
-        except (URLError, HTTPError, ValueError, json.JSONDecodeError) as e:
+        except (URLError, HTTPError, OSError, ValueError, json.JSONDecodeError) as e:
             return False, [], str(e)
 
     def list_ollama_local_models_info(self):
@@ -412,74 +3634,345 @@ class ActionsEngine:
             # stable sort by name
             out.sort(key=lambda x: x.get("name", ""))
             return True, out, ""
-        except (URLError, HTTPError, ValueError, json.JSONDecodeError) as e:
+        except (URLError, HTTPError, OSError, ValueError, json.JSONDecodeError) as e:
             return False, [], str(e)
 
     # ---- Execute router ----
 
-    def execute(self, action: str, params: dict, consent: bool, reason: str):
-        action_id = str(uuid.uuid4())
-        rule = self.consent_rule(action)
+    def _consent_gate(self, action: str, action_id: str, consent: bool, reason: str, snap: PolicySnapshot):
+        """
+        Returns the refusal response (already audited), or None to proceed.
+        """
+        refused = self._refusal(action, action_id, consent, reason, snap)
+        if refused is None:
+            return None
+        self.audit(refused[0], snap)
+        return refused[1]
+
+    def _refusal(self, action: str, action_id: str, consent: bool, reason: str, snap: PolicySnapshot):
+        """
+        (audit_entry, response) if policy refuses the action, else None.
+        """
+        t0 = time.perf_counter()
+        rule = snap.consent_rule(action)
+        self.metrics.observe("buddy_action_phase_seconds", (("action", self._action_label(action)), ("phase", "policy")),
+                             time.perf_counter() - t0)
 
         if rule == "deny":
-            self.audit({"action_id": action_id, "action": action, "reason": reason, "result": "denied"})
-            return {"ok": False, "action_id": action_id, "error": "denied by policy"}
+            return ({"action_id": action_id, "action": action, "reason": reason, "result": "denied"},
+                    {"ok": False, "action_id": action_id, "error": "denied by policy"})
 
         if rule == "ask" and not consent:
-            self.audit({"action_id": action_id, "action": action, "reason": reason, "result": "consent_required"})
-            return {"ok": False, "action_id": action_id, "consent_required": True, "message": "consent required by policy"}
-
-        fn = {
-            "mkdir": self.exec_mkdir,
-            "write_file": self.exec_write_file,
-            "list_dir": self.exec_list_dir,
-            "open_url": self.exec_open_url,
-            "launch_app": self.exec_launch_app,
-            "shell": self.exec_shell,
-        }.get(action)
+            return ({"action_id": action_id, "action": action, "reason": reason, "result": "consent_required"},
+                    {"ok": False, "action_id": action_id, "consent_required": True, "message": "consent required by policy"})
+
+        return None
+
+    def execute(self, action: str, params: dict, consent: bool, reason: str):
+        action_id = str(uuid.uuid4())
+        snap = self.policy_snapshot()
+        refused = self._consent_gate(action, action_id, consent, reason, snap)
+        if refused is not None:
+            return refused
+        return self.run_action(action_id, action, params, reason, snap)
+
+    def run_action(self, action_id: str, action: str, params: dict, reason: str, snap: PolicySnapshot = None,
+                   wait_s: float = None):
+        """
+        Dispatch + audit for an action that already passed the consent gate.
+        """
+        snap = snap or self.policy_snapshot()
+        entry, resp = self._dispatch(action_id, action, params, reason, snap, wait_s)
+        self.audit(entry, snap)
+        return resp
+
+    def _busy(self, action_id: str, action: str, reason: str):
+        cls = self.scheduler.class_of(action)
+        err = f"busy: {cls} actions at capacity, retry later"
+        return ({"action_id": action_id, "action": action, "reason": reason, "result": "busy", "error": err},
+                {"ok": False, "action_id": action_id, "busy": True, "error": err})
+
+    DISPATCH = {
+        "mkdir": "exec_mkdir",
+        "write_file": "exec_write_file",
+        "list_dir": "exec_list_dir",
+        "read_file": "exec_read_file",
+        "search_files": "exec_search_files",
+        "open_url": "exec_open_url",
+        "launch_app": "exec_launch_app",
+        "shell": "exec_shell",
+    }
+
+    def _action_label(self, action: str) -> str:
+        """
+        Metric label for an action name; unknown names (client input) share one
+        label so they cannot grow the metric set.
+        """
+        return action if action in self.DISPATCH or action == "batch" else "other"
+
+    def _dispatch(self, action_id: str, action: str, params: dict, reason: str, snap: PolicySnapshot,
+                  wait_s: float = None):
+        """
+        Runs the action in a scheduler slot for its class; returns
+        (audit_entry, response) without auditing. wait_s: see ActionScheduler.acquire.
+        """
+        fn = getattr(self, self.DISPATCH[action]) if action in self.DISPATCH else None
 
         if not fn:
-            self.audit({"action_id": action_id, "action": action, "reason": reason, "result": "error", "error": "unknown action"})
-            return {"ok": False, "action_id": action_id, "error": "unknown action"}
+            return ({"action_id": action_id, "action": action, "reason": reason, "result": "error", "error": "unknown action"},
+                    {"ok": False, "action_id": action_id, "error": "unknown action"})
 
-        ok, err, result = fn(params)
+        slot = self.scheduler.acquire(action, wait_s)
+        if slot is None:
+            return self._busy(action_id, action, reason)
+        labels = (("action", action),)
+        self.metrics.gauge_add("buddy_actions_in_flight", labels, 1)
+        t0 = time.perf_counter()
+        try:
+            ok, err, result = fn(params, snap)
+        finally:
+            self.scheduler.release(slot)
+            self.metrics.gauge_add("buddy_actions_in_flight", labels, -1)
+            self.metrics.observe("buddy_action_phase_seconds", labels + (("phase", "execute"),),
+                                 time.perf_counter() - t0)
         if ok:
-            self.audit({"action_id": action_id, "action": action, "reason": reason, "result": "ok", "params": params})
-            return {"ok": True, "action_id": action_id, "result": result}
+            return ({"action_id": action_id, "action": action, "reason": reason, "result": "ok", "params": params},
+                    {"ok": True, "action_id": action_id, "result": result})
+
+        return ({"action_id": action_id, "action": action, "reason": reason, "result": "error", "error": err, "params": params},
+                {"ok": False, "action_id": action_id, "error": err})
+
+    def _batch_step(self, step, snap: PolicySnapshot):
+        if not isinstance(step, dict):
+            step = {}
+        action_id = str(uuid.uuid4())
+        action = step.get("action", "")
+        params = step.get("params", {}) if isinstance(step.get("params", {}), dict) else {}
+        reason = step.get("reason", "")
+        refused = self._refusal(action, action_id, bool(step.get("consent", False)), reason, snap)
+        if refused is not None:
+            return refused
+        return self._dispatch(action_id, action, params, reason, snap)
+
+    def execute_batch(self, steps: list, reason: str, stop_on_error: bool = False, parallel: bool = False):
+        """
+        Runs an ordered list of {"action","params","consent","reason"} steps, each
+        through the same consent gate and dispatcher as execute(), and writes ONE
+        audit record for the whole batch (action "batch", per-step entries under
+        "steps"). parallel=True runs independent steps on the batch pool; with
+        stop_on_error, steps not yet started when one fails are skipped.
+        """
+        batch_id = str(uuid.uuid4())
+        if not isinstance(steps, list) or not steps:
+            return {"ok": False, "batch_id": batch_id, "error": "steps must be a non-empty list"}
+        if len(steps) > self.batch_max_steps:
+            return {"ok": False, "batch_id": batch_id, "error": f"too many steps (max {self.batch_max_steps})"}
+
+        snap = self.policy_snapshot()  # every step sees the same policy
+        out = [None] * len(steps)
+        failed = threading.Event()
+
+        def run(i):
+            if stop_on_error and failed.is_set():
+                return
+            try:
+                out[i] = self._batch_step(steps[i], snap)
+            except Exception as e:
+                # one raising step must not abort the batch or its audit record
+                step = steps[i] if isinstance(steps[i], dict) else {}
+                error = str(e) or e.__class__.__name__
+                action_id = str(uuid.uuid4())
+                out[i] = ({"action_id": action_id, "action": step.get("action", ""),
+                           "reason": step.get("reason", ""), "result": "error", "error": error},
+                          {"ok": False, "action_id": action_id, "error": error})
+            if not out[i][1]["ok"]:
+                failed.set()
+
+        if parallel:
+            list(self._batch_pool.map(run, range(len(steps))))
+        else:
+            for i in range(len(steps)):
+                run(i)
+
+        skipped = {"ok": False, "skipped": True, "error": "skipped after earlier error"}
+        results = [r[1] if r else skipped for r in out]
+        n_ok = sum(1 for r in results if r["ok"])
+        n_skipped = sum(1 for r in out if r is None)
+        self.audit({
+            "action_id": batch_id,
+            "action": "batch",
+            "reason": reason,
+            "result": "ok" if n_ok == len(steps) else ("error" if n_ok == 0 else "partial"),
+            "parallel": parallel,
+            "stop_on_error": stop_on_error,
+            "skipped": n_skipped,
+            "steps": [r[0] if r else {"action": step.get("action", "") if isinstance(step, dict) else "",
+                                       "result": "skipped"}
+                      for r, step in zip(out, steps)],
+        }, snap)
+        return {"ok": n_ok == len(steps), "batch_id": batch_id, "completed": len(steps) - n_skipped,
+                "results": results}
+
+    STREAMABLE = {"shell": "exec_shell_stream", "list_dir": "exec_list_dir_stream"}
+
+    def submit_job(self, action: str, params: dict, consent: bool, reason: str):
+        """
+        Consent gate now, run later. Returns (http_code, response).
+        """
+        action_id = str(uuid.uuid4())
+        snap = self.policy_snapshot()
+        refused = self._consent_gate(action, action_id, consent, reason, snap)
+        if refused is not None:
+            return 200, refused
+        job = self.jobs.submit(action_id, action, params, reason, snap)
+        if job is None:
+            return 429, {"ok": False, "action_id": action_id, "error": "job queue full"}
+        return 202, {"ok": True, "action_id": action_id, "status": job.status}
+
+    def execute_stream(self, action: str, params: dict, consent: bool, reason: str,
+                       action_id: str = None, cancelled=None, snap: PolicySnapshot = None,
+                       wait_s: float = None):
+        """
+        Streaming execute: same consent gate and audit as execute(), but yields
+        events while the action runs. The first event is either the refusal
+        ({"event": "result", ...execute-style response}) or {"event": "accepted",
+        "action_id"}. One audit entry is written when the stream ends, including
+        when the client disconnects or `cancelled()` is true at the end
+        (result "cancelled").
+        """
+        action_id = action_id or str(uuid.uuid4())
+        snap = snap or self.policy_snapshot()
+        refused = self._consent_gate(action, action_id, consent, reason, snap)
+        if refused is not None:
+            yield dict(refused, event="result")
+            return
+        if action not in self.STREAMABLE:
+            err = "streaming not supported for this action"
+            self.audit({"action_id": action_id, "action": action, "reason": reason, "result": "error", "error": err},
+                       snap)
+            yield {"event": "result", "ok": False, "action_id": action_id, "error": err}
+            return
+
+        slot = self.scheduler.acquire(action, wait_s)
+        if slot is None:
+            entry, resp = self._busy(action_id, action, reason)
+            self.audit(entry, snap)
+            yield dict(resp, event="result")
+            return
 
-        self.audit({"action_id": action_id, "action": action, "reason": reason, "result": "error", "error": err, "params": params})
-        return {"ok": False, "action_id": action_id, "error": err}
+        entry = {"action_id": action_id, "action": action, "reason": reason, "result": "cancelled",
+                 "params": params, "stream": True}
+        labels = (("action", action),)
+        self.metrics.gauge_add("buddy_actions_in_flight", labels, 1)
+        t0 = time.perf_counter()
+        try:
+            yield {"event": "accepted", "action_id": action_id}
+            for ev in getattr(self, self.STREAMABLE[action])(params, snap):
+                if ev["event"] == "exit":
+                    entry["result"] = "error" if ev["timed_out"] else "ok"
+                    entry.update({k: ev[k] for k in ("returncode", "stdout_bytes", "stderr_bytes", "timed_out")})
+                elif ev["event"] == "done":
+                    entry["result"] = "ok"
+                    entry.update({k: ev[k] for k in ("count", "scanned", "next_cursor")})
+                elif ev["event"] == "error":
+                    entry["result"] = "error"
+                    entry["error"] = ev["error"]
+                yield ev
+        finally:
+            self.scheduler.release(slot)
+            self.metrics.gauge_add("buddy_actions_in_flight", labels, -1)
+            self.metrics.observe("buddy_action_phase_seconds", labels + (("phase", "execute"),),
+                                 time.perf_counter() - t0)
+            if cancelled is not None and cancelled():
+                entry["result"] = "cancelled"
+            self.audit(entry, snap)
 
     # ---- Provider status aggregator (UI convenience) ----
 
+    def _provider_timeout(self, pid: str) -> float:
+        try:
+            return float(provider_env(pid, "TIMEOUT_S") or self.provider_timeout_s)
+        except ValueError:
+            return self.provider_timeout_s
+
+    def provider_probes(self):
+        """
+        id -> probe(timeout_s) returning a model-name list (raises if unreachable).
+        Providers without a probe are reported as disabled scaffolds.
+        """
+        def ollama_local(timeout_s):
+            ok, models, err = self.list_ollama_local_models()
+            if not ok:
+                raise OSError(err)
+            return models
+
+        probes = {"ollama-local": ollama_local}
+        for pid, key_env in PROVIDER_SCAFFOLDS.items():
+            url = provider_env(pid, "URL")
+            if url:
+                probes[pid] = http_model_probe(url, key_env)
+        return probes
+
+    def _run_probe(self, probe, timeout_s: float, pid: str = ""):
+        t0 = time.monotonic()
+        slot = self.scheduler.acquire_class("provider", timeout_s)
+        if slot is None:
+            return None, "busy", time.monotonic() - t0
+        try:
+            return probe(max(0.1, timeout_s - (time.monotonic() - t0))), "", time.monotonic() - t0
+        except Exception as e:
+            return None, str(e) or e.__class__.__name__, time.monotonic() - t0
+        finally:
+            self.scheduler.release(slot)
+            if pid:
+                self.metrics.observe("buddy_provider_fetch_seconds", (("provider", pid),), time.monotonic() - t0)
+
     def providers_status(self):
         """
         Single UI call to populate dropdowns + show reachability.
-        For now:
-        - ollama-local: real
-        - other providers: scaffold only (connected False, models [])
-        """
-        st = {"ok": True, "timestamp": now_utc(), "providers": {}}
-
-        ok, models, err = self.list_ollama_local_models()
-        st["providers"]["ollama-local"] = {
-            "enabled": True,
-            "connected": bool(ok),
-            "reachable": bool(ok),
-            "error": "" if ok else err,
-            "models": models,
+
+        All wired providers are probed concurrently, each under its own timeout,
+        and the whole call under providers_deadline_s. Providers still running at
+        the deadline are reported with error "deadline exceeded" (partial: true).
+        Scaffolds without a probe: connected False, models [].
+        """
+        t0 = time.monotonic()
+        deadline = t0 + self.providers_deadline_s
+        probes = self.provider_probes()
+        futures = {
+            pid: self._provider_pool.submit(self._run_probe, probe, self._provider_timeout(pid), pid)
+            for pid, probe in probes.items()
         }
 
-        # Scaffolds (UI-friendly; real auth wiring later)
-        for pid in ("ollama-cloud", "openai", "gemini", "claude", "grok"):
+        st = {"ok": True, "timestamp": now_utc(), "partial": False, "providers": {}}
+        for pid in ["ollama-local"] + list(PROVIDER_SCAFFOLDS):
+            fut = futures.get(pid)
+            if fut is None:
+                # Scaffolds (UI-friendly; real auth wiring later)
+                st["providers"][pid] = {
+                    "enabled": False,
+                    "connected": False,
+                    "reachable": False,
+                    "error": "",
+                    "models": [],
+                }
+                continue
+            try:
+                models, err, latency = fut.result(timeout=max(0.0, deadline - time.monotonic()))
+            except concurrent.futures.TimeoutError:
+                models, err, latency = None, "deadline exceeded", time.monotonic() - t0
+                st["partial"] = True
+            ok = models is not None
             st["providers"][pid] = {
-                "enabled": False,
-                "connected": False,
-                "reachable": False,
-                "error": "",
-                "models": [],
+                "enabled": True,
+                "connected": ok,
+                "reachable": ok,
+                "error": err,
+                "models": models or [],
+                "latency_ms": round(latency * 1000, 1),
             }
-
+        st["providers"]["ollama-local"]["cache"] = self.ollama_tags_cache.stats()
+        st["elapsed_ms"] = round((time.monotonic() - t0) * 1000, 1)
         return st
 
 
@@ -487,9 +3980,30 @@ class ActionsEngine:
 # HTTP Handler
 # -----------------------------
 
+# /execute/batch bodies carry whole scaffolds (many write_file contents)
+BATCH_MAX_BYTES = int(os.environ.get("BUDDY_BATCH_MAX_MB", "16")) * 1024 * 1024
+
 class Handler(BaseHTTPRequestHandler):
     server_version = "buddy-actions/0.1"
 
+    def handle_one_request(self):
+        """
+        Counts the request (in flight, bytes in/out) for GET /metrics.
+        """
+        m = self.server.engine.metrics
+        rfile, wfile = self.rfile, self.wfile
+        self.rfile, self.wfile = _CountingIO(rfile), _CountingIO(wfile)
+        m.gauge_add("buddy_http_requests_in_flight", (), 1)
+        try:
+            super().handle_one_request()
+        finally:
+            m.gauge_add("buddy_http_requests_in_flight", (), -1)
+            m.inc("buddy_http_bytes_received_total", (), self.rfile.n)
+            m.inc("buddy_http_bytes_sent_total", (), self.wfile.n)
+            if self.rfile.n:
+                m.inc("buddy_http_requests_total", (("method", str(getattr(self, "command", "") or "")),))
+            self.rfile, self.wfile = rfile, wfile
+
     def _send(self, code: int, obj: dict):
         data = json.dumps(obj, ensure_ascii=False).encode("utf-8")
         self.send_response(code)
@@ -498,6 +4012,188 @@ class Handler(BaseHTTPRequestHandler):
         self.end_headers()
         self.wfile.write(data)
 
+    def _start_stream(self, code: int, content_type: str):
+        """
+        Begin a response whose length is not known up front: chunked for
+        HTTP/1.1 clients, close-delimited for HTTP/1.0. The connection is
+        closed afterwards either way.
+        """
+        self._chunked = self.request_version == "HTTP/1.1"
+        if self._chunked:
+            self.protocol_version = "HTTP/1.1"
+        self.send_response(code)
+        self.send_header("Content-Type", content_type)
+        if self._chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+    def _write_chunk(self, data: bytes):
+        if not data:
+            return
+        if self._chunked:
+            self.wfile.write(b"%x\r\n%b\r\n" % (len(data), data))
+        else:
+            self.wfile.write(data)
+
+    def _end_stream(self):
+        if self._chunked:
+            self.wfile.write(b"0\r\n\r\n")
+        self.wfile.flush()
+
+    def _send_file(self, query: dict):
+        """
+        GET /files?path=...&consent=&reason= plus offset/length, start_line/lines,
+        head or tail (see plan_read), or a Range header. Byte windows are
+        streamed from disk in READ_CHUNK pieces; partial reads answer 206.
+        """
+        q = {k: v[-1] for k, v in query.items() if v}
+        params = {k: q[k] for k in ("path", "offset", "length", "start_line", "lines", "head", "tail") if k in q}
+        range_header = self.headers.get("Range", "")
+        code, plan = self.server.engine.read_stream(
+            params,
+            consent=q.get("consent", "0").lower() in ("1", "true", "yes"),
+            reason=q.get("reason", ""),
+            range_header=range_header,
+        )
+        if not plan.get("ok"):
+            if code == 416:
+                self.send_response(416)
+                self.send_header("Content-Range", f"bytes */{plan['size']}")
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            self._send(code, plan)
+            return
+
+        start, end, size = plan["start"], plan["end"], plan["size"]
+        partial = end > start and (plan.get("ranged") or (start, end) != (0, size))
+        self.send_response(206 if partial else 200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("Content-Length", str(end - start))
+        if partial:
+            self.send_header("Content-Range", f"bytes {start}-{end - 1}/{size}")
+        if "next_line" in plan:
+            self.send_header("X-Next-Line", str(plan["next_line"]))
+        self.send_header("X-Action-Id", plan["action_id"])
+        self.end_headers()
+        for data in iter_file_range(plan["path"], start, end):
+            self.wfile.write(data)
+
+    def _send_audit(self, query: dict):
+        """
+        GET /audit?action=&result=&action_id=&since=&until=&cursor=&limit=&order=asc|desc
+
+        Streams NDJSON: one audit entry per line (with its "seq"), then a final
+        {"next_cursor": "<seq>"|null} line. Pass next_cursor back as ?cursor=
+        (same filters and order) to fetch the next page.
+        """
+        q = {k: v[-1] for k, v in query.items() if v}
+        try:
+            limit = min(int(q.get("limit", "1000")), 100_000)
+            cursor = q.get("cursor")
+            if cursor is not None:
+                int(cursor)
+        except ValueError:
+            self._send(400, {"ok": False, "error": "limit and cursor must be integers"})
+            return
+        rows = self.server.engine.audit_query(
+            action=q.get("action"), result=q.get("result"), action_id=q.get("action_id"),
+            since=q.get("since"), until=q.get("until"), cursor=cursor,
+            newest_first=q.get("order", "asc").lower() == "desc", limit=limit,
+        )
+        self._start_stream(200, "application/x-ndjson; charset=utf-8")
+        buf = []
+        size = 0
+        try:
+            for kind, val in rows:
+                obj = val if kind == "entry" else {"next_cursor": val}
+                line = (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+                buf.append(line)
+                size += len(line)
+                if size >= 64 * 1024:
+                    self._write_chunk(b"".join(buf))
+                    buf, size = [], 0
+            self._write_chunk(b"".join(buf))
+            self._end_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client went away; stop reading the index
+
+    def _send_events(self, events, first: dict = None):
+        """
+        Stream event dicts: SSE if the client asks for text/event-stream,
+        otherwise NDJSON. Each event is written as soon as it is produced;
+        a failed write closes the generator, which cancels the work behind it.
+        `first` is an event already taken from `events`.
+        """
+        sse = "text/event-stream" in self.headers.get("Accept", "")
+        self._start_stream(200, "text/event-stream; charset=utf-8" if sse else "application/x-ndjson; charset=utf-8")
+        try:
+            for ev in itertools.chain([first] if first is not None else [], events):
+                data = json.dumps(ev, ensure_ascii=False)
+                if sse:
+                    line = f"event: {ev.get('event', 'message')}\ndata: {data}\n\n"
+                else:
+                    line = data + "\n"
+                self._write_chunk(line.encode("utf-8"))
+                self.wfile.flush()
+            self._end_stream()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            events.close()
+
+    def do_PUT(self):
+        url = urlparse(self.path)
+        if url.path != "/files":
+            self._send(404, {"ok": False, "error": "not found"})
+            return
+        if "chunked" in (self.headers.get("Transfer-Encoding") or "").lower():
+            self.close_connection = True
+            self._send(411, {"ok": False, "error": "Content-Length required"})
+            return
+        try:
+            length = int(self.headers.get("Content-Length", ""))
+        except ValueError:
+            length = -1
+        if length < 0:
+            self.close_connection = True
+            self._send(411, {"ok": False, "error": "Content-Length required"})
+            return
+        q = parse_qs(url.query)
+        first = lambda k, default="": q.get(k, [default])[0]
+        code, resp = self.server.engine.upload_file(
+            first("path"),
+            self.rfile,
+            length,
+            consent=first("consent", "0").lower() in ("1", "true", "yes"),
+            reason=first("reason"),
+            expect_sha256=first("sha256") or self.headers.get("X-Content-SHA256", ""),
+        )
+        if not resp.get("ok") and resp.get("error") != "sha256 mismatch":
+            self.close_connection = True  # body may be unread; don't reuse the connection
+        self._send(code, resp)
+
+    def do_DELETE(self):
+        path = urlparse(self.path).path
+        if path.startswith("/shell/sessions/"):
+            pool = self.server.engine.shell_sessions
+            if pool is None or not pool.close_session(path[len("/shell/sessions/"):]):
+                self._send(404, {"ok": False, "error": "no such session"})
+            else:
+                self._send(200, {"ok": True, "session": path[len("/shell/sessions/"):]})
+            return
+        if not path.startswith("/jobs/"):
+            self._send(404, {"ok": False, "error": "not found"})
+            return
+        job = self.server.engine.jobs.cancel(path[len("/jobs/"):])
+        if job is None:
+            self._send(404, {"ok": False, "error": "no such job"})
+            return
+        self._send(200, {"ok": True, "action_id": job.action_id, "status": job.status,
+                         "cancel_requested": job.cancel_requested})
+
     def _read_json(self, max_bytes: int = 1_000_000):
         """
         Prevent accidental giant payloads.
@@ -511,6 +4207,39 @@ class Handler(BaseHTTPRequestHandler):
         return json.loads(raw.decode("utf-8", errors="replace") or "{}")
 
     def do_GET(self):
+        url = urlparse(self.path)
+
+        # audit query (streamed NDJSON)
+        if url.path == "/audit":
+            self._send_audit(parse_qs(url.query))
+            return
+
+        # file download (ranges / line windows)
+        if url.path == "/files":
+            self._send_file(parse_qs(url.query))
+            return
+
+        # background jobs
+        if url.path == "/jobs":
+            self._send(200, {"ok": True, "jobs": self.server.engine.jobs.list()})
+            return
+        if url.path.startswith("/jobs/"):
+            job = self.server.engine.jobs.get(url.path[len("/jobs/"):])
+            if job is None:
+                self._send(404, {"ok": False, "error": "no such job"})
+            else:
+                self._send(200, dict(job.summary(output=True), ok=True))
+            return
+
+        # persistent shell sessions
+        if url.path == "/shell/sessions":
+            pool = self.server.engine.shell_sessions
+            if pool is None:
+                self._send(404, {"ok": False, "error": "shell sessions disabled"})
+            else:
+                self._send(200, {"ok": True, "sessions": pool.list(), "stats": pool.stats()})
+            return
+
         # health
         if self.path == "/health":
             self._send(200, {"ok": True, "service": "buddy-actions", "version": "0.1"})
@@ -536,7 +4265,7 @@ class Handler(BaseHTTPRequestHandler):
             try:
                 data = self.server.engine._fetch_ollama_tags()
                 self._send(200, {"ok": True, "provider": "ollama-local", "tags": data})
-            except (URLError, HTTPError, ValueError, json.JSONDecodeError) as e:
+            except (URLError, HTTPError, OSError, ValueError, json.JSONDecodeError) as e:
                 self._send(503, {"ok": False, "provider": "ollama-local", "error": str(e), "tags": {}})
             return
 
@@ -545,15 +4274,48 @@ class Handler(BaseHTTPRequestHandler):
             self._send(200, self.server.engine.providers_status())
             return
 
+        # metrics: Prometheus text, or JSON with ?format=json
+        if url.path == "/metrics":
+            if parse_qs(url.query).get("format") == ["json"]:
+                self._send(200, {"ok": True, "metrics": self.server.engine.metrics_json()})
+                return
+            data = self.server.engine.metrics_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+
+        # per-class concurrency: running, queued, wait times
+        if self.path == "/scheduler/stats":
+            self._send(200, {"ok": True, "scheduler": self.server.engine.scheduler.stats()})
+            return
+
+        # audit writer backpressure/commit counters
+        if self.path == "/audit/stats":
+            self._send(200, {"ok": True, "audit": self.server.engine.audit_stats()})
+            return
+
         # policy (current)
         if self.path == "/policy":
-            self._send(200, {"ok": True, "policy": self.server.engine.get_policy()})
+            snap = self.server.engine.policy_snapshot()
+            self._send(200, {"ok": True, "version": snap.version, "loaded_at": snap.loaded_at,
+                             "policy": snap.policy})
             return
 
         # policy reload (existing)
         if self.path == "/policy/reload":
-            pol = self.server.engine.reload_policy()
-            self._send(200, {"ok": True, "policy": pol})
+            err, pol = self.server.engine.reload_policy()
+            if err:
+                self._send(200, {"ok": False, "error": err, "policy": pol})
+            else:
+                self._send(200, {"ok": True, "policy": pol})
+            return
+
+        # policy hot-reload status
+        if self.path == "/policy/status":
+            self._send(200, {"ok": True, "watcher": self.server.engine.policy_watcher.stats()})
             return
 
         self._send(404, {"ok": False, "error": "not found"})
@@ -578,10 +4340,56 @@ class Handler(BaseHTTPRequestHandler):
                 self._send(400, {"ok": False, "error": err})
             return
 
-        # execute (existing)
-        if self.path != "/execute":
+        url = urlparse(self.path)
+
+        # job control
+        if url.path.startswith("/jobs/") and url.path.endswith(("/pause", "/resume")):
+            job_id, _, op = url.path[len("/jobs/"):].rpartition("/")
+            job, err = self.server.engine.jobs.pause(job_id, resume=(op == "resume"))
+            if job is None:
+                self._send(404, {"ok": False, "error": "no such job"})
+            elif err:
+                self._send(409, {"ok": False, "error": err, "status": job.status})
+            else:
+                self._send(200, {"ok": True, "action_id": job_id, "status": job.status})
+            return
+
+        # persistent shell sessions: the broker issues the id
+        if url.path == "/shell/sessions":
+            pool = self.server.engine.shell_sessions
+            session = pool.create() if pool is not None else None
+            if pool is None:
+                self._send(404, {"ok": False, "error": "shell sessions disabled"})
+            elif session is None:
+                self._send(429, {"ok": False, "busy": True, "error": "too many shell sessions"})
+            else:
+                self._send(200, {"ok": True, "session": session})
+            return
+
+        # multi-step plan
+        if url.path == "/execute/batch":
+            try:
+                body = self._read_json(max_bytes=BATCH_MAX_BYTES)
+            except ValueError as e:
+                self._send(413, {"ok": False, "error": str(e)})
+                return
+            except Exception:
+                self._send(400, {"ok": False, "error": "invalid json"})
+                return
+            resp = self.server.engine.execute_batch(
+                body.get("steps"),
+                body.get("reason", ""),
+                stop_on_error=bool(body.get("stop_on_error", False)),
+                parallel=bool(body.get("parallel", False)),
+            )
+            self._send(200, resp)
+            return
+
+        # execute (existing) / streaming execute / background job
+        if url.path not in ("/execute", "/execute/stream", "/jobs"):
             self._send(404, {"ok": False, "error": "not found"})
             return
+        stream = url.path == "/execute/stream" or parse_qs(url.query).get("stream") == ["1"]
 
         try:
             body = self._read_json()
@@ -597,10 +4405,271 @@ class Handler(BaseHTTPRequestHandler):
         consent = bool(body.get("consent", False))
         reason = body.get("reason", "")
 
+        if url.path == "/jobs":
+            code, resp = self.server.engine.submit_job(action, params, consent, reason)
+            self._send(code, resp)
+            return
+
+        if stream:
+            events = self.server.engine.execute_stream(action, params, consent, reason)
+            first = next(events)
+            if first.get("busy"):
+                events.close()
+                self._send(429, first)
+                return
+            self._send_events(events, first)
+            return
+
         resp = self.server.engine.execute(action, params, consent, reason)
 
-        # keep your behavior: always 200 with ok false/true in JSON
-        self._send(200, resp)
+        # keep your behavior: always 200 with ok false/true in JSON (except over capacity)
+        self._send(429 if resp.get("busy") else 200, resp)
+
+
+# -----------------------------
+# Asyncio server mode (BUDDY_SERVER=asyncio)
+# -----------------------------
+
+class _RequestReader:
+    """
+    rfile for _AsyncHandler: the already-read request head, then the body.
+    Small bodies are read on the loop up front; larger ones are pulled from
+    the asyncio StreamReader on demand (the handler then runs on a worker
+    thread), so uploads are never buffered whole.
+    """
+
+    def __init__(self, head: bytes, body: bytes, loop=None, reader=None, remaining: int = 0):
+        self._head = io.BytesIO(head)
+        self._body = io.BytesIO(body)
+        self._loop = loop
+        self._reader = reader
+        self.remaining = remaining  # body bytes still on the socket
+
+    def readline(self, limit: int = -1) -> bytes:
+        return self._head.readline(limit)
+
+    def read(self, n: int = -1) -> bytes:
+        out = self._head.read(n) or b""
+        if n >= 0 and len(out) >= n:
+            return out
+        want = -1 if n < 0 else n - len(out)
+        out += self._body.read(want) or b""
+        if (n < 0 or len(out) < n) and self.remaining > 0:
+            want = self.remaining if n < 0 else min(self.remaining, n - len(out))
+            fut = asyncio.run_coroutine_threadsafe(self._reader.read(want), self._loop)
+            data = fut.result()
+            self.remaining -= len(data)
+            if not data:
+                self.remaining = 0
+            out += data
+        return out
+
+
+class _ResponseWriter:
+    """
+    wfile for _AsyncHandler. From a worker thread each write waits for the
+    transport to drain (backpressure for streamed responses); on the loop
+    thread it writes directly.
+    """
+
+    def __init__(self, loop, writer):
+        self._loop = loop
+        self._writer = writer
+
+    async def _write(self, data: bytes):
+        if self._writer.is_closing():
+            raise ConnectionResetError("client disconnected")
+        self._writer.write(data)
+        await self._writer.drain()
+
+    def write(self, data: bytes):
+        try:
+            on_loop = asyncio.get_running_loop() is self._loop
+        except RuntimeError:
+            on_loop = False
+        if on_loop:
+            self._writer.write(data)
+        else:
+            asyncio.run_coroutine_threadsafe(self._write(bytes(data)), self._loop).result()
+        return len(data)
+
+    def flush(self):
+        pass
+
+
+class _AsyncHandler(Handler):
+    """
+    The threaded Handler's routes, driven by AsyncBrokerServer for one request.
+    HTTP/1.1, so responses with Content-Length keep the connection alive.
+    """
+
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, server, client_address, rfile, wfile):
+        # deliberately not calling BaseRequestHandler.__init__ (no socket here)
+        self.server = server
+        self.client_address = client_address
+        self.request = None
+        self.rfile = rfile
+        self.wfile = wfile
+        self.close_connection = True
+        self.handle_one_request()
+
+
+class AsyncBrokerServer:
+    """
+    Event-loop HTTP/1.1 front end for the same routes as the threaded server.
+
+    - one coroutine per connection; idle keep-alive connections cost no thread
+    - pipelined requests are read from the connection buffer and answered in order
+    - cheap GET routes run inline on the loop; UI routes (policy, providers,
+      job/session/scheduler status) get their own small thread pool so they
+      never wait behind actions; everything else (execute, streams, uploads,
+      audit queries) runs in a bounded thread pool
+    """
+
+    # lock-free or short-lock reads only: anything that can wait on the audit
+    # store lock (held across a segment rotation) must not run on the loop
+    INLINE_GET = {"/health", "/policy", "/scheduler/stats"}
+    PRIORITY_PREFIXES = ("/policy", "/providers/", "/jobs", "/shell/sessions", "/metrics")
+    MAX_HEAD = 64 * 1024
+    INLINE_BODY = 64 * 1024
+
+    def __init__(self, engine, host: str, port: int, workers: int = 32, keepalive_s: float = 15.0,
+                 ui_workers: int = 4):
+        self.engine = engine
+        self.host = host
+        self.port = port
+        self.keepalive_s = keepalive_s
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, int(workers)), thread_name_prefix="buddy-async-worker")
+        self.ui_executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1, int(ui_workers)), thread_name_prefix="buddy-async-ui")
+        self._server = None
+        self._stop = None
+        self._writers = set()
+        self._tasks = set()
+
+    async def start(self):
+        self._server = await asyncio.start_server(
+            self._client, self.host, self.port, limit=self.MAX_HEAD, backlog=1024)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def serve_forever(self):
+        """
+        Serve until SIGTERM/SIGINT (when on the main thread) or stop().
+        """
+        if self._server is None:
+            await self.start()
+        loop = asyncio.get_running_loop()
+        self._loop = loop
+        self._stop = asyncio.Event()
+        for sig in (signal.SIGTERM, signal.SIGINT):
+            try:
+                loop.add_signal_handler(sig, self._stop.set)
+            except (NotImplementedError, RuntimeError, ValueError):
+                pass  # not the main thread
+        await self._stop.wait()
+        self._server.close()
+        for w in list(self._writers):
+            w.close()
+        # closed writers end their connections' reads; let those coroutines
+        # return on their own rather than be cancelled by asyncio.run()
+        if self._tasks:
+            await asyncio.wait(list(self._tasks), timeout=5)
+        await self._server.wait_closed()
+
+    def stop(self):
+        if self._stop is not None:
+            self._loop.call_soon_threadsafe(self._stop.set)
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self.executor.shutdown(wait=False)
+        self.ui_executor.shutdown(wait=False)
+
+    @staticmethod
+    def _parse_head(head: bytes):
+        lines = head.split(b"\r\n")
+        parts = lines[0].split()
+        method = parts[0].decode("latin-1") if parts else ""
+        target = parts[1].decode("latin-1") if len(parts) > 1 else ""
+        headers = {}
+        for ln in lines[1:]:
+            k, sep, v = ln.partition(b":")
+            if sep:
+                headers[k.strip().lower().decode("latin-1")] = v.strip().decode("latin-1")
+        return method, target, headers
+
+    async def _client(self, reader, writer):
+        loop = asyncio.get_running_loop()
+        peer = writer.get_extra_info("peername") or ("", 0)
+        out = _ResponseWriter(loop, writer)
+        self._writers.add(writer)
+        self._tasks.add(asyncio.current_task())
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), self.keepalive_s)
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+                    return  # peer closed / idle keep-alive expired; cancellation propagates
+                except asyncio.LimitOverrunError:
+                    writer.write(b"HTTP/1.1 431 Request Header Fields Too Large\r\n"
+                                 b"Content-Length: 0\r\nConnection: close\r\n\r\n")
+                    await writer.drain()
+                    return
+                method, target, headers = self._parse_head(head)
+                try:
+                    length = max(0, int(headers.get("content-length", "0") or "0"))
+                except ValueError:
+                    length = 0
+                chunked_body = "chunked" in headers.get("transfer-encoding", "").lower()
+
+                if length <= self.INLINE_BODY:
+                    body = await reader.readexactly(length) if length else b""
+                    rfile = _RequestReader(head, body)
+                else:
+                    rfile = _RequestReader(head, b"", loop, reader, length)
+
+                path = urlparse(target).path
+                if method == "GET" and path in self.INLINE_GET and not rfile.remaining:
+                    h = _AsyncHandler(self, peer, rfile, out)
+                else:
+                    ui = path.startswith(self.PRIORITY_PREFIXES) and (method == "GET" or path == "/policy")
+                    h = await loop.run_in_executor(self.ui_executor if ui else self.executor,
+                                                   _AsyncHandler, self, peer, rfile, out)
+                await writer.drain()
+
+                # unread body (e.g. 413) or a body we can't frame: can't find the next request
+                if h.close_connection or rfile.remaining or chunked_body:
+                    return
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+        except Exception:
+            # same as socketserver.handle_error: log, drop this connection, keep serving
+            sys.stderr.write(f"error handling request from {peer}:\n{traceback.format_exc()}")
+        finally:
+            self._writers.discard(writer)
+            self._tasks.discard(asyncio.current_task())
+            try:
+                writer.close()
+            except Exception:
+                pass
+
+
+def serve_async(engine, host: str, port: int):
+    srv = AsyncBrokerServer(
+        engine, host, port,
+        workers=int(os.environ.get("BUDDY_ASYNC_WORKERS", "32")),
+        keepalive_s=float(os.environ.get("BUDDY_KEEPALIVE_S", "15")),
+        ui_workers=int(os.environ.get("BUDDY_ASYNC_UI_WORKERS", "4")),
+    )
+    try:
+        asyncio.run(srv.serve_forever())
+    finally:
+        srv.close()
 
 
 # -----------------------------
@@ -615,18 +4684,37 @@ def main():
     port = int(os.environ.get("BUDDY_PORT", "8765"))
 
     engine = ActionsEngine(repo_root, policy_path, audit_path)
+    atexit.register(engine.close)
+    # systemd stops us with SIGTERM; turn it into SystemExit so the audit queue is flushed
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
 
-    httpd = ThreadingHTTPServer((host, port), Handler)
-    httpd.engine = engine
+    mode = os.environ.get("BUDDY_SERVER", "threaded").strip().lower()
 
-    sys.stdout.write(f"buddy-actions listening on http://{host}:{port}\n")
+    sys.stdout.write(f"buddy-actions listening on http://{host}:{port} ({mode})\n")
     sys.stdout.write(f"policy: {policy_path}\n")
     sys.stdout.write(f"audit:  {audit_path}\n")
     sys.stdout.write(f"ollama: {engine.ollama_tags_url}\n")
     sys.stdout.write(f"shell:  {'ENABLED' if engine.enable_shell else 'disabled'}\n")
     sys.stdout.flush()
 
-    httpd.serve_forever()
+    if mode == "asyncio":
+        try:
+            serve_async(engine, host, port)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            engine.close()
+        return
+
+    httpd = ThreadingHTTPServer((host, port), Handler)
+    httpd.engine = engine
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+        engine.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,38 @@
+import importlib.util
+import os
+
+import pytest
+
+REPO_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def load_broker():
+    path = os.environ.get(
+        "BUDDY_ACTIONSD",
+        os.path.join(REPO_ROOT, "snaps", "_src", "buddy-core", "broker", "buddy_actionsd.py"),
+    )
+    spec = importlib.util.spec_from_file_location("buddy_actionsd", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    return mod
+
+
+@pytest.fixture(scope="session")
+def bd():
+    return load_broker()
+
+
+@pytest.fixture
+def engine(bd, tmp_path, monkeypatch):
+    """ActionsEngine confined to tmp_path, every action allowed, shell on."""
+    monkeypatch.setenv("BUDDY_ENABLE_SHELL", "1")
+    monkeypatch.setenv("BUDDY_SEARCH_INDEX_PATH", "off")
+    monkeypatch.setenv("BUDDY_POLICY_POLL_S", "0")
+    pol = bd.default_policy(str(tmp_path))
+    pol["consent"] = {k: "allow" for k in pol["consent"]}
+    pol["re_auth_required"] = {}
+    policy_path = tmp_path / "policy.json"
+    bd.write_json(str(policy_path), pol)
+    eng = bd.ActionsEngine(str(tmp_path), str(policy_path), str(tmp_path / "audit.jsonl"))
+    yield eng
+    eng.close()
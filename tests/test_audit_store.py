@@ -0,0 +1,65 @@
+import json
+
+
+def entries(n, start=0):
+    return [{"timestamp": f"2026-01-01T00:00:{i:02d}Z", "action": "mkdir", "action_id": f"id{i}",
+             "result": "success"} for i in range(start, start + n)]
+
+
+def ids(rows):
+    return [e["action_id"] for e in rows]
+
+
+def test_rotation_keeps_entries_queryable(bd, tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    store = bd.AuditStore(path, rotate_bytes=1 << 30)
+    try:
+        store.append(entries(5))
+        store.sync()
+        assert store.maybe_rotate(force=True)
+        store.append(entries(3, 5))
+        store.sync()
+        assert store.active_segment == 2
+        assert (tmp_path / "audit.jsonl.000001.gz").exists()
+        assert ids(store.last(100)) == [f"id{i}" for i in range(8)]
+        assert ids(store.by_action_id("id2")) == ["id2"]
+        assert ids(store.time_range("2026-01-01T00:00:04Z", "2026-01-01T00:00:06Z")) == ["id4", "id5", "id6"]
+    finally:
+        store.close()
+
+
+def test_catch_up_indexes_unindexed_lines(bd, tmp_path):
+    path = tmp_path / "audit.jsonl"
+    path.write_text("".join(json.dumps(e) + "\n" for e in entries(4)) + "not json\n")
+    store = bd.AuditStore(str(path))
+    try:
+        assert ids(store.last(100)) == ["id0", "id1", "id2", "id3"]
+    finally:
+        store.close()
+    # reopening does not index the same lines twice
+    store = bd.AuditStore(str(path))
+    try:
+        assert ids(store.last(100)) == ["id0", "id1", "id2", "id3"]
+    finally:
+        store.close()
+
+
+def test_catch_up_after_rotation_crash(bd, tmp_path):
+    path = str(tmp_path / "audit.jsonl")
+    store = bd.AuditStore(path, rotate_bytes=1 << 30)
+    store.append(entries(3))
+    store.sync()
+    size = store._size
+    store.maybe_rotate(force=True)
+    # simulate a crash after the rotation committed but before the active file was emptied
+    with open(path, "w") as f:
+        f.write("".join(json.dumps(e) + "\n" for e in entries(3)))
+    store._set_meta("rotated_bytes", str(size))
+    store._db.commit()
+    store.close()
+
+    store = bd.AuditStore(path, rotate_bytes=1 << 30)
+    try:
+        assert ids(store.last(100)) == ["id0", "id1", "id2"]
+    finally:
+        store.close()
@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 10)),
+    ("bytes=5-", (5, 100)),
+    ("bytes=-10", (90, 100)),
+    ("bytes=-500", (0, 100)),
+    ("bytes=90-500", (90, 100)),
+    (" bytes = 1 - 2 ", (1, 3)),
+])
+def test_satisfiable(bd, header, expected):
+    assert bd.parse_byte_range(header, 100) == expected
+
+
+@pytest.mark.parametrize("header", [None, "", "bytes=-", "bytes=9-5", "bytes=0-1,4-5", "items=0-9", "bytes=a-b"])
+def test_ignored(bd, header):
+    # RFC 9110: an invalid or multi-range header is ignored, the whole file served
+    assert bd.parse_byte_range(header, 100) is None
+
+
+@pytest.mark.parametrize("header, size", [("bytes=100-", 100), ("bytes=200-300", 100), ("bytes=-0", 100),
+                                          ("bytes=0-", 0)])
+def test_unsatisfiable(bd, header, size):
+    with pytest.raises(ValueError):
+        bd.parse_byte_range(header, size)
@@ -0,0 +1,87 @@
+import time
+import uuid
+
+
+def wait_for(pred, timeout_s=10.0):
+    deadline = time.monotonic() + timeout_s
+    while time.monotonic() < deadline:
+        v = pred()
+        if v:
+            return v
+        time.sleep(0.02)
+    raise AssertionError("condition not met in time")
+
+
+def audited(engine, action_id):
+    return wait_for(lambda: engine.audit_store.by_action_id(action_id))
+
+
+def submit(engine, action, params, jobs=None):
+    action_id = str(uuid.uuid4())
+    job = (jobs or engine.jobs).submit(action_id, action, params, "test", engine.policy_snapshot())
+    assert job is not None
+    return job
+
+
+def test_shell_job_output_and_done(engine):
+    code, resp = engine.submit_job("shell", {"cmd": "echo hi; echo err >&2; exit 3"}, True, "test")
+    assert code == 202 and resp["ok"]
+    job = engine.jobs.get(resp["action_id"])
+    wait_for(lambda: job.status not in ("queued", "running"))
+    assert job.status == "done"
+    assert job.result["returncode"] == 3
+    out = job.summary(output=True)
+    # bash -l: the login profile may write to stderr before the command does
+    assert out["stdout_tail"] == "hi\n" and out["stderr_tail"].endswith("err\n")
+
+
+def test_failed_job_is_failed_and_audited(engine, tmp_path):
+    (tmp_path / "taken").write_text("x")
+    job = submit(engine, "mkdir", {"path": str(tmp_path / "taken")})
+    wait_for(lambda: job.status not in ("queued", "running"))
+    assert job.status == "failed"
+    assert job.error
+    assert job.finished is not None
+    assert any(e.get("result") != "success" for e in audited(engine, job.action_id))
+
+
+def test_cancel_running_shell_job(engine):
+    job = submit(engine, "shell", {"cmd": "sleep 30"})
+    wait_for(lambda: job.pid is not None)
+    t0 = time.monotonic()
+    assert engine.jobs.cancel(job.action_id) is job
+    wait_for(lambda: job.status == "cancelled")
+    assert time.monotonic() - t0 < 10
+    assert any(e.get("result") == "cancelled" for e in audited(engine, job.action_id))
+
+
+def test_cancel_queued_job_never_runs(bd, engine, tmp_path):
+    jobs = bd.JobRegistry(engine, workers=1)
+    try:
+        blocker = submit(engine, "shell", {"cmd": "sleep 30"}, jobs)
+        wait_for(lambda: blocker.pid is not None)
+        queued = submit(engine, "mkdir", {"path": str(tmp_path / "never")}, jobs)
+        assert queued.status == "queued"
+        assert jobs.cancel(queued.action_id).status == "cancelled"
+        jobs.cancel(blocker.action_id)
+        wait_for(lambda: blocker.status == "cancelled")
+        time.sleep(0.2)
+        assert queued.status == "cancelled" and queued.started is None
+        assert not (tmp_path / "never").exists()
+    finally:
+        jobs.close()
+
+
+def test_cancel_finished_or_unknown(engine):
+    assert engine.jobs.cancel("no-such-job") is None
+    job = submit(engine, "shell", {"cmd": "true"})
+    wait_for(lambda: job.status == "done")
+    assert engine.jobs.cancel(job.action_id).status == "done"
+
+
+def test_queue_full_is_refused(bd, engine):
+    jobs = bd.JobRegistry(engine, workers=1, max_queue=0)
+    try:
+        assert jobs.submit("a", "shell", {"cmd": "true"}, "test", engine.policy_snapshot()) is None
+    finally:
+        jobs.close()
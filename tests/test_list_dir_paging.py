@@ -0,0 +1,50 @@
+def make_tree(root, n):
+    d = root / "many"
+    d.mkdir()
+    for i in range(n):
+        (d / f"f{i:03d}").write_text("x")
+    return d
+
+
+def test_plain_call_is_uncapped(engine, tmp_path):
+    d = make_tree(tmp_path, 30)
+    engine.list_limit = 10
+    ok, err, res = engine.exec_list_dir({"path": str(d)}, engine.policy_snapshot())
+    assert ok, err
+    assert res["items"] == [f"f{i:03d}" for i in range(30)]
+    assert res["next_cursor"] is None
+
+
+def test_cursor_pages_cover_every_entry_once(engine, tmp_path):
+    d = make_tree(tmp_path, 25)
+    snap = engine.policy_snapshot()
+    seen, cursor, pages = [], None, 0
+    while True:
+        params = {"path": str(d), "limit": 10}
+        if cursor:
+            params["cursor"] = cursor
+        ok, err, res = engine.exec_list_dir(params, snap)
+        assert ok, err
+        assert len(res["items"]) <= 10
+        seen += res["items"]
+        pages += 1
+        cursor = res["next_cursor"]
+        if not cursor:
+            break
+    assert pages == 3
+    assert seen == [f"f{i:03d}" for i in range(25)]
+
+
+def test_limit_is_capped_by_list_limit(engine, tmp_path):
+    d = make_tree(tmp_path, 12)
+    engine.list_limit = 5
+    ok, err, res = engine.exec_list_dir({"path": str(d), "limit": 100}, engine.policy_snapshot())
+    assert ok, err
+    assert res["items"] == [f"f{i:03d}" for i in range(5)]
+    assert res["next_cursor"] == "f004"
+    assert res["scanned"] >= 5
+
+
+def test_outside_allowlist_is_refused(engine):
+    ok, err, res = engine.exec_list_dir({"path": "/etc", "limit": 5}, engine.policy_snapshot())
+    assert not ok and res is None
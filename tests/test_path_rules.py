@@ -0,0 +1,43 @@
+import itertools
+
+
+def linear_check(bd, policy, p):
+    """The rule scan PathRuleIndex replaced."""
+    p = bd.abspath(p)
+    for b in policy.get("blacklist", []):
+        if bd.path_is_under(p, bd.abspath(b)):
+            return False, f"Path is blacklisted: {bd.abspath(b)}"
+    if str(policy.get("allow_mode", "allowlist")).lower() == "allowlist":
+        if any(bd.path_is_under(p, bd.abspath(a)) for a in policy.get("allowlist", [])):
+            return True, ""
+        return False, "Path not in allowlist"
+    return True, ""
+
+
+POLICIES = [
+    {"allow_mode": "allowlist", "allowlist": ["/home/u/repo", "/tmp"],
+     "blacklist": ["/home/u/repo/secret", "/home/u/repo", "/tmp/x/"]},
+    {"allow_mode": "allowlist", "allowlist": ["/"], "blacklist": ["/etc"]},
+    {"allow_mode": "blacklist", "allowlist": [], "blacklist": ["/home/u/.ssh"]},
+    {"allow_mode": "open", "allowlist": [], "blacklist": []},
+]
+
+PATHS = ["/", "/home", "/home/u/repo", "/home/u/repo/a/b", "/home/u/repo/secret/k", "/home/u/repository",
+         "/tmp", "/tmp/x", "/tmp/xy", "/tmp/x/y/../z", "/etc", "/etc/passwd", "/etcetera", "/home/u/.ssh/id"]
+
+
+def test_matches_linear_scan(bd):
+    for policy, p in itertools.product(POLICIES, PATHS):
+        index = bd.PathRuleIndex(policy)
+        assert index.check(bd.abspath(p)) == linear_check(bd, policy, p), (policy, p)
+
+
+def test_first_blacklist_entry_is_reported(bd):
+    index = bd.PathRuleIndex(POLICIES[0])
+    assert index.check("/home/u/repo/secret/k") == (False, "Path is blacklisted: /home/u/repo/secret")
+
+
+def test_prefix_is_not_a_parent(bd):
+    index = bd.PathRuleIndex({"allowlist": ["/home/u/repo"], "blacklist": []})
+    assert index.check("/home/u/repo2")[0] is False
+    assert index.check("/home/u/repo/x")[0] is True
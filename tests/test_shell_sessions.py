@@ -0,0 +1,94 @@
+import pytest
+
+
+@pytest.fixture
+def pool(bd, tmp_path):
+    p = bd.ShellSessionPool(bd.ShellSandbox(cwd=str(tmp_path), limits={}), warm=0, max_sessions=2)
+    yield p
+    p.close()
+
+
+def test_state_persists_between_commands(pool, tmp_path):
+    sid = pool.create()
+    (tmp_path / "sub").mkdir()
+    ok, err, res = pool.run(sid, "cd sub && export FOO=bar", 10)
+    assert ok, err
+    ok, err, res = pool.run(sid, "echo $FOO; pwd", 10)
+    assert ok, err
+    assert res["stdout"].split() == ["bar", str(tmp_path / "sub")]
+    assert res["cwd"] == str(tmp_path / "sub")
+    assert res["returncode"] == 0
+    assert not res["session_reset"]
+
+
+def test_returncode_and_stderr(pool):
+    sid = pool.create()
+    ok, err, res = pool.run(sid, "echo oops >&2; false", 10)
+    assert ok, err
+    assert res["returncode"] == 1
+    assert res["stderr"] == "oops\n"
+
+
+def test_unknown_session_is_an_error(pool):
+    ok, err, res = pool.run("not-a-session", "true", 10)
+    assert not ok and res is None
+    assert "unknown or expired" in err
+
+
+def test_timeout_respawns_on_next_command(pool, tmp_path):
+    sid = pool.create()
+    (tmp_path / "sub").mkdir()
+    assert pool.run(sid, "cd sub", 10)[0]
+    ok, err, res = pool.run(sid, "sleep 30", 0.5)
+    assert not ok and res is None
+    assert "timed out" in err
+    # the id stays valid; the next command runs in a fresh shell at the sandbox cwd
+    ok, err, res = pool.run(sid, "pwd", 10)
+    assert ok, err
+    assert res["stdout"].strip() == str(tmp_path)
+    assert pool.stats()["resets"] >= 1
+
+
+def test_exit_resets_session(pool, tmp_path):
+    sid = pool.create()
+    ok, err, res = pool.run(sid, "exit 4", 10)
+    assert ok, err
+    assert res["session_reset"]
+    ok, err, res = pool.run(sid, "echo again", 10)
+    assert ok, err
+    assert res["stdout"] == "again\n"
+
+
+def test_closed_session_is_gone(pool):
+    sid = pool.create()
+    assert pool.close_session(sid)
+    assert not pool.close_session(sid)
+    assert not pool.run(sid, "true", 10)[0]
+
+
+def test_limit_evicts_least_recently_used_idle(pool):
+    a, b = pool.create(), pool.create()
+    c = pool.create()
+    assert c is not None
+    assert not pool.run(a, "true", 10)[0]
+    assert pool.run(b, "true", 10)[0]
+
+
+def test_listing_and_audit_hide_full_ids(bd, pool):
+    sid = pool.create()
+    assert [s["session"] for s in pool.list()] == [sid[:6] + "..."]
+    entry = bd.mask_audit_sessions({"params": {"session": sid, "cmd": "ls"},
+                                    "steps": [{"params": {"session": sid}}, {"params": {"session": "new"}}]})
+    assert entry["params"]["session"] == sid[:6] + "..."
+    assert [s["params"]["session"] for s in entry["steps"]] == [sid[:6] + "...", "new"]
+
+
+def test_sandbox_env_scrub(bd, monkeypatch):
+    for k, v in {"GITHUB_TOKEN": "x", "AWS_SECRET_ACCESS_KEY": "x", "BUDDY_PORT": "1",
+                 "XAUTHORITY": "/x", "SSH_AUTH_SOCK": "/s", "DBUS_SESSION_BUS_ADDRESS": "u",
+                 "TOKENIZERS_PARALLELISM": "1", "MY_KEEP_TOKEN": "x"}.items():
+        monkeypatch.setenv(k, v)
+    env = bd.ShellSandbox(keep=["MY_KEEP_*"]).env()
+    assert not {"GITHUB_TOKEN", "AWS_SECRET_ACCESS_KEY", "BUDDY_PORT"} & set(env)
+    assert {"XAUTHORITY", "SSH_AUTH_SOCK", "DBUS_SESSION_BUS_ADDRESS", "TOKENIZERS_PARALLELISM",
+            "MY_KEEP_TOKEN"} <= set(env)